@@ -3,36 +3,61 @@ Agent 工具调用标注 — API 路由 + SQLite 存储
 挂载方式: app.include_router(router)
 """
 
+import gzip
+import hashlib
 import json
+import os
+import shutil
 import sqlite3
+import tarfile
+import tempfile
 import uuid
+import zipfile
 from datetime import datetime
 from pathlib import Path
 
 from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional
+from typing import IO, Iterator, Optional
 
 from agent_importers import ImporterRegistry
+from agent_storage import blob_refs, pack_messages, resolve_blobs
+from core.async_db import AsyncSQLite
+from core.blob_store import TRAIN_SAMPLE_LIMIT, BlobStore
+from core.pagination import (
+    DEFAULT_PAGE_SIZE,
+    clamp_page_size,
+    decode_cursor,
+    encode_cursor,
+)
+from core.sqlite_pool import SQLitePool
 
 router = APIRouter(prefix="/api/agent-annotation", tags=["agent-annotation"])
 
 # ---------------------------------------------------------------------------
 # SQLite 初始化
 # ---------------------------------------------------------------------------
-DB_DIR = Path(__file__).parent / "data"
-DB_DIR.mkdir(exist_ok=True)
+# 运行时数据库目录，DATAOPS_DATA_DIR 可覆盖（测试指向临时目录）
+DB_DIR = Path(os.getenv("DATAOPS_DATA_DIR", Path(__file__).parent / "data"))
+DB_DIR.mkdir(parents=True, exist_ok=True)
 DB_PATH = DB_DIR / "agent_annotation.db"
 
 importer_registry = ImporterRegistry()
 
 
-def _get_db():
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
-    conn.execute("PRAGMA foreign_keys=ON")
-    return conn
+_db_pool = SQLitePool(DB_PATH, pragmas={"foreign_keys": "ON"})
+# async 路由的写操作交给单写线程组提交，不在事件循环上阻塞
+_dal = AsyncSQLite(_db_pool)
+# 会话长文本块跨会话去重存放，骨架压缩后存 payload 列；二者共用一套压缩字典
+_blob_store = BlobStore("session_blobs")
+DICT_AUTO_TRAIN_SESSIONS = 1000  # 尚无字典且会话数达到该值时自动训练
+
+
+def _get_db() -> sqlite3.Connection:
+    """当前线程的复用连接（由连接池管理，调用方无需 close）"""
+    return _db_pool.connection()
 
 
 def _init_db():
@@ -44,8 +69,29 @@ def _init_db():
             created_at TEXT NOT NULL,
             model TEXT NOT NULL,
             metadata TEXT DEFAULT '{}',
-            messages TEXT NOT NULL
+            messages TEXT NOT NULL,
+            message_count INTEGER,
+            tool_call_count INTEGER,
+            annotation_count INTEGER NOT NULL DEFAULT 0,
+            payload BLOB,
+            payload_bytes INTEGER
         );
+        CREATE INDEX IF NOT EXISTS idx_sessions_created
+            ON agent_sessions(created_at);
+
+        -- 导入时从 messages 中拆出的工具调用，统计与索引校验不再解析 messages
+        CREATE TABLE IF NOT EXISTS tool_calls (
+            session_id TEXT NOT NULL,
+            message_index INTEGER NOT NULL,
+            tool_call_index INTEGER NOT NULL,
+            call_id TEXT,
+            tool_name TEXT NOT NULL,
+            args_hash TEXT NOT NULL,
+            args_preview TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (session_id, message_index, tool_call_index),
+            FOREIGN KEY (session_id) REFERENCES agent_sessions(session_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_tool_calls_name ON tool_calls(tool_name);
 
         CREATE TABLE IF NOT EXISTS agent_annotations (
             id TEXT PRIMARY KEY,
@@ -61,16 +107,143 @@ def _init_db():
             FOREIGN KEY (session_id) REFERENCES agent_sessions(session_id)
         );
 
-        CREATE INDEX IF NOT EXISTS idx_annotations_session
-            ON agent_annotations(session_id);
+        -- 列表按 (created_at, id) keyset 翻页
+        CREATE INDEX IF NOT EXISTS idx_annotations_time
+            ON agent_annotations(created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_annotations_session_time
+            ON agent_annotations(session_id, created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_annotations_annotator_time
+            ON agent_annotations(annotator, created_at, id);
+        DROP INDEX IF EXISTS idx_annotations_session;
+        -- 按工具调用取标注（tool-calls 视图一次查询分组）
+        CREATE INDEX IF NOT EXISTS idx_annotations_tool_call
+            ON agent_annotations(session_id, message_index, tool_call_index);
         """
     )
-    conn.close()
+    _blob_store.init_schema(conn)
+    _migrate_sessions(conn)
+
+
+def _migrate_sessions(conn: sqlite3.Connection) -> None:
+    """旧库补齐新列，为尚未拆分的会话回填 tool_calls，并把 messages 列转存为 payload"""
+    columns = {r["name"] for r in conn.execute("PRAGMA table_info(agent_sessions)")}
+    for column, ddl in (
+        ("message_count", "message_count INTEGER"),
+        ("tool_call_count", "tool_call_count INTEGER"),
+        ("annotation_count", "annotation_count INTEGER NOT NULL DEFAULT 0"),
+        ("payload", "payload BLOB"),
+        ("payload_bytes", "payload_bytes INTEGER"),
+    ):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE agent_sessions ADD COLUMN {ddl}")
+    tc_columns = {r["name"] for r in conn.execute("PRAGMA table_info(tool_calls)")}
+    if "args_preview" not in tc_columns:
+        conn.execute(
+            "ALTER TABLE tool_calls ADD COLUMN args_preview TEXT NOT NULL DEFAULT ''"
+        )
+        # 已拆分的会话需要重新拆分以填充参数预览
+        conn.execute("UPDATE agent_sessions SET tool_call_count = NULL")
+
+    pending = conn.execute(
+        "SELECT session_id, messages, payload, tool_call_count FROM agent_sessions "
+        "WHERE tool_call_count IS NULL OR payload IS NULL"
+    ).fetchall()
+    if not pending:
+        return
+    with _db_pool.transaction() as tx:
+        for row in pending:
+            messages = _load_messages(tx, row)
+            if row["tool_call_count"] is None:
+                _store_tool_calls(tx, row["session_id"], messages)
+            if row["payload"] is None:
+                payload, payload_bytes = _pack_payload(tx, messages)
+                tx.execute(
+                    "UPDATE agent_sessions SET messages = '', payload = ?, "
+                    "payload_bytes = ? WHERE session_id = ?",
+                    (payload, payload_bytes, row["session_id"]),
+                )
+        tx.execute(
+            """UPDATE agent_sessions SET annotation_count = (
+                   SELECT COUNT(*) FROM agent_annotations a
+                   WHERE a.session_id = agent_sessions.session_id
+               )"""
+        )
+
+
+def _pack_payload(conn: sqlite3.Connection, messages: list[dict]) -> tuple[bytes, int]:
+    """长文本写入块表（增加引用），返回 (压缩后的骨架, 还原后的近似字节数)"""
+    skeleton, blobs = pack_messages(messages)
+    _blob_store.put(conn, blobs)
+    raw = json.dumps(skeleton, ensure_ascii=False).encode("utf-8")
+    blob_bytes = sum(len(text.encode("utf-8")) for text in blobs.values())
+    return _blob_store.encode(conn, raw), len(raw) + blob_bytes
+
+
+def _load_skeleton(conn: sqlite3.Connection, row) -> list:
+    """payload 为空的是尚未迁移的旧行，messages 列即完整 JSON"""
+    if row["payload"] is None:
+        return json.loads(row["messages"])
+    return json.loads(_blob_store.decode(conn, row["payload"]))
+
+
+def _load_messages(conn: sqlite3.Connection, row, part=None) -> list:
+    """解压骨架并还原块引用；part 可只取骨架中需要的部分（只读取其引用的块）"""
+    skeleton = _load_skeleton(conn, row)
+    if part is not None:
+        skeleton = part(skeleton)
+    return resolve_blobs(skeleton, _blob_store.get(conn, blob_refs(skeleton)))
+
+
+ARGS_PREVIEW_CHARS = 120
+
+
+def _tool_call_rows(session_id: str, messages: list[dict]) -> list[tuple]:
+    rows = []
+    for msg_idx, message in enumerate(messages):
+        for tc_idx, tool_call in enumerate(message.get("tool_calls") or []):
+            function = tool_call.get("function") or {}
+            name = function.get("name") or tool_call.get("name") or ""
+            args = function.get("arguments", tool_call.get("input", ""))
+            if not isinstance(args, str):
+                args = json.dumps(args, ensure_ascii=False, sort_keys=True)
+            rows.append(
+                (
+                    session_id,
+                    msg_idx,
+                    tc_idx,
+                    tool_call.get("id"),
+                    name,
+                    hashlib.sha1(args.encode("utf-8")).hexdigest(),
+                    args[:ARGS_PREVIEW_CHARS],
+                )
+            )
+    return rows
+
+
+def _store_tool_calls(
+    conn: sqlite3.Connection, session_id: str, messages: list[dict]
+) -> int:
+    """重写会话的 tool_calls 行与计数列，返回工具调用数"""
+    rows = _tool_call_rows(session_id, messages)
+    conn.execute("DELETE FROM tool_calls WHERE session_id = ?", (session_id,))
+    conn.executemany(
+        "INSERT INTO tool_calls (session_id, message_index, tool_call_index, "
+        "call_id, tool_name, args_hash, args_preview) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.execute(
+        "UPDATE agent_sessions SET message_count = ?, tool_call_count = ? "
+        "WHERE session_id = ?",
+        (len(messages), len(rows), session_id),
+    )
+    return len(rows)
 
 
 _init_db()
 
 MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB
+BULK_BATCH_SIZE = 500  # 批量导入每个事务写入的会话数
+BULK_MAX_ERRORS = 100  # 批量导入最多回报的错误条数
 
 
 # ---------------------------------------------------------------------------
@@ -94,19 +267,14 @@ class AnnotationCreate(BaseModel):
 @router.get("/stats")
 def get_stats():
     """统计概览"""
-    conn = _get_db()
-    try:
+    with _db_pool.transaction() as conn:
         total_sessions = conn.execute("SELECT COUNT(*) FROM agent_sessions").fetchone()[
             0
         ]
 
-        # 计算总工具调用数
-        total_tool_calls = 0
-        rows = conn.execute("SELECT messages FROM agent_sessions").fetchall()
-        for row in rows:
-            messages = json.loads(row["messages"])
-            for msg in messages:
-                total_tool_calls += len(msg.get("tool_calls", []))
+        total_tool_calls = conn.execute(
+            "SELECT COALESCE(SUM(tool_call_count), 0) FROM agent_sessions"
+        ).fetchone()[0]
 
         total_annotations = conn.execute(
             "SELECT COUNT(*) FROM agent_annotations"
@@ -141,49 +309,26 @@ def get_stats():
             "correctness_distribution": correctness_distribution,
             "error_type_distribution": error_type_distribution,
         }
-    finally:
-        conn.close()
 
 
 @router.get("/sessions")
 def list_sessions():
     """会话列表"""
-    conn = _get_db()
-    try:
-        rows = conn.execute(
-            "SELECT session_id, created_at, model, messages FROM agent_sessions "
-            "ORDER BY created_at DESC"
-        ).fetchall()
-
-        result = []
-        for row in rows:
-            messages = json.loads(row["messages"])
-            tool_call_count = sum(len(msg.get("tool_calls", [])) for msg in messages)
-            annotation_count = conn.execute(
-                "SELECT COUNT(*) FROM agent_annotations WHERE session_id = ?",
-                (row["session_id"],),
-            ).fetchone()[0]
-
-            result.append(
-                {
-                    "session_id": row["session_id"],
-                    "created_at": row["created_at"],
-                    "model": row["model"],
-                    "message_count": len(messages),
-                    "tool_call_count": tool_call_count,
-                    "annotation_count": annotation_count,
-                }
-            )
-        return result
-    finally:
-        conn.close()
+    rows = (
+        _get_db()
+        .execute(
+            "SELECT session_id, created_at, model, message_count, tool_call_count, "
+            "annotation_count FROM agent_sessions ORDER BY created_at DESC"
+        )
+        .fetchall()
+    )
+    return [dict(r) for r in rows]
 
 
 @router.get("/sessions/{session_id}")
 def get_session(session_id: str):
     """会话详情"""
-    conn = _get_db()
-    try:
+    with _db_pool.transaction() as conn:
         row = conn.execute(
             "SELECT * FROM agent_sessions WHERE session_id = ?", (session_id,)
         ).fetchone()
@@ -194,10 +339,8 @@ def get_session(session_id: str):
             "created_at": row["created_at"],
             "model": row["model"],
             "metadata": json.loads(row["metadata"]),
-            "messages": json.loads(row["messages"]),
+            "messages": _load_messages(conn, row),
         }
-    finally:
-        conn.close()
 
 
 @router.post("/sessions/import")
@@ -213,76 +356,422 @@ async def import_session(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="无效的 JSON 文件")
 
     try:
-        session = importer_registry.import_data(raw_data)
+        # 大会话的检测与转换是纯 CPU 工作，放到线程池避免阻塞事件循环
+        session = await run_in_threadpool(importer_registry.import_data, raw_data)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    conn = _get_db()
-    try:
-        conn.execute(
-            "INSERT OR REPLACE INTO agent_sessions (session_id, created_at, model, metadata, messages) "
-            "VALUES (?, ?, ?, ?, ?)",
-            (
-                session["session_id"],
-                session["created_at"],
-                session["model"],
-                json.dumps(session.get("metadata", {}), ensure_ascii=False),
-                json.dumps(session["messages"], ensure_ascii=False),
-            ),
-        )
-        conn.commit()
+    tc_count = await _dal.write(_store_session, session)
 
-        msg_count = len(session["messages"])
-        tc_count = sum(len(m.get("tool_calls", [])) for m in session["messages"])
-        return {
-            "success": True,
-            "session_id": session["session_id"],
-            "message": f"成功导入会话，包含 {msg_count} 条消息、{tc_count} 个工具调用",
-        }
-    finally:
-        conn.close()
+    msg_count = len(session["messages"])
+    return {
+        "success": True,
+        "session_id": session["session_id"],
+        "message": f"成功导入会话，包含 {msg_count} 条消息、{tc_count} 个工具调用",
+    }
 
 
-@router.get("/sessions/{session_id}/tool-calls")
-def get_tool_calls(session_id: str):
-    """获取会话中的所有工具调用（含已有标注）"""
+def _store_session(conn: sqlite3.Connection, session: dict) -> int:
+    """写入（或覆盖）一个会话并拆分 tool_calls，返回工具调用数"""
+    old = conn.execute(
+        "SELECT messages, payload FROM agent_sessions WHERE session_id = ?",
+        (session["session_id"],),
+    ).fetchone()
+    # 先加新引用再释放旧引用，新旧版本共用的块不会被误删
+    payload, payload_bytes = _pack_payload(conn, session["messages"])
+    if old is not None and old["payload"] is not None:
+        _blob_store.release(conn, blob_refs(_load_skeleton(conn, old)))
+    # 重新导入同一会话时保留 annotation_count
+    conn.execute(
+        "INSERT INTO agent_sessions (session_id, created_at, model, metadata, "
+        "messages, payload, payload_bytes) VALUES (?, ?, ?, ?, '', ?, ?) "
+        "ON CONFLICT(session_id) DO UPDATE SET created_at = excluded.created_at, "
+        "model = excluded.model, metadata = excluded.metadata, messages = '', "
+        "payload = excluded.payload, payload_bytes = excluded.payload_bytes",
+        (
+            session["session_id"],
+            session["created_at"],
+            session["model"],
+            json.dumps(session.get("metadata", {}), ensure_ascii=False),
+            payload,
+            payload_bytes,
+        ),
+    )
+    return _store_tool_calls(conn, session["session_id"], session["messages"])
+
+
+def _maybe_train_dictionary() -> None:
+    """首次积累到足够多的会话后自动训练压缩字典，之后写入的数据使用字典压缩"""
     conn = _get_db()
+    if (
+        _blob_store.current_dict_id(conn)
+        or not conn.execute(
+            "SELECT 1 FROM agent_sessions WHERE payload IS NOT NULL LIMIT 1 OFFSET ?",
+            (DICT_AUTO_TRAIN_SESSIONS - 1,),
+        ).fetchone()
+    ):
+        return
+    _dal.write_sync(_train_dictionary_once)
+
+
+def _train_dictionary_once(conn: sqlite3.Connection) -> None:
+    # 写线程内再检查一次：其他请求可能已经训练过
+    if _blob_store.current_dict_id(conn) == 0:
+        _train_dictionary(conn, recompress=False)
+
+
+def _train_dictionary(conn: sqlite3.Connection, recompress: bool) -> dict:
+    """样本一半取自块表、一半取自会话骨架；recompress 时连同全部骨架一起重写"""
+    half = TRAIN_SAMPLE_LIMIT // 2
+    samples = _blob_store.sample(conn, half)
+    for row in conn.execute(
+        "SELECT payload FROM agent_sessions WHERE payload IS NOT NULL "
+        "ORDER BY random() LIMIT ?",
+        (half,),
+    ):
+        samples.append(_blob_store.decode(conn, row["payload"]))
+    result = _blob_store.train(conn, samples=samples, recompress=recompress)
+    result["recompressed_sessions"] = 0
+    if result["trained"] and recompress:
+        rows = conn.execute(
+            "SELECT session_id, payload FROM agent_sessions WHERE payload IS NOT NULL"
+        ).fetchall()
+        conn.executemany(
+            "UPDATE agent_sessions SET payload = ? WHERE session_id = ?",
+            [
+                (
+                    _blob_store.encode(conn, _blob_store.decode(conn, r["payload"])),
+                    r["session_id"],
+                )
+                for r in rows
+            ],
+        )
+        result["recompressed_sessions"] = len(rows)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# 批量导入：JSONL / tar / zip 逐条读取，按批提交
+# ---------------------------------------------------------------------------
+_TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+
+def _iter_jsonl(stream: IO[bytes], prefix: str = "") -> Iterator[tuple[str, object]]:
+    # 只切行不解析，JSON 解析与格式转换一起交给 import_batch（可并行）
+    for lineno, line in enumerate(stream, 1):
+        if line.strip():
+            yield f"{prefix}line {lineno}", line
+
+
+def _iter_member(name: str, stream: IO[bytes]) -> Iterator[tuple[str, object]]:
+    """归档中的单个文件：.jsonl 逐行读取，.json 作为一个会话，其余跳过"""
+    lower = name.lower()
+    if lower.endswith((".jsonl", ".ndjson")):
+        yield from _iter_jsonl(stream, f"{name}:")
+    elif lower.endswith((".jsonl.gz", ".ndjson.gz")):
+        yield from _iter_jsonl(gzip.open(stream), f"{name}:")
+    elif lower.endswith(".json"):
+        data = stream.read(MAX_UPLOAD_SIZE + 1)
+        if len(data) > MAX_UPLOAD_SIZE:
+            yield name, ValueError("单个会话文件超过 10MB 限制")
+            return
+        yield name, data
+
+
+def _iter_upload_records(
+    filename: str, stream: IO[bytes]
+) -> Iterator[tuple[str, object]]:
+    """按文件名判断上传格式，逐条产出 (位置标签, 原始 JSON 字节或错误)"""
+    lower = filename.lower()
+    if lower.endswith(".zip"):
+        with zipfile.ZipFile(stream) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    with zf.open(info) as member:
+                        yield from _iter_member(info.filename, member)
+    elif lower.endswith(_TAR_SUFFIXES):
+        # 流式模式 r|*，不回退读取，自动识别压缩格式
+        with tarfile.open(fileobj=stream, mode="r|*") as tf:
+            for member in tf:
+                if member.isfile():
+                    yield from _iter_member(member.name, tf.extractfile(member))
+    elif lower.endswith(".gz"):
+        yield from _iter_jsonl(gzip.open(stream))
+    else:
+        yield from _iter_jsonl(stream)
+
+
+def _store_sessions(
+    conn: sqlite3.Connection, sessions: list[dict]
+) -> list[tuple[bool, object]]:
+    """批量导入的一批会话：每个会话一个 SAVEPOINT，出错只回滚它自己
+
+    返回与 sessions 对应的 (成功, 工具调用数或错误信息)。
+    """
+    results: list[tuple[bool, object]] = []
+    for session in sessions:
+        conn.execute("SAVEPOINT bulk_session")
+        try:
+            tc_count = _store_session(conn, session)
+        except (sqlite3.Error, ValueError) as e:
+            conn.execute("ROLLBACK TO bulk_session")
+            conn.execute("RELEASE bulk_session")
+            results.append((False, f"写入失败: {e}"))
+        else:
+            conn.execute("RELEASE bulk_session")
+            results.append((True, tc_count))
+    return results
+
+
+def _bulk_import_events(filename: str, stream: IO[bytes]) -> Iterator[bytes]:
+    """每 BULK_BATCH_SIZE 条一批：import_batch 解析+转换，一个事务写入，输出一行进度"""
+    stats = {"processed": 0, "imported": 0, "failed": 0, "tool_calls": 0}
+    formats: dict[str, int] = {}
+    errors: list[dict] = []
+    labels: list[str] = []
+    records: list[object] = []
+    error_budget = BULK_MAX_ERRORS
+
+    def event(kind: str, new_errors: list[dict]) -> bytes:
+        payload = {"event": kind, **stats, "formats": formats, "errors": new_errors}
+        return (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+
+    def fail(label: str, message: str) -> None:
+        nonlocal error_budget
+        stats["failed"] += 1
+        if error_budget > 0:
+            error_budget -= 1
+            errors.append({"record": label, "error": message})
+
+    def flush() -> bytes:
+        results = importer_registry.import_batch(records)
+        sessions = [value for ok, value in results if ok]
+        # 与其他写路径一样交给单写线程（BEGIN IMMEDIATE 组提交）；整批写入失败
+        # （如等锁超时）时记为这一批每条记录的错误，流式导入继续处理后续批次
+        try:
+            stored = _dal.write_sync(_store_sessions, sessions) if sessions else []
+        except sqlite3.Error as e:
+            stored = [(False, f"写入失败: {e}")] * len(sessions)
+        outcomes = iter(stored)
+        for label, (ok, value) in zip(labels, results):
+            if not ok:
+                fail(label, value)
+                continue
+            saved, tc_count = next(outcomes)
+            if not saved:
+                fail(label, tc_count)
+                continue
+            source = value.get("metadata", {}).get("source_format", "unknown")
+            formats[source] = formats.get(source, 0) + 1
+            stats["tool_calls"] += tc_count
+            stats["imported"] += 1
+        try:
+            _maybe_train_dictionary()
+        except sqlite3.Error:
+            pass  # 字典训练不影响导入，下一批再尝试
+        labels.clear()
+        records.clear()
+        reported = errors[:BULK_MAX_ERRORS]
+        errors.clear()
+        return event("progress", reported)
+
+    for label, raw in _iter_upload_records(filename, stream):
+        stats["processed"] += 1
+        if isinstance(raw, Exception):
+            fail(label, str(raw))
+            continue
+        labels.append(label)
+        records.append(raw)
+        if len(records) >= BULK_BATCH_SIZE:
+            yield flush()
+    yield flush()
+    yield event("done", [])
+
+
+@router.post("/sessions/import/bulk")
+def import_sessions_bulk(file: UploadFile = File(...)):
+    """批量导入会话（JSONL / JSONL.gz / tar / zip），不受 10MB 限制
+
+    以 NDJSON 流返回进度：每批一行 {"event": "progress", processed, imported,
+    failed, errors, ...}，最后一行 event 为 "done"。上传内容逐条读取，
+    内存占用与文件大小无关。
+    """
+    # 响应体在处理函数返回后才开始迭代，而 FastAPI 会在此之前关闭 UploadFile：
+    # 先把上传内容转存到由生成器持有（结束时删除）的临时文件
+    spool = tempfile.TemporaryFile()
     try:
+        shutil.copyfileobj(file.file, spool, 1 << 20)
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    return StreamingResponse(
+        _spooled_import_events(file.filename or "", spool),
+        media_type="application/x-ndjson",
+    )
+
+
+def _spooled_import_events(filename: str, spool: IO[bytes]) -> Iterator[bytes]:
+    """导入结束（或客户端断开）时关闭并删除临时文件"""
+    with spool:
+        yield from _bulk_import_events(filename, spool)
+
+
+@router.get("/storage/stats")
+def get_storage_stats():
+    """会话存储压缩报告：骨架、块的去重与压缩比，以及整体压缩比"""
+    with _db_pool.transaction() as conn:
+        blobs = _blob_store.stats(conn)
         row = conn.execute(
-            "SELECT messages FROM agent_sessions WHERE session_id = ?",
-            (session_id,),
+            "SELECT COUNT(*) AS sessions, COALESCE(SUM(payload_bytes), 0) AS raw, "
+            "COALESCE(SUM(length(payload)), 0) AS stored "
+            "FROM agent_sessions WHERE payload IS NOT NULL"
         ).fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="会话不存在")
+    # payload_bytes 为还原后 messages 的近似大小（骨架 + 引用的块原文）
+    stored = row["stored"] + blobs["stored_bytes"]
+    return {
+        "blobs": blobs,
+        "sessions": row["sessions"],
+        "messages_bytes": row["raw"],
+        "skeleton_stored_bytes": row["stored"],
+        "stored_bytes": stored,
+        "overall_ratio": round(row["raw"] / max(stored, 1), 2),
+    }
 
-        messages = json.loads(row["messages"])
-        tool_calls = []
 
-        for msg_idx, message in enumerate(messages):
-            if message.get("tool_calls"):
-                for tc_idx, tool_call in enumerate(message["tool_calls"]):
-                    annotations = conn.execute(
-                        "SELECT * FROM agent_annotations "
-                        "WHERE session_id = ? AND message_index = ? AND tool_call_index = ?",
-                        (session_id, msg_idx, tc_idx),
-                    ).fetchall()
+@router.post("/storage/dictionary")
+def train_storage_dictionary(recompress: bool = False):
+    """重新训练压缩字典；recompress=true 时用新字典重写全部已有块与骨架"""
+    # 与其他写入一样经由单写线程执行，重写期间不会与组提交争抢写锁
+    result = _dal.write_sync(_train_dictionary, recompress)
+    if not result["trained"]:
+        raise HTTPException(status_code=400, detail="样本不足，无法训练压缩字典")
+    return result
+
+
+def _annotations_by_tool_call(
+    conn: sqlite3.Connection, session_id: str
+) -> dict[tuple[int, int], list[dict]]:
+    """一次查询取出会话的全部标注，按 (message_index, tool_call_index) 分组"""
+    grouped: dict[tuple[int, int], list[dict]] = {}
+    rows = conn.execute(
+        "SELECT * FROM agent_annotations WHERE session_id = ? "
+        "ORDER BY message_index, tool_call_index",
+        (session_id,),
+    )
+    for a in rows:
+        key = (a["message_index"], a["tool_call_index"])
+        grouped.setdefault(key, []).append(dict(a))
+    return grouped
 
-                    tool_calls.append(
-                        {
-                            "message_index": msg_idx,
-                            "tool_call_index": tc_idx,
-                            "tool_call": tool_call,
-                            "annotations": [dict(a) for a in annotations],
-                        }
-                    )
 
-        return tool_calls
-    finally:
-        conn.close()
+@router.get("/sessions/{session_id}/tool-calls")
+def get_tool_calls(session_id: str, compact: bool = False):
+    """获取会话中的所有工具调用（含已有标注）
+
+    compact=true 时不解析 messages，只返回工具名、参数预览与标注汇总，
+    单条详情通过 /sessions/{session_id}/tool-calls/{message_index}/{tool_call_index}
+    按需展开。
+    """
+    conn = _get_db()
+    if compact:
+        return _compact_tool_calls(conn, session_id)
+
+    row = conn.execute(
+        "SELECT messages, payload FROM agent_sessions WHERE session_id = ?",
+        (session_id,),
+    ).fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="会话不存在")
+
+    # 只还原工具调用部分，消息正文与工具输出的块不读取
+    calls_by_message = _load_messages(
+        conn, row, part=lambda msgs: [m.get("tool_calls") or [] for m in msgs]
+    )
+    annotations = _annotations_by_tool_call(conn, session_id)
+    tool_calls = []
+    for msg_idx, calls in enumerate(calls_by_message):
+        for tc_idx, tool_call in enumerate(calls):
+            tool_calls.append(
+                {
+                    "message_index": msg_idx,
+                    "tool_call_index": tc_idx,
+                    "tool_call": tool_call,
+                    "annotations": annotations.get((msg_idx, tc_idx), []),
+                }
+            )
+    return tool_calls
+
+
+def _compact_tool_calls(conn: sqlite3.Connection, session_id: str) -> list[dict]:
+    exists = conn.execute(
+        "SELECT 1 FROM agent_sessions WHERE session_id = ?", (session_id,)
+    ).fetchone()
+    if not exists:
+        raise HTTPException(status_code=404, detail="会话不存在")
+
+    summary: dict[tuple[int, int], dict[str, int]] = {}
+    for r in conn.execute(
+        "SELECT message_index, tool_call_index, correctness, COUNT(*) AS cnt "
+        "FROM agent_annotations WHERE session_id = ? "
+        "GROUP BY message_index, tool_call_index, correctness",
+        (session_id,),
+    ):
+        key = (r["message_index"], r["tool_call_index"])
+        summary.setdefault(key, {})[r["correctness"]] = r["cnt"]
+
+    result = []
+    for tc in conn.execute(
+        "SELECT message_index, tool_call_index, call_id, tool_name, args_preview "
+        "FROM tool_calls WHERE session_id = ? "
+        "ORDER BY message_index, tool_call_index",
+        (session_id,),
+    ):
+        correctness = summary.get((tc["message_index"], tc["tool_call_index"]), {})
+        result.append(
+            {
+                **dict(tc),
+                "annotation_count": sum(correctness.values()),
+                "correctness": correctness,
+            }
+        )
+    return result
+
+
+@router.get("/sessions/{session_id}/tool-calls/{message_index}/{tool_call_index}")
+def get_tool_call(session_id: str, message_index: int, tool_call_index: int):
+    """单个工具调用详情（compact 列表的按需展开）"""
+    conn = _get_db()
+    row = conn.execute(
+        "SELECT messages, payload FROM agent_sessions WHERE session_id = ?",
+        (session_id,),
+    ).fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="会话不存在")
+    skeleton = _load_skeleton(conn, row)
+    if not 0 <= message_index < len(skeleton):
+        raise HTTPException(status_code=404, detail="消息索引无效")
+    tc_list = skeleton[message_index].get("tool_calls") or []
+    if not 0 <= tool_call_index < len(tc_list):
+        raise HTTPException(status_code=404, detail="工具调用索引无效")
+    tool_call = tc_list[tool_call_index]
+    tool_call = resolve_blobs(tool_call, _blob_store.get(conn, blob_refs(tool_call)))
+
+    annotations = conn.execute(
+        "SELECT * FROM agent_annotations "
+        "WHERE session_id = ? AND message_index = ? AND tool_call_index = ?",
+        (session_id, message_index, tool_call_index),
+    ).fetchall()
+    return {
+        "message_index": message_index,
+        "tool_call_index": tool_call_index,
+        "tool_call": tool_call,
+        "annotations": [dict(a) for a in annotations],
+    }
 
 
 @router.post("/annotations")
-def create_annotation(data: AnnotationCreate):
+async def create_annotation(data: AnnotationCreate):
     """提交标注"""
     valid_correctness = {"correct", "incorrect", "uncertain"}
     if data.correctness not in valid_correctness:
@@ -311,77 +800,120 @@ def create_annotation(data: AnnotationCreate):
             detail=f"severity 必须为 {valid_severities} 之一",
         )
 
-    conn = _get_db()
-    try:
-        # 验证会话存在
-        session_row = conn.execute(
-            "SELECT messages FROM agent_sessions WHERE session_id = ?",
-            (data.session_id,),
-        ).fetchone()
-        if not session_row:
-            raise HTTPException(status_code=404, detail="会话不存在")
-
-        messages = json.loads(session_row["messages"])
-        if data.message_index >= len(messages):
-            raise HTTPException(status_code=400, detail="消息索引无效")
-
-        message = messages[data.message_index]
-        tc_list = message.get("tool_calls", [])
-        if data.tool_call_index >= len(tc_list):
-            raise HTTPException(status_code=400, detail="工具调用索引无效")
-
-        annotation_id = str(uuid.uuid4())
-        now = datetime.now().isoformat()
-
-        conn.execute(
-            "INSERT INTO agent_annotations "
-            "(id, session_id, message_index, tool_call_index, annotator, "
-            "correctness, error_type, severity, comment, created_at) "
-            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (
-                annotation_id,
-                data.session_id,
-                data.message_index,
-                data.tool_call_index,
-                "default_user",
-                data.correctness,
-                data.error_type,
-                data.severity,
-                data.comment,
-                now,
-            ),
-        )
-        conn.commit()
+    # 校验与写入在写线程的组提交事务内完成，HTTPException 只回滚本条标注
+    return await _dal.write(_create_annotation_tx, data)
+
+
+def _create_annotation_tx(conn: sqlite3.Connection, data: AnnotationCreate) -> dict:
+    """写线程内执行：校验工具调用存在后写入标注并更新会话计数"""
+    # 验证会话存在
+    session_row = conn.execute(
+        "SELECT message_count FROM agent_sessions WHERE session_id = ?",
+        (data.session_id,),
+    ).fetchone()
+    if not session_row:
+        raise HTTPException(status_code=404, detail="会话不存在")
+
+    if not 0 <= data.message_index < session_row["message_count"]:
+        raise HTTPException(status_code=400, detail="消息索引无效")
+    found = conn.execute(
+        "SELECT 1 FROM tool_calls WHERE session_id = ? "
+        "AND message_index = ? AND tool_call_index = ?",
+        (data.session_id, data.message_index, data.tool_call_index),
+    ).fetchone()
+    if not found:
+        raise HTTPException(status_code=400, detail="工具调用索引无效")
+
+    annotation_id = str(uuid.uuid4())
+    now = datetime.now().isoformat()
+
+    conn.execute(
+        "INSERT INTO agent_annotations "
+        "(id, session_id, message_index, tool_call_index, annotator, "
+        "correctness, error_type, severity, comment, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            annotation_id,
+            data.session_id,
+            data.message_index,
+            data.tool_call_index,
+            "default_user",
+            data.correctness,
+            data.error_type,
+            data.severity,
+            data.comment,
+            now,
+        ),
+    )
+    conn.execute(
+        "UPDATE agent_sessions SET annotation_count = annotation_count + 1 "
+        "WHERE session_id = ?",
+        (data.session_id,),
+    )
 
-        return {
-            "id": annotation_id,
-            "session_id": data.session_id,
-            "message_index": data.message_index,
-            "tool_call_index": data.tool_call_index,
-            "correctness": data.correctness,
-            "error_type": data.error_type,
-            "severity": data.severity,
-            "comment": data.comment,
-            "created_at": now,
-        }
-    finally:
-        conn.close()
+    return {
+        "id": annotation_id,
+        "session_id": data.session_id,
+        "message_index": data.message_index,
+        "tool_call_index": data.tool_call_index,
+        "correctness": data.correctness,
+        "error_type": data.error_type,
+        "severity": data.severity,
+        "comment": data.comment,
+        "created_at": now,
+    }
 
 
 @router.get("/annotations")
-def list_annotations(session_id: str = ""):
-    """标注列表（可按 session_id 过滤）"""
-    conn = _get_db()
+def list_annotations(
+    session_id: str = "",
+    annotator: str = "",
+    correctness: str = "",
+    since: str = "",
+    until: str = "",
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str = "",
+):
+    """标注列表（按 created_at 倒序分页，可按 session / 标注人 / 结论 / 时间过滤）"""
     try:
-        if session_id:
-            rows = conn.execute(
-                "SELECT * FROM agent_annotations WHERE session_id = ? ORDER BY created_at DESC",
-                (session_id,),
-            ).fetchall()
-        else:
-            rows = conn.execute(
-                "SELECT * FROM agent_annotations ORDER BY created_at DESC"
-            ).fetchall()
-        return [dict(r) for r in rows]
-    finally:
-        conn.close()
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    limit = clamp_page_size(limit)
+
+    clauses: list[str] = []
+    params: list = []
+    for column, value in (
+        ("session_id", session_id),
+        ("annotator", annotator),
+        ("correctness", correctness),
+    ):
+        if value:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if since:
+        clauses.append("created_at >= ?")
+        params.append(since)
+    if until:
+        clauses.append("created_at < ?")
+        params.append(until)
+    if after:
+        clauses.append("(created_at, id) < (?, ?)")
+        params.extend(after)
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+
+    rows = (
+        _get_db()
+        .execute(
+            f"""SELECT * FROM agent_annotations{where}
+                ORDER BY created_at DESC, id DESC LIMIT ?""",
+            params + [limit + 1],
+        )
+        .fetchall()
+    )
+    annotations = [dict(r) for r in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = annotations[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+    return {"annotations": annotations, "next_cursor": next_cursor}
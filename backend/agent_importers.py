@@ -4,8 +4,12 @@ Agent 工具调用标注 — 多格式导入器
 """
 
 import json
+import multiprocessing
+import os
+import threading
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 
 class DataImporter(ABC):
@@ -149,13 +153,48 @@ class CustomImporter(DataImporter):
         }
 
 
+SIGNATURE_CACHE_SIZE = 1024
+PARALLEL_THRESHOLD = 256  # 少于该条数的批次直接在当前线程处理
+IMPORT_CHUNK_SIZE = 128  # 每个进程池任务处理的记录数
+
+# (是否成功, 转换后的会话 或 错误信息)
+ImportResult = Tuple[bool, Any]
+
+
 class ImporterRegistry:
-    def __init__(self):
+    def __init__(self, workers: Optional[int] = None):
         self.importers: List[DataImporter] = [
             OpenAIImporter(),
             AnthropicImporter(),
             CustomImporter(),
         ]
+        self._signature_cache: Dict[Tuple, DataImporter] = {}
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    @staticmethod
+    def signature(raw_data: Dict) -> Tuple:
+        """格式签名：覆盖各 detect() 用到的全部特征，签名相同的记录检测结果相同"""
+        messages = raw_data.get("messages")
+        first = messages[0] if isinstance(messages, list) and messages else None
+        return (
+            frozenset(raw_data),
+            isinstance(messages, list) and bool(messages),
+            isinstance(first, dict) and "role" in first and "content" in first,
+            str(raw_data.get("model", "")).startswith("claude"),
+        )
+
+    def detect_cached(self, raw_data: Dict) -> DataImporter:
+        """批量导入用：同一格式签名只做一次 auto_detect"""
+        key = self.signature(raw_data)
+        importer = self._signature_cache.get(key)
+        if importer is None:
+            importer = self.auto_detect(raw_data)
+            if len(self._signature_cache) >= SIGNATURE_CACHE_SIZE:
+                self._signature_cache.clear()
+            self._signature_cache[key] = importer
+        return importer
 
     def auto_detect(self, raw_data: Dict) -> DataImporter:
         best_importer = None
@@ -177,3 +216,65 @@ class ImporterRegistry:
     def import_data(self, raw_data: Dict) -> Dict:
         importer = self.auto_detect(raw_data)
         return importer.transform(raw_data)
+
+    def import_one(self, record: Any) -> ImportResult:
+        """解析（JSON 文本时）+ 检测 + 转换单条记录，错误以结果返回而非抛出"""
+        try:
+            raw = json.loads(record) if isinstance(record, (str, bytes)) else record
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return False, "无效的 JSON"
+        if not isinstance(raw, dict):
+            return False, "记录必须为 JSON 对象"
+        try:
+            return True, self.detect_cached(raw).transform(raw)
+        except KeyError as exc:
+            return False, f"缺少字段 {exc}"
+        except (ValueError, TypeError, AttributeError) as exc:
+            return False, str(exc)
+
+    def import_batch(
+        self, records: Sequence[Any], chunk_size: int = IMPORT_CHUNK_SIZE
+    ) -> List[ImportResult]:
+        """批量检测 + 转换，结果与输入顺序一致
+
+        记录可以是 dict 或 JSON 文本（bytes/str）。条数达到 PARALLEL_THRESHOLD
+        且 workers > 1 时按 chunk_size 分块交给进程池，JSON 解析也在子进程完成，
+        调用线程只负责收集结果；每个子进程维护自己的签名缓存。
+        """
+        if self.workers <= 1 or len(records) < PARALLEL_THRESHOLD:
+            return [self.import_one(r) for r in records]
+        chunks = [
+            records[i : i + chunk_size] for i in range(0, len(records), chunk_size)
+        ]
+        results: List[ImportResult] = []
+        for part in self._executor().map(_import_chunk, chunks):
+            results.extend(part)
+        return results
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn 而非 fork：服务进程里有线程与 SQLite 连接，fork 不安全
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def close(self) -> None:
+        """关闭进程池（服务退出时调用）"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+
+_worker_registry: Optional[ImporterRegistry] = None
+
+
+def _import_chunk(chunk: Sequence[Any]) -> List[ImportResult]:
+    """进程池任务：子进程内复用一个 registry（含签名缓存）"""
+    global _worker_registry
+    if _worker_registry is None:
+        _worker_registry = ImporterRegistry(workers=1)
+    return [_worker_registry.import_one(r) for r in chunk]
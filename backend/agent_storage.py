@@ -0,0 +1,74 @@
+"""
+Agent 工具调用标注 — 会话 messages 的骨架化存储
+消息正文、工具输出与工具参数中的长文本替换为 {"$blob": hash} 引用，正文存入
+内容寻址的块表（跨会话去重 + 压缩），剩下的骨架整体用同一字典压缩存放；
+读取时只取出需要的块再还原。
+"""
+
+from typing import Any
+
+from core.blob_store import content_hash
+
+BLOB_MIN_BYTES = 256  # 更短的文本留在骨架里随骨架整体压缩，单独成块得不偿失
+BLOB_KEY = "$blob"
+
+
+def _ref(text: str, blobs: dict[str, str]) -> Any:
+    if len(text.encode("utf-8")) < BLOB_MIN_BYTES:
+        return text
+    h = content_hash(text)
+    blobs[h] = text
+    return {BLOB_KEY: h}
+
+
+def pack_messages(messages: list[dict]) -> tuple[list[dict], dict[str, str]]:
+    """拆出长文本，返回 (骨架 messages, {hash: 文本})"""
+    blobs: dict[str, str] = {}
+    skeleton = []
+    for message in messages:
+        message = dict(message)
+        if isinstance(message.get("content"), str):
+            message["content"] = _ref(message["content"], blobs)
+        if message.get("tool_calls"):
+            tool_calls = []
+            for tool_call in message["tool_calls"]:
+                function = tool_call.get("function")
+                if isinstance(function, dict) and isinstance(function.get("arguments"), str):
+                    args = _ref(function["arguments"], blobs)
+                    tool_call = {
+                        **tool_call,
+                        "function": {**function, "arguments": args},
+                    }
+                tool_calls.append(tool_call)
+            message["tool_calls"] = tool_calls
+        skeleton.append(message)
+    return skeleton, blobs
+
+
+def _is_ref(node: Any) -> bool:
+    return isinstance(node, dict) and len(node) == 1 and BLOB_KEY in node
+
+
+def blob_refs(node: Any) -> set[str]:
+    """骨架（或其中任一部分）引用到的块哈希"""
+    if _is_ref(node):
+        return {node[BLOB_KEY]}
+    refs: set[str] = set()
+    if isinstance(node, dict):
+        for value in node.values():
+            refs |= blob_refs(value)
+    elif isinstance(node, list):
+        for value in node:
+            refs |= blob_refs(value)
+    return refs
+
+
+def resolve_blobs(node: Any, blobs: dict[str, str]) -> Any:
+    """把骨架中的块引用替换回文本"""
+    if _is_ref(node):
+        return blobs[node[BLOB_KEY]]
+    if isinstance(node, dict):
+        return {k: resolve_blobs(v, blobs) for k, v in node.items()}
+    if isinstance(node, list):
+        return [resolve_blobs(v, blobs) for v in node]
+    return node
@@ -0,0 +1,193 @@
+"""
+负载测试 — 标注提交/审核/列表在 N 个并发标注员下的延迟分布与事件循环卡顿
+进程内通过 httpx.ASGITransport 调用 rlhf_annotation 路由；后台线程周期性持有写锁，
+模拟慢写入或 WAL checkpoint。心跳协程每 10ms 醒来一次，记录事件循环延迟
+（相当于 ai_chat 的 SSE 流被卡住的时间）。
+--inline 让写操作直接在事件循环上执行（改造前的行为），用于对比。
+运行: cd backend && python -m benchmarks.bench_annotation_load [--annotators 200] [--inline]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import types
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+
+# 负载测试不需要审计日志；system_log 不可用时提供空实现
+if "system_log" not in sys.modules:
+    try:
+        import system_log  # noqa: F401
+    except ImportError:
+        sys.modules["system_log"] = types.SimpleNamespace(log_audit=lambda **kw: None)
+
+import rlhf_annotation  # noqa: E402
+from core.async_db import AsyncSQLite  # noqa: E402
+from core.sample_store import SampleStore  # noqa: E402
+from core.sqlite_pool import SQLitePool  # noqa: E402
+
+TASK_ID = "AT-LOAD"
+HEARTBEAT_SECONDS = 0.01
+
+
+def _setup(tmp: Path, n_samples: int, inline: bool) -> tuple[FastAPI, SQLitePool]:
+    pool = SQLitePool(tmp / "rlhf_annotation.db")
+    dal = AsyncSQLite(pool)
+    rlhf_annotation._ann_pool = pool
+    rlhf_annotation._ann_dal = dal
+    rlhf_annotation._sample_store = SampleStore(pool)
+    rlhf_annotation.log_audit = lambda **kwargs: None
+    rlhf_annotation._init_ann_db()
+    rlhf_annotation.init_annotation_config(
+        {
+            "annotation_tasks": [{"id": TASK_ID, "task_type": "kto_binary", "status": "active"}],
+            "annotators": [],
+            "quality_config": {},
+            "annotation_samples": {
+                TASK_ID: [{"id": f"S{i:06d}", "prompt": f"prompt {i}"} for i in range(n_samples)]
+            },
+        }
+    )
+    if inline:
+        # 改造前：sqlite3 调用直接在事件循环上执行
+        async def write_inline(fn, *args):
+            with pool.transaction(immediate=True) as conn:
+                return fn(conn, *args)
+
+        dal.write = write_inline
+    app = FastAPI()
+    app.include_router(rlhf_annotation.router)
+    return app, pool
+
+
+def _lock_holder(path: Path, every: float, hold: float, stop: threading.Event):
+    """另一个连接周期性持有写锁 hold 秒"""
+    conn = SQLitePool(path).connection()
+    while not stop.wait(every):
+        conn.execute("BEGIN IMMEDIATE")
+        time.sleep(hold)
+        conn.execute("COMMIT")
+
+
+async def _heartbeat(lags: list[float], stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        t0 = loop.time()
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+        lags.append(loop.time() - t0 - HEARTBEAT_SECONDS)
+
+
+async def _annotator(client, idx: int, ops: int, think: float, latencies: dict[str, list[float]]):
+    submitted = []
+    for op in range(ops):
+        # 标注员阅读样本的时间，随机抖动避免所有人同步发请求
+        await asyncio.sleep(random.uniform(0, 2 * think))
+        t0 = time.perf_counter()
+        if op % 10 == 9 and submitted:
+            kind = "review"
+            await client.post(
+                f"/api/annotation/tasks/{TASK_ID}/review",
+                json={"submission_id": submitted.pop(0), "action": "approve"},
+            )
+        elif op % 5 == 4:
+            kind = "list"
+            await client.get(f"/api/annotation/tasks/{TASK_ID}/submissions?limit=20")
+        else:
+            kind = "submit"
+            resp = await client.post(
+                f"/api/annotation/tasks/{TASK_ID}/submit",
+                json={"sample_id": f"S{idx * ops + op:06d}", "feedback": "good"},
+            )
+            body = resp.json()
+            if body["status"] == "ok":
+                submitted.append(body["submission_id"])
+        latencies[kind].append(time.perf_counter() - t0)
+
+
+def _pct(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+
+async def _run(args) -> None:
+    tmp = Path(tempfile.mkdtemp(prefix="bench_load_"))
+    app, pool = _setup(tmp, args.annotators * args.ops, args.inline)
+    stop_locker = threading.Event()
+    locker = threading.Thread(
+        target=_lock_holder,
+        args=(
+            tmp / "rlhf_annotation.db",
+            args.stall_every / 1000,
+            args.stall_ms / 1000,
+            stop_locker,
+        ),
+        daemon=True,
+    )
+    if args.stall_ms > 0:
+        locker.start()
+
+    latencies: dict[str, list[float]] = {"submit": [], "review": [], "list": []}
+    lags: list[float] = []
+    stop_heartbeat = asyncio.Event()
+    heartbeat = asyncio.create_task(_heartbeat(lags, stop_heartbeat))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+        t0 = time.perf_counter()
+        await asyncio.gather(
+            *(
+                _annotator(c, i, args.ops, args.think_ms / 1000, latencies)
+                for i in range(args.annotators)
+            )
+        )
+        elapsed = time.perf_counter() - t0
+    stop_heartbeat.set()
+    await heartbeat
+    stop_locker.set()
+
+    mode = "inline（事件循环上直接写）" if args.inline else "AsyncSQLite（写线程组提交）"
+    total = sum(len(v) for v in latencies.values())
+    print(
+        f"mode={mode} annotators={args.annotators} ops/annotator={args.ops} "
+        f"think={args.think_ms}ms stall={args.stall_ms}ms/{args.stall_every}ms"
+    )
+    print(f"requests={total:,} elapsed={elapsed:.1f}s throughput={total / elapsed:,.0f} req/s")
+    print(f"{'op':<8}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for kind, values in latencies.items():
+        print(
+            f"{kind:<8}{len(values):>7}{_pct(values, 0.5):>10.1f}"
+            f"{_pct(values, 0.95):>10.1f}{_pct(values, 0.99):>10.1f}"
+            f"{max(values, default=0) * 1000:>10.1f}"
+        )
+    print(
+        f"事件循环延迟 p50 {_pct(lags, 0.5):.1f} ms  p99 {_pct(lags, 0.99):.1f} ms  "
+        f"max {max(lags, default=0) * 1000:.1f} ms  "
+        f"(>50ms 共 {sum(lag > 0.05 for lag in lags)} 次, mean {statistics.fmean(lags or [0]) * 1000:.1f} ms)"
+    )
+    if not args.inline:
+        print(f"组提交: {rlhf_annotation._ann_dal.stats()}")
+    rlhf_annotation._ann_dal.close()
+    pool.close_all()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--annotators", type=int, default=200)
+    parser.add_argument("--ops", type=int, default=20, help="每个标注员的请求数")
+    parser.add_argument("--think-ms", type=int, default=200, help="平均请求间隔")
+    parser.add_argument("--stall-ms", type=int, default=50, help="模拟慢写入持锁时长")
+    parser.add_argument("--stall-every", type=int, default=500)
+    parser.add_argument("--inline", action="store_true")
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
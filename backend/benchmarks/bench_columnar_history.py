@@ -0,0 +1,130 @@
+"""
+性能报告 — 分析端点：dict 列表逐条遍历（改造前）vs 列式表向量化分组
+同一批合成执行记录，分别以 dict 列表和 ExecutionHistory 的列式表持有，测量：
+  - cost_summary：按 pipeline 汇总成本与次数
+  - team_stats：按 (owner, status) 汇总
+  - list_pipelines：每个 pipeline 最近 30 次执行的成功率 / 平均耗时 / 成本
+  - execution_trend：最近 14 天按 (day, status) 计数
+以及两种表示的常驻内存
+运行: cd backend && python -m benchmarks.bench_columnar_history [--executions 1000000]
+"""
+
+import argparse
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.bench_history_index import _synthetic_executions
+from core.history import ExecutionHistory, recent_days
+
+
+def _timeit(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--executions", type=int, default=1_000_000)
+    parser.add_argument("--pipelines", type=int, default=50)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    executions = _synthetic_executions(args.executions, args.pipelines)
+    dict_mb = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+    pipeline_ids = sorted({e["pipeline_id"] for e in executions})
+    # 合成数据覆盖 2025 全年，趋势取年末 14 天
+    days = recent_days(14, now=datetime(2026, 1, 1))
+
+    history = ExecutionHistory([], [])
+    t0 = time.perf_counter()
+    history._append_execution_rows(
+        [
+            (
+                e["start_time"][:19],
+                e["pipeline_id"],
+                e["pipeline_name"],
+                e["owner"],
+                e["status"],
+                e["duration_minutes"],
+                e["rows_processed"],
+                e["cost_yuan"],
+            )
+            for e in reversed(executions)
+        ]
+    )
+    build = time.perf_counter() - t0
+    table = history.executions
+    column_mb = sum(table[name].nbytes for name in table.schema) / 1e6
+
+    def scan_cost_summary():
+        by_pipeline = {}
+        for e in executions:
+            cell = by_pipeline.setdefault(e["pipeline_id"], [0.0, 0])
+            cell[0] += e["cost_yuan"]
+            cell[1] += 1
+
+    def scan_team_stats():
+        teams = {}
+        for e in executions:
+            cell = teams.setdefault((e["owner"], e["status"]), [0.0, 0, 0])
+            cell[0] += e["cost_yuan"]
+            cell[1] += 1
+            cell[2] += e["rows_processed"]
+
+    def scan_list_pipelines():
+        for pid in pipeline_ids:
+            recent = [e for e in executions if e["pipeline_id"] == pid][:30]
+            sum(1 for e in recent if e["status"] == "success")
+            sum(e["duration_minutes"] for e in recent)
+            sum(e["cost_yuan"] for e in recent)
+
+    def scan_execution_trend():
+        for day in days:
+            day_execs = [e for e in executions if e["start_time"][:10] == day]
+            sum(1 for e in day_execs if e["status"] == "success")
+
+    cases = (
+        (
+            "cost_summary",
+            scan_cost_summary,
+            lambda: history.execution_totals(("pipeline_id",)),
+        ),
+        (
+            "team_stats",
+            scan_team_stats,
+            lambda: history.execution_totals(("owner", "status")),
+        ),
+        (
+            "list_pipelines",
+            scan_list_pipelines,
+            lambda: history.execution_totals(("pipeline_id", "status"), latest_per_pipeline=30),
+        ),
+        (
+            "execution_trend",
+            scan_execution_trend,
+            lambda: history.execution_totals(("day", "status"), days),
+        ),
+    )
+
+    print(f"executions={args.executions:,} pipelines={len(pipeline_ids)}")
+    print(
+        f"内存  dict 列表 {dict_mb:,.0f} MB   列式表 {column_mb:,.0f} MB   "
+        f"（由行构建列式表 {build:.2f}s）"
+    )
+    for name, scan, columnar in cases:
+        t_scan = _timeit(scan, repeat=1)
+        t_columnar = _timeit(columnar)
+        print(
+            f"{name:<18} dict 遍历 {t_scan * 1000:>10.1f} ms   "
+            f"列式 {t_columnar * 1000:>8.2f} ms   x{t_scan / t_columnar:,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
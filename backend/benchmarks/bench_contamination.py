@@ -0,0 +1,114 @@
+"""
+性能报告 — 评测集污染检测：n-gram Bloom filter 建库与探测吞吐（n-grams/sec）
+合成数据：随机词组成的评测集（写成 JSONL，--eval-docs 条）与待检测样本（--samples 条），
+其中 --leak-rate 比例的样本在 prompt 中夹带一道评测题，测量：
+  - 建库：流式读取评测集文件、哈希（进程池分片）并置位，n-grams/s 与位数组大小
+  - 探测：ContaminationIndex.scan 单进程与进程池（--workers）
+  - 泄漏样本的检出率、干净样本的误报数与 n-gram 级假阳性率
+以及进程峰值 RSS（原文按分片流式处理，峰值与评测集 / 样本规模无关）
+运行: cd backend && python -m benchmarks.bench_contamination [--eval-docs 200000] [--workers 4]
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import string
+import tempfile
+from pathlib import Path
+
+from core.contamination import ContaminationIndex
+
+
+def _vocab(rng: random.Random) -> list[str]:
+    return [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))) for _ in range(50_000)
+    ]
+
+
+def _write_evals(path: Path, docs: int, words: int) -> list[str]:
+    """写评测集，返回其中一小部分题目（用作泄漏样本）"""
+    rng = random.Random(7)
+    vocab = _vocab(rng)
+    kept = []
+    with open(path, "w") as f:
+        for i in range(docs):
+            question = " ".join(rng.choices(vocab, k=words))
+            if i % 97 == 0:
+                kept.append(question)
+            f.write(json.dumps({"id": i, "question": question, "answer": "A"}) + "\n")
+    return kept
+
+
+def _samples(count: int, words: int, leaks: list[str], leak_rate: float):
+    """(key, [prompt, response]) 记录；key 为 (序号, 是否泄漏)"""
+    rng = random.Random(8)
+    vocab = _vocab(rng)
+    for i in range(count):
+        leaked = rng.random() < leak_rate
+        prompt = " ".join(rng.choices(vocab, k=words // 4))
+        if leaked:
+            prompt = "请回答下面的问题：" + rng.choice(leaks)
+        yield (i, leaked), [prompt, " ".join(rng.choices(vocab, k=words))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--eval-docs", type=int, default=200_000)
+    parser.add_argument("--eval-words", type=int, default=120)
+    parser.add_argument("--samples", type=int, default=100_000)
+    parser.add_argument("--sample-words", type=int, default=200)
+    parser.add_argument("--leak-rate", type=float, default=0.01)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-contamination-") as tmp:
+        path = Path(tmp) / "eval.jsonl"
+        leaks = _write_evals(path, args.eval_docs, args.eval_words)
+        print(
+            f"评测集 {args.eval_docs:,} 条 {path.stat().st_size / 1e6:,.0f} MB  "
+            f"样本 {args.samples:,} 条  cpu={os.cpu_count()} workers={args.workers}"
+        )
+
+        index = ContaminationIndex(Path(tmp) / "index", workers=args.workers)
+        try:
+            meta = index.build_files([path])
+            rate = meta["ngrams"] / meta["seconds"]
+            print(
+                f"{'建库':<14} {meta['seconds']:>7.2f}s  {rate / 1e6:>6.2f} M n-grams/s  "
+                f"{meta['ngrams']:,} 个 n-gram  位数组 {meta['words'] * 8 / 1e6:,.0f} MB "
+                f"(k={meta['hashes']})"
+            )
+            results = {}
+            for label, workers in (("探测 单进程", 1), ("探测 进程池", args.workers)):
+                if label == "探测 进程池" and args.workers <= 1:
+                    continue
+                index.workers = workers
+                result = index.scan(
+                    _samples(args.samples, args.sample_words, leaks, args.leak_rate)
+                )
+                results[label] = result
+                cores = max(min(workers, os.cpu_count() or 1), 1)
+                rate = result.ngrams / result.seconds
+                print(
+                    f"{label:<14} {result.seconds:>7.2f}s  {rate / 1e6:>6.2f} M n-grams/s  "
+                    f"({rate / cores / 1e6:.2f} M/s/core，{result.records / result.seconds:,.0f} 条/s)"
+                )
+        finally:
+            index.close()
+
+    samples = _samples(args.samples, args.sample_words, leaks, args.leak_rate)
+    leaked = sum(1 for key, _ in samples if key[1])
+    result = results["探测 单进程"]
+    flagged = {key for key, *_ in result.flagged}
+    caught = sum(1 for key in flagged if key[1])
+    print(
+        f"检出 {caught:,}/{leaked:,}  误报 {len(flagged) - caught:,}  "
+        f"n-gram 命中率 {result.hits / result.ngrams:.4%}（含泄漏样本）"
+    )
+    print(f"进程峰值 RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:,.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+基准测试 — ExecutionHistory 二级索引 vs 全表过滤
+运行: cd backend && python -m benchmarks.bench_history_index [--executions 1000000]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from core.history import ExecutionHistory
+
+
+def _synthetic_executions(n: int, n_pipelines: int) -> list[dict]:
+    rng = random.Random(42)
+    start = datetime(2025, 1, 1)
+    step = timedelta(days=365) / n
+    executions = []
+    for i in range(n):
+        pid = f"pipeline_{rng.randrange(n_pipelines):03d}"
+        executions.append(
+            {
+                "id": f"{i:012x}",
+                "pipeline_id": pid,
+                "pipeline_name": pid,
+                "start_time": (start + step * i).isoformat(),
+                "duration_minutes": rng.randint(5, 180),
+                "status": "success" if rng.random() < 0.9 else "failed",
+                "rows_processed": rng.randint(0, 500000),
+                "cost_yuan": round(rng.uniform(1, 40), 2),
+                "owner": f"team_{rng.randrange(8)}",
+            }
+        )
+    executions.reverse()  # 与 generate_all 一致：最新在前
+    return executions
+
+
+def _timeit(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--executions", type=int, default=1_000_000)
+    parser.add_argument("--pipelines", type=int, default=50)
+    args = parser.parse_args()
+
+    executions = _synthetic_executions(args.executions, args.pipelines)
+    pipeline_ids = sorted({e["pipeline_id"] for e in executions})
+
+    t0 = time.perf_counter()
+    history = ExecutionHistory(executions, [])
+    build = time.perf_counter() - t0
+
+    def scan_list_pipelines():
+        for pid in pipeline_ids:
+            [e for e in executions if e["pipeline_id"] == pid][:30]
+
+    def index_list_pipelines():
+        for pid in pipeline_ids:
+            history.latest_executions(30, pipeline_id=pid)
+
+    def scan_pipeline_executions():
+        [e for e in executions if e["pipeline_id"] == pipeline_ids[0]][:50]
+
+    def index_pipeline_executions():
+        history.latest_executions(50, pipeline_id=pipeline_ids[0])
+
+    print(f"executions={args.executions:,} pipelines={len(pipeline_ids)}")
+    print(f"index build: {build * 1000:.0f} ms")
+    for name, scan, indexed in (
+        ("list_pipelines", scan_list_pipelines, index_list_pipelines),
+        ("pipeline_executions", scan_pipeline_executions, index_pipeline_executions),
+    ):
+        t_scan = _timeit(scan, repeat=1)
+        t_index = _timeit(indexed)
+        print(
+            f"{name:<22} scan {t_scan * 1000:>10.2f} ms   "
+            f"index {t_index * 1000:>8.3f} ms   x{t_scan / max(t_index, 1e-9):,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
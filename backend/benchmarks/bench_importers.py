@@ -0,0 +1,93 @@
+"""
+基准测试 — Agent 会话导入：逐条 auto_detect vs 签名缓存 vs 进程池 import_batch
+以 data/agent-samples 中的样例为模板，改写 id 扩增到指定条数（JSON 行）
+运行: cd backend && python -m benchmarks.bench_importers [--records 100000] [--workers 4]
+"""
+
+import argparse
+import gc
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+from agent_importers import IMPORT_CHUNK_SIZE, ImporterRegistry
+
+SAMPLES_DIR = Path(__file__).resolve().parent.parent / "data" / "agent-samples"
+
+
+def _synthetic_records(n: int) -> list[bytes]:
+    templates = [json.loads(p.read_text("utf-8")) for p in sorted(SAMPLES_DIR.glob("*.json"))]
+    records = []
+    for i in range(n):
+        raw = dict(templates[i % len(templates)])
+        for key in ("id", "trace_id"):
+            if key in raw:
+                raw[key] = f"{raw[key]}-{i}"
+        records.append(json.dumps(raw, ensure_ascii=False).encode("utf-8"))
+    return records
+
+
+def _timed(fn) -> tuple[float, str]:
+    """返回耗时与结果摘要；不保留结果，避免大列表拖慢后续轮次的 GC"""
+    gc.collect()
+    t0 = time.perf_counter()
+    out = fn()
+    elapsed = time.perf_counter() - t0
+    digest = hashlib.md5(
+        json.dumps(out, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    return elapsed, digest
+
+
+def _report(name: str, elapsed: float, base: float, n: int) -> None:
+    print(
+        f"  {name:<24} {elapsed * 1000:>9.0f} ms   "
+        f"{n / elapsed:>12,.0f} rec/s   x{base / elapsed:.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    records = _synthetic_records(args.records)
+    serial = ImporterRegistry(workers=1)
+    parallel = ImporterRegistry(workers=args.workers)
+    print(f"records={args.records:,} workers={args.workers} cpus={os.cpu_count()}")
+
+    # 1) 仅格式检测：每条跑全部 detect vs 按签名缓存
+    parsed = [json.loads(r) for r in records]
+    t_detect, d1 = _timed(lambda: [type(serial.auto_detect(r)).__name__ for r in parsed])
+    t_cached, d2 = _timed(lambda: [type(serial.detect_cached(r)).__name__ for r in parsed])
+    assert d1 == d2, "签名缓存的检测结果与 auto_detect 不一致"
+    parsed.clear()
+    print("detect only")
+    _report("auto_detect", t_detect, t_detect, args.records)
+    _report("signature cache", t_cached, t_detect, args.records)
+
+    # 2) 端到端（JSON 解析 + 检测 + 转换）
+    if args.workers > 1:
+        parallel.import_batch(records[: args.workers * args.chunk_size])  # 预热进程池
+    t_base, expected = _timed(lambda: [[True, serial.import_data(json.loads(r))] for r in records])
+    print("parse + detect + transform")
+    _report("import_data per record", t_base, t_base, args.records)
+    for name, fn in (
+        ("import_batch serial", lambda: serial.import_batch(records)),
+        (
+            "import_batch pool",
+            lambda: parallel.import_batch(records, chunk_size=args.chunk_size),
+        ),
+    ):
+        elapsed, digest = _timed(fn)
+        assert digest == expected, f"{name} 结果与逐条导入不一致"
+        _report(name, elapsed, t_base, args.records)
+    parallel.close()
+
+
+if __name__ == "__main__":
+    main()
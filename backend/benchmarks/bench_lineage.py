@@ -0,0 +1,109 @@
+"""
+性能报告 — 血缘图：每次请求线性查找重建（改造前）vs 配置加载时构建的邻接索引
+合成分层的 pipeline 配置（每个 pipeline 产出一张表，读 1~3 张更早层的表，
+部分带 dependencies），测量：
+  - 改造前 /api/lineage：每次请求遍历 PIPELINES，依赖用 next(...) 线性查找，O(P²)
+  - 构建 LineageGraph（仅配置加载时一次）
+  - 上游 / 下游闭包（不限深度与 depth=2）、子图、关键路径
+运行: cd backend && python -m benchmarks.bench_lineage [--tables 10000]
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from core.lineage import LineageGraph
+
+ROUNDS = 50
+
+
+def _pipelines(n: int, layers: int) -> list[dict]:
+    rng = random.Random(7)
+    per_layer = n // layers
+    pipelines = []
+    for i in range(n):
+        layer = i // per_layer
+        prefix = "ods" if layer == 0 else "dw" if layer < layers - 1 else "dm"
+        p = {
+            "id": f"p{i}",
+            "name": f"p{i}",
+            "status": "active",
+            "target_table": f"{prefix}_{i}",
+            "source_tables": [],
+            "dependencies": [],
+        }
+        if layer:
+            lo = (layer - 1) * per_layer
+            upstream = rng.sample(range(lo, layer * per_layer), rng.randint(1, 3))
+            p["source_tables"] = [pipelines[j]["target_table"] for j in upstream]
+            if rng.random() < 0.2:
+                p["dependencies"] = [f"p{rng.randrange(lo, layer * per_layer)}"]
+        pipelines.append(p)
+    return pipelines
+
+
+def _legacy_lineage(pipelines: list[dict]) -> dict:
+    """改造前 main.data_lineage 的实现"""
+    nodes = set()
+    edges = []
+    for p in pipelines:
+        target = p["target_table"]
+        nodes.add(target)
+        for src in p.get("source_tables", []):
+            nodes.add(src)
+            edges.append({"source": src, "target": target, "pipeline_id": p["id"]})
+        for dep_id in p.get("dependencies", []):
+            dep_pipe = next((pp for pp in pipelines if pp["id"] == dep_id), None)
+            if dep_pipe:
+                edges.append({"source": dep_pipe["target_table"], "target": target})
+    return {"nodes": sorted(nodes), "edges": edges}
+
+
+def _ms(fn, rounds: int = ROUNDS) -> tuple[float, float]:
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", type=int, default=10_000)
+    parser.add_argument("--layers", type=int, default=20)
+    args = parser.parse_args()
+
+    pipelines = _pipelines(args.tables, args.layers)
+    durations = {p["id"]: float(10 + i % 50) for i, p in enumerate(pipelines)}
+    t0 = time.perf_counter()
+    graph = LineageGraph(pipelines)
+    build = (time.perf_counter() - t0) * 1000
+    mid = pipelines[len(pipelines) // 2]["target_table"]
+    leaf = pipelines[-1]["target_table"]
+    root = pipelines[0]["target_table"]
+    print(
+        f"tables={len(graph.tables):,} edges={len(graph.edges):,} "
+        f"layers={args.layers}  构建 {build:.1f} ms（每次配置加载一次）"
+    )
+    print(f"下游闭包大小: {root} → {graph.closure(root)['count']:,} 张表")
+
+    cases = (
+        ("改造前 /api/lineage（每次请求）", lambda: _legacy_lineage(pipelines), 3),
+        ("/api/lineage（预构建）", graph.to_dict, ROUNDS),
+        ("下游闭包 ods 根表 不限深度", lambda: graph.closure(root), ROUNDS),
+        ("下游闭包 中间表 depth=2", lambda: graph.closure(mid, depth=2), ROUNDS),
+        ("上游闭包 dm 叶表 不限深度", lambda: graph.closure(leaf, False), ROUNDS),
+        ("子图 中间表 上下各 2 层", lambda: graph.subgraph(mid, 2, 2), ROUNDS),
+        ("关键路径 全图", lambda: graph.critical_path(durations), ROUNDS),
+        ("关键路径 到 dm 叶表", lambda: graph.critical_path(durations, leaf), ROUNDS),
+    )
+    for label, fn, rounds in cases:
+        p50, worst = _ms(fn, rounds)
+        print(f"{label:<28} p50 {p50:>9.2f} ms   max {worst:>9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
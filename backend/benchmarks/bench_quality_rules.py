@@ -0,0 +1,151 @@
+"""
+性能报告 — 质量规则引擎：逐行 Python 判断 vs 分块向量化
+合成一张订单表（order_id / amount / event_time，含少量空值、越界与重复），
+分块写成 Parquet、CSV 与 JSONL，测量：
+  - 逐行基线：JSONL 逐行 json.loads + Python 判断 null / range / 唯一性（set）/ 最大时间
+  - evaluate_table：同样 4 条规则一次读取、按块向量化（Parquet / CSV / JSONL）
+以及进程峰值 RSS（数据分块生成与读取，峰值与表行数无关）
+运行: cd backend && python -m benchmarks.bench_quality_rules [--rows 10000000]
+"""
+
+import argparse
+import json
+import resource
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from core.quality import CHUNK_ROWS, evaluate_table
+
+GEN_CHUNK = 1_000_000
+NOW = datetime(2026, 1, 1)
+
+
+def _rule(rid, check_type, column, **params):
+    return {
+        "id": rid,
+        "name": rid,
+        "target_table": "orders",
+        "pipeline_id": "orders",
+        "check_type": check_type,
+        "column": column,
+        "params": params,
+        "enabled": True,
+        "severity": "warning",
+        "threshold": 0.001,
+    }
+
+
+RULES = [
+    _rule("null", "null_check", "amount"),
+    _rule("range", "range_check", "amount", min=0.01, max=1_000_000),
+    _rule("unique", "uniqueness", "order_id"),
+    _rule("fresh", "freshness", "event_time", max_delay_hours=2),
+]
+
+
+def _chunks(rows: int):
+    rng = np.random.default_rng(11)
+    start = np.datetime64("2025-12-31T00:00:00")
+    for lo in range(0, rows, GEN_CHUNK):
+        n = min(GEN_CHUNK, rows - lo)
+        order_id = np.arange(lo, lo + n, dtype=np.int64)
+        order_id[rng.random(n) < 0.0005] -= 1  # 少量重复
+        amount = rng.uniform(1, 5000, n).round(2)
+        amount[rng.random(n) < 0.001] = np.nan
+        amount[rng.random(n) < 0.0005] = -1
+        event_time = start + rng.integers(0, 86_400, n).astype("timedelta64[s]")
+        yield order_id, amount, event_time
+
+
+def _write(directory: Path, rows: int) -> dict[str, Path]:
+    import pyarrow as pa
+    import pyarrow.csv as arrow_csv
+    import pyarrow.parquet as pq
+
+    paths = {fmt: directory / f"orders.{fmt}" for fmt in ("parquet", "csv", "jsonl")}
+    writer = None
+    with open(paths["csv"], "wb") as csv_file, open(paths["jsonl"], "w") as jsonl_file:
+        for i, (order_id, amount, event_time) in enumerate(_chunks(rows)):
+            table = pa.table(
+                {
+                    "order_id": order_id,
+                    "amount": pa.array(amount, from_pandas=True),
+                    "event_time": event_time,
+                }
+            )
+            if writer is None:
+                writer = pq.ParquetWriter(paths["parquet"], table.schema)
+            writer.write_table(table)
+            arrow_csv.write_csv(table, csv_file, arrow_csv.WriteOptions(include_header=i == 0))
+            times = np.datetime_as_string(event_time).tolist()
+            for oid, amt, ts in zip(order_id.tolist(), amount.tolist(), times):
+                amt = None if amt != amt else amt
+                jsonl_file.write(
+                    json.dumps({"order_id": oid, "amount": amt, "event_time": ts}) + "\n"
+                )
+    writer.close()
+    return paths
+
+
+def _row_by_row(path: Path) -> dict:
+    nulls = out_of_range = duplicates = 0
+    seen = set()
+    latest = ""
+    with open(path) as f:
+        for line in f:
+            row = json.loads(line)
+            amount = row["amount"]
+            if amount is None:
+                nulls += 1
+            elif not 0.01 <= amount <= 1_000_000:
+                out_of_range += 1
+            if row["order_id"] in seen:
+                duplicates += 1
+            seen.add(row["order_id"])
+            latest = max(latest, row["event_time"])
+    return {"null": nulls, "range": out_of_range, "unique": duplicates, "latest": latest}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-quality-") as tmp:
+        t0 = time.perf_counter()
+        paths = _write(Path(tmp), args.rows)
+        sizes = "  ".join(f"{fmt} {p.stat().st_size / 1e6:,.0f} MB" for fmt, p in paths.items())
+        print(f"rows={args.rows:,}  生成 {time.perf_counter() - t0:.1f}s  {sizes}")
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+        results = {}
+        for fmt, path in paths.items():
+            t0 = time.perf_counter()
+            result = evaluate_table(path, RULES, now=NOW, chunk_rows=args.chunk_rows)
+            results[fmt] = (time.perf_counter() - t0, result["details"])
+        # 向量化执行先于逐行基线（基线的 set 会抬高峰值 RSS）
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+        t0 = time.perf_counter()
+        baseline = _row_by_row(paths["jsonl"])
+        t_base = time.perf_counter() - t0
+        print(
+            f"{'逐行 Python（JSONL）':<24} {t_base:>8.2f}s  {args.rows / t_base / 1e6:>6.2f} M 行/s"
+        )
+        for fmt, (elapsed, details) in results.items():
+            assert all(details[k]["violations"] == baseline[k] for k in ("null", "range", "unique"))
+            assert details["fresh"]["latest"] == baseline["latest"]
+            print(
+                f"{'向量化 ' + fmt:<24} {elapsed:>8.2f}s  {args.rows / elapsed / 1e6:>6.2f} M 行/s"
+                f"   x{t_base / elapsed:.1f}"
+            )
+        print(f"进程峰值 RSS：生成数据后 {rss_before:,.0f} MB，执行规则后 {rss_after:,.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+性能报告 — 标注样本：YAML 内联整体加载（改造前）vs 样本库（JSONL 导入 + 按需读取）
+生成 N 个带 4 条候选回复的样本，分别测量：
+  - 改造前：yaml.safe_load 整个文件（启动与每次热重载都要做一次）及常驻内存
+  - 样本库：首次导入、文件未变化时的同步（重载路径）、按 ID 随机读取、翻页
+运行: cd backend && python -m benchmarks.bench_sample_store [--samples 20000]
+"""
+
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import yaml
+
+from core.sample_store import SampleStore
+from core.sqlite_pool import SQLitePool
+
+TASK_ID = "AT-BENCH"
+LOOKUPS = 2000
+
+
+def _samples(n: int) -> list[dict]:
+    filler = "这是一段较长的候选回复，用于模拟真实 RLHF 样本中的长文本。" * 6
+    return [
+        {
+            "id": f"S{i:07d}",
+            "prompt": f"第 {i} 个问题：请解释一个概念并给出示例。",
+            "domain": ("code", "math", "science")[i % 3],
+            "difficulty": ("easy", "medium", "hard")[i % 3],
+            "responses": [
+                {"model": f"model-{k}", "text": f"{filler}（回复 {k}）"} for k in range(4)
+            ],
+        }
+        for i in range(n)
+    ]
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - t0
+
+
+def _peak_mb(fn) -> float:
+    """fn 执行期间的 Python 堆峰值（tracemalloc 会显著拖慢执行，单独测量）"""
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=5_000)
+    parser.add_argument(
+        "--skip-yaml", action="store_true", help="样本很多时 YAML 解析可能需要数分钟"
+    )
+    parser.add_argument("--memory", action="store_true", help="额外测量峰值内存")
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_samples_"))
+    samples = _samples(args.samples)
+    sample_dir = tmp / "annotation-samples"
+    sample_dir.mkdir()
+    jsonl = sample_dir / f"{TASK_ID}.jsonl"
+    with open(jsonl, "w", encoding="utf-8") as f:
+        for sample in samples:
+            f.write(json.dumps(sample, ensure_ascii=False) + "\n")
+    print(f"samples={args.samples:,} JSONL={jsonl.stat().st_size / 1e6:.1f} MB")
+
+    if not args.skip_yaml:
+        yaml_path = tmp / "annotation.yaml"
+        with open(yaml_path, "w", encoding="utf-8") as f:
+            yaml.safe_dump({"annotation_samples": {TASK_ID: samples}}, f, allow_unicode=True)
+
+        def load():
+            return yaml.safe_load(yaml_path.read_text("utf-8"))
+
+        _, t_yaml = _timed(load)
+        memory = f"  峰值内存 {_peak_mb(load):,.0f} MB" if args.memory else ""
+        print(f"改造前  yaml.safe_load {t_yaml:>8.2f}s{memory}（启动与每次重载）")
+    del samples
+
+    pool = SQLitePool(tmp / "samples.db")
+    store = SampleStore(pool)
+    conn = pool.connection()
+    store.init_schema(conn)
+    _, t_ingest = _timed(lambda: store.sync_dir(sample_dir))
+    _, t_sync = _timed(lambda: store.sync_dir(sample_dir))
+    memory = ""
+    if args.memory:
+        # 改动文件指纹后再导入一次，测量整体替换的峰值内存
+        jsonl.touch()
+        memory = f"  峰值内存 {_peak_mb(lambda: store.sync_dir(sample_dir)):,.0f} MB"
+    print(f"样本库  首次导入       {t_ingest:>8.2f}s{memory}")
+    print(f"样本库  重载（未变化）{t_sync * 1000:>9.2f}ms")
+
+    ids = [f"S{random.randrange(args.samples):07d}" for _ in range(LOOKUPS)]
+    latencies = []
+    for sid in ids:
+        t0 = time.perf_counter()
+        store.get(conn, TASK_ID, sid)
+        latencies.append(time.perf_counter() - t0)
+    latencies.sort()
+    print(
+        f"样本库  按 ID 读取     p50 {statistics.median(latencies) * 1e6:.0f}µs  "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.0f}µs"
+    )
+    mid = (args.samples // 2, f"S{args.samples // 2:07d}")
+    _, t_page = _timed(lambda: store.page(conn, TASK_ID, 50, after=mid))
+    print(f"样本库  中间位置翻页 50 条 {t_page * 1000:.2f}ms")
+    pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
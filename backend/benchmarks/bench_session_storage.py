@@ -0,0 +1,134 @@
+"""
+压缩报告 — Agent 会话 messages：整段 JSON vs 长文本块去重 + 骨架压缩（无字典 / 训练字典）
+以 data/agent-samples 为模板扩增：用户提问每条不同，工具输出约 7 成与模板相同
+（重复查询），其余数值随编号变化，模拟真实轨迹中的部分重复。
+运行: cd backend && python -m benchmarks.bench_session_storage [--sessions 50000]
+"""
+
+import argparse
+import json
+import re
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from agent_importers import ImporterRegistry
+from agent_storage import pack_messages
+from core.blob_store import TRAIN_SAMPLE_LIMIT, BlobStore
+
+SAMPLES_DIR = Path(__file__).resolve().parent.parent / "data" / "agent-samples"
+_NUMBER_RE = re.compile(r"\d+")
+
+
+def _synthetic_sessions(n: int) -> list[list[dict]]:
+    registry = ImporterRegistry(workers=1)
+    templates = [
+        registry.import_data(json.loads(p.read_text("utf-8")))["messages"]
+        for p in sorted(SAMPLES_DIR.glob("*.json"))
+    ]
+    sessions = []
+    for i in range(n):
+        messages = []
+        for message in templates[i % len(templates)]:
+            message = dict(message)
+            if message["role"] == "user":
+                message["content"] = f"{message['content']}（第 {i} 次）"
+            elif message["role"] == "tool" and i % 10 >= 7:
+                message["content"] = _NUMBER_RE.sub(
+                    lambda m: str(int(m.group()) + i % 50), message["content"]
+                )
+            messages.append(message)
+        sessions.append(messages)
+    return sessions
+
+
+def _db_bytes(conn: sqlite3.Connection) -> int:
+    pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return (pages - free) * conn.execute("PRAGMA page_size").fetchone()[0]
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _mb(n: int) -> str:
+    return f"{n / 1e6:>8.2f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=50_000)
+    args = parser.parse_args()
+
+    sessions = _synthetic_sessions(args.sessions)
+    tmp = Path(tempfile.mkdtemp(prefix="bench_storage_"))
+
+    legacy = _connect(tmp / "legacy.db")
+    legacy.execute("CREATE TABLE s (id INTEGER PRIMARY KEY, messages TEXT NOT NULL)")
+    t0 = time.perf_counter()
+    with legacy:
+        legacy.executemany(
+            "INSERT INTO s (messages) VALUES (?)",
+            ((json.dumps(m, ensure_ascii=False),) for m in sessions),
+        )
+    t_legacy = time.perf_counter() - t0
+    raw_bytes = legacy.execute("SELECT SUM(length(CAST(messages AS BLOB))) FROM s").fetchone()[0]
+
+    store = BlobStore("session_blobs")
+    packed = _connect(tmp / "blobs.db")
+    store.init_schema(packed)
+    packed.execute("CREATE TABLE s (id INTEGER PRIMARY KEY, payload BLOB NOT NULL)")
+
+    def write_all() -> float:
+        # 与 agent_annotation._pack_payload 相同：长文本入块表，骨架整体压缩
+        packed.execute("DELETE FROM s")
+        packed.execute(f"DELETE FROM {store.table}")
+        t0 = time.perf_counter()
+        with packed:
+            for messages in sessions:
+                skeleton, blobs = pack_messages(messages)
+                store.put(packed, blobs)
+                raw = json.dumps(skeleton, ensure_ascii=False).encode("utf-8")
+                packed.execute("INSERT INTO s (payload) VALUES (?)", (store.encode(packed, raw),))
+        elapsed = time.perf_counter() - t0
+        packed.execute("VACUUM")
+        return elapsed
+
+    def measure(name: str, elapsed: float) -> None:
+        blob_stats = store.stats(packed)
+        skeleton = packed.execute("SELECT SUM(length(payload)) FROM s").fetchone()[0]
+        payload = skeleton + blob_stats["stored_bytes"]
+        print(
+            f"{name:<20}{_mb(payload)}{_mb(_db_bytes(packed))}"
+            f"{raw_bytes / payload:>8.1f}x{elapsed:>9.1f}s"
+            f"   骨架 {_mb(skeleton)}  块 {blob_stats['blobs']:,} 个"
+            f" / 引用 {blob_stats['refs']:,}"
+        )
+
+    print(f"sessions={args.sessions:,}")
+    print(f"{'':<22}{'payload':>11}{'DB 文件':>13}{'压缩比':>9}{'写入':>10}")
+    print(
+        f"{'整段 JSON（改造前）':<20}{_mb(raw_bytes)}{_mb(_db_bytes(legacy))}"
+        f"{1:>8.1f}x{t_legacy:>9.1f}s"
+    )
+    measure("块去重 + 骨架（无字典）", write_all())
+
+    # 训练样本与 agent_annotation._train_dictionary 一致：块与骨架各一半
+    samples = store.sample(packed, TRAIN_SAMPLE_LIMIT // 2) + [
+        store.decode(packed, r["payload"])
+        for r in packed.execute(
+            "SELECT payload FROM s ORDER BY random() LIMIT ?",
+            (TRAIN_SAMPLE_LIMIT // 2,),
+        )
+    ]
+    with packed:
+        trained = store.train(packed, samples=samples)
+    measure(f"同上 + 字典 {trained['dict_size'] / 1024:.0f}KB", write_all())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+吞吐报告 — 标注提交在不同突发规模下：逐条提交（每个请求一个事务）vs 写线程组提交
+逐条提交模拟改造前：每个请求在自己的线程里 BEGIN IMMEDIATE → 插入 → COMMIT，
+并发请求互相争抢写锁（超过 busy_timeout 即 "database is locked"）。
+组提交：同一突发的请求全部交给 AsyncSQLite，由写线程按时间窗口/批大小合并提交。
+运行: cd backend && python -m benchmarks.bench_write_coalescing [--rows 4000] [--synchronous FULL]
+"""
+
+import argparse
+import asyncio
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import rlhf_annotation
+from core.async_db import AsyncSQLite
+from core.sqlite_pool import SQLitePool
+
+TASK = {"id": "AT-BENCH", "task_type": "kto_binary", "status": "active"}
+BURSTS = (1, 8, 32, 128, 512)
+
+
+def _submissions(n: int, offset: int) -> list[dict]:
+    return [
+        rlhf_annotation._build_submission(
+            TASK,
+            {"id": f"S{offset + i:07d}", "prompt": "p"},
+            {"feedback": "good", "annotator": f"user{i % 20}"},
+        )
+        for i in range(n)
+    ]
+
+
+def _fresh_pool(tmp: Path, name: str, synchronous: str, busy_ms: int) -> SQLitePool:
+    pool = SQLitePool(
+        tmp / f"{name}.db",
+        pragmas={"synchronous": synchronous, "busy_timeout": busy_ms},
+    )
+    rlhf_annotation._ann_pool = pool
+    rlhf_annotation._init_ann_db()
+    return pool
+
+
+def _per_row(pool: SQLitePool, burst: int, rows: int) -> tuple[float, int]:
+    """每个请求一个事务，burst 个线程同时提交；返回 (耗时, locked 错误数)"""
+    locked = 0
+
+    def one(sub):
+        nonlocal locked
+        try:
+            with pool.transaction(immediate=True) as conn:
+                rlhf_annotation._submit_tx(conn, TASK["id"], sub)
+        except sqlite3.OperationalError:
+            locked += 1
+
+    with ThreadPoolExecutor(max_workers=burst) as executor:
+        t0 = time.perf_counter()
+        for offset in range(0, rows, burst):
+            list(executor.map(one, _submissions(burst, offset)))
+        return time.perf_counter() - t0, locked
+
+
+def _coalesced(pool: SQLitePool, burst: int, rows: int) -> tuple[float, dict]:
+    dal = AsyncSQLite(pool)
+
+    async def run():
+        t0 = time.perf_counter()
+        for offset in range(0, rows, burst):
+            await asyncio.gather(
+                *(
+                    dal.write(rlhf_annotation._submit_tx, TASK["id"], sub)
+                    for sub in _submissions(burst, offset)
+                )
+            )
+        return time.perf_counter() - t0
+
+    elapsed = asyncio.run(run())
+    dal.close()
+    return elapsed, dal.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=4096, help="每种突发规模的提交总数")
+    parser.add_argument("--synchronous", default="NORMAL", help="NORMAL / FULL")
+    parser.add_argument("--busy-ms", type=int, default=5000)
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_coalesce_"))
+    print(f"rows/burst-size={args.rows:,} synchronous={args.synchronous}")
+    print(
+        f"{'burst':>6}{'逐条 rows/s':>14}{'locked':>8}"
+        f"{'组提交 rows/s':>15}{'commits':>9}{'avg batch':>11}{'speedup':>9}"
+    )
+    for burst in BURSTS:
+        rows = args.rows - args.rows % burst
+        pool = _fresh_pool(tmp, f"row{burst}", args.synchronous, args.busy_ms)
+        t_row, locked = _per_row(pool, burst, rows)
+        pool.close_all()
+        pool = _fresh_pool(tmp, f"group{burst}", args.synchronous, args.busy_ms)
+        t_group, stats = _coalesced(pool, burst, rows)
+        pool.close_all()
+        print(
+            f"{burst:>6}{rows / t_row:>14,.0f}{locked:>8}"
+            f"{rows / t_group:>15,.0f}{stats['commits']:>9,}"
+            f"{stats['avg_batch']:>11.1f}{t_row / t_group:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+SQLite 异步访问层 — 单写线程 + 读线程池，async 路由不在事件循环上执行阻塞的 sqlite3 调用
+写：write() 把操作放入队列，由唯一的写线程执行。写线程取到第一个操作后继续收集
+后续操作，直到凑满 max_batch 个、距第一个操作超过 max_delay 秒，或队列空闲超过
+max_idle 秒（突发已结束，单个请求不必白等整个窗口），然后在一个 BEGIN IMMEDIATE
+事务里依次执行并统一提交（组提交）：突发流量越大，每次提交分摊的加锁与落盘越少；
+每个操作包在 SAVEPOINT 中，抛出异常只回滚它自己，异常原样交还给调用方。
+结果在提交成功后才交付，调用方拿到结果即代表数据已写入。
+读：read() 在读线程池中执行，每个线程复用 SQLitePool 的线程本地连接，WAL 下读写互不阻塞。
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from core.sqlite_pool import SQLitePool
+
+DEFAULT_READERS = 8
+DEFAULT_MAX_BATCH = 64  # 单个组提交事务最多包含的写操作数
+DEFAULT_MAX_DELAY = 0.002  # 收到第一个写操作后最多继续收集的时间窗口（秒）
+DEFAULT_MAX_IDLE = 0.0002  # 队列空闲超过该时长即提前刷新（秒）
+
+# 写操作：fn(conn, *args)，在写线程的事务内执行
+WriteFn = Callable[..., Any]
+_STOP = object()
+
+
+class AsyncSQLite:
+    """一个数据库文件对应一个实例；写线程在第一次写入时启动"""
+
+    def __init__(
+        self,
+        pool: SQLitePool,
+        readers: int = DEFAULT_READERS,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        max_idle: float = DEFAULT_MAX_IDLE,
+    ):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_idle = max_idle
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="sqlite-reader")
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats = {"commits": 0, "writes": 0, "largest_batch": 0, "full_batches": 0}
+
+    # ---- 读 ----
+
+    async def read(self, fn: Callable[..., Any], *args) -> Any:
+        """在读线程池中执行 fn(conn, *args)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, self._call_read, fn, args)
+
+    def _call_read(self, fn: Callable[..., Any], args: tuple) -> Any:
+        return fn(self.pool.connection(), *args)
+
+    # ---- 写 ----
+
+    def submit(self, fn: WriteFn, *args) -> Future:
+        """线程安全地提交写操作，返回 concurrent.futures.Future"""
+        future: Future = Future()
+        if threading.current_thread() is self._writer:
+            # 写操作内部再发起写入：直接在当前事务中执行，避免等待自己
+            future.set_result(fn(self.pool.connection(), *args))
+            return future
+        self._ensure_writer()
+        self._queue.put((fn, args, future))
+        return future
+
+    async def write(self, fn: WriteFn, *args) -> Any:
+        """提交写操作并等待其所在的组提交完成"""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def write_sync(self, fn: WriteFn, *args) -> Any:
+        """同步路由（线程池中）使用的阻塞版本"""
+        return self.submit(fn, *args).result()
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None:
+            return
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                self._writer.start()
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                return
+            batch = [job]
+            stop = False
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = min(deadline - time.monotonic(), self.max_idle)
+                try:
+                    if remaining > 0:
+                        job = self._queue.get(timeout=remaining)
+                    else:
+                        job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is _STOP:
+                    stop = True
+                    break
+                batch.append(job)
+            self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch: list[tuple]) -> None:
+        outcomes: list[tuple[Future, bool, Any]] = []
+        try:
+            with self.pool.transaction(immediate=True) as conn:
+                for fn, args, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    conn.execute("SAVEPOINT write_job")
+                    try:
+                        value = fn(conn, *args)
+                    except Exception as exc:
+                        conn.execute("ROLLBACK TO write_job")
+                        conn.execute("RELEASE write_job")
+                        outcomes.append((future, False, exc))
+                    else:
+                        conn.execute("RELEASE write_job")
+                        outcomes.append((future, True, value))
+        except Exception as exc:
+            # BEGIN / COMMIT 本身失败：整批都未写入
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        self._stats["commits"] += 1
+        self._stats["writes"] += len(outcomes)
+        self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+        self._stats["full_batches"] += len(batch) >= self.max_batch
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def stats(self) -> dict:
+        """组提交统计：提交次数、写操作数、平均/最大批大小、凑满 max_batch 的次数"""
+        stats = dict(self._stats)
+        stats["avg_batch"] = round(stats["writes"] / max(stats["commits"], 1), 2)
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+    def close(self) -> None:
+        """等待队列中已提交的写操作完成后停止写线程与读线程池"""
+        with self._lock:
+            writer = self._writer
+            if writer is not None:
+                self._queue.put(_STOP)
+        if writer is not None:
+            writer.join()
+            self._writer = None
+        self._readers.shutdown(wait=True)
@@ -0,0 +1,304 @@
+"""
+内容寻址文本块存储 — 相同内容只存一份，deflate 压缩并可使用训练得到的预置字典
+块以内容哈希（blake2b-128）为主键，refs 记录引用它的对象数，归零即删除。
+字典按 dict_id 版本化，每个块记录压缩时用的字典，更换字典后旧块仍可解压。
+所有写操作都在调用方的事务内执行，与引用方的行一起提交。
+"""
+
+import hashlib
+import re
+import sqlite3
+import struct
+import zlib
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, Iterator, Mapping, Optional
+
+DICT_SIZE = 32 * 1024  # deflate 窗口为 32KB，更长的字典用不上
+COMPRESS_LEVEL = 6
+TRAIN_SAMPLE_LIMIT = 5000
+TRAIN_MAX_NGRAM = 4  # 字典候选最多由几个相邻片段组成
+TRAIN_MIN_SEGMENT = 4
+SQL_IN_CHUNK = 500  # 单条 IN (...) 查询的参数数上限
+
+CODEC_RAW = 0
+CODEC_DEFLATE = 1
+
+# encode() 产出的自描述字节串头部：codec, dict_id
+_HEADER = struct.Struct("<BI")
+
+# 按 JSON/文本的常见分隔符切片，片段边界由内容决定，不同样本中的相同片段能对齐
+_SEGMENT_RE = re.compile(rb"[^,:;{}\[\]\n\"]*[,:;{}\[\]\n\"]?")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def train_dictionary(samples: Iterable[bytes], size: int = DICT_SIZE) -> bytes:
+    """从样本中挑出跨样本重复的片段拼成 deflate 预置字典
+
+    思路同 zstd 的 COVER：按分隔符切片后，取 1~TRAIN_MAX_NGRAM 个相邻片段组成
+    候选，按 (出现样本数 × 长度) 打分；只出现在一个样本里的不入选，已被选中
+    内容包含的子串跳过。得分高的放在字典末尾，离待压缩数据最近、回溯距离短。
+    """
+    counts: Counter = Counter()
+    for sample in samples:
+        pieces = [p for p in _SEGMENT_RE.findall(sample) if p]
+        seen = set()
+        for n in range(1, TRAIN_MAX_NGRAM + 1):
+            for i in range(len(pieces) - n + 1):
+                candidate = b"".join(pieces[i : i + n])
+                if len(candidate) >= TRAIN_MIN_SEGMENT:
+                    seen.add(candidate)
+        counts.update(seen)
+
+    ranked = sorted(
+        (seg for seg, n in counts.items() if n >= 2),
+        key=lambda seg: (counts[seg] * len(seg), seg),
+        reverse=True,
+    )
+    chosen: list[bytes] = []
+    total = 0
+    for seg in ranked:
+        if total + len(seg) > size or any(seg in c for c in chosen):
+            continue
+        chosen.append(seg)
+        total += len(seg)
+    return b"".join(reversed(chosen))
+
+
+def _chunks(items: list, size: int = SQL_IN_CHUNK) -> Iterator[list]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+class BlobStore:
+    """SQLite 中的一张块表 + 一张字典表，表名由 table 参数决定"""
+
+    def __init__(self, table: str = "blobs"):
+        self.table = table
+        self.dict_table = f"{table}_dicts"
+        self._dicts: dict[int, bytes] = {0: b""}
+        # 已载入字典的压缩/解压对象，用时 copy()：比每次带 zdict 新建快一个数量级
+        self._compressors: dict[int, "zlib._Compress"] = {}
+        self._decompressors: dict[int, "zlib._Decompress"] = {}
+
+    def init_schema(self, conn: sqlite3.Connection) -> None:
+        conn.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                hash TEXT PRIMARY KEY,
+                codec INTEGER NOT NULL,
+                dict_id INTEGER NOT NULL DEFAULT 0,
+                raw_size INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                refs INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS {self.dict_table} (
+                dict_id INTEGER PRIMARY KEY,
+                data BLOB NOT NULL,
+                sample_count INTEGER NOT NULL,
+                created_at TEXT NOT NULL
+            );
+            """
+        )
+
+    # ---- 字典 ----
+
+    def current_dict_id(self, conn: sqlite3.Connection) -> int:
+        row = conn.execute(f"SELECT MAX(dict_id) FROM {self.dict_table}").fetchone()
+        return row[0] or 0
+
+    def _dictionary(self, conn: sqlite3.Connection, dict_id: int) -> bytes:
+        zdict = self._dicts.get(dict_id)
+        if zdict is None:
+            row = conn.execute(
+                f"SELECT data FROM {self.dict_table} WHERE dict_id = ?", (dict_id,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(f"压缩字典 {dict_id} 不存在")
+            zdict = self._dicts[dict_id] = bytes(row[0])
+        return zdict
+
+    def sample(self, conn: sqlite3.Connection, limit: int = TRAIN_SAMPLE_LIMIT) -> list[bytes]:
+        """随机抽取已有块的原文，作为字典训练样本"""
+        return [
+            self._decode(conn, r)
+            for r in conn.execute(
+                f"SELECT codec, dict_id, data FROM {self.table} ORDER BY random() LIMIT ?",
+                (limit,),
+            )
+        ]
+
+    def train(
+        self,
+        conn: sqlite3.Connection,
+        samples: Optional[list[bytes]] = None,
+        recompress: bool = False,
+    ) -> dict:
+        """训练新字典（默认用 sample() 抽样），之后写入的数据使用新字典
+
+        recompress=True 时把块表中全部已有块用新字典重新压缩（大库耗时较长）；
+        encode() 产出、存放在别处的数据由调用方自行重写。
+        """
+        if samples is None:
+            samples = self.sample(conn)
+        zdict = train_dictionary(samples)
+        if not zdict:
+            return {"dict_id": self.current_dict_id(conn), "trained": False}
+        cur = conn.execute(
+            f"INSERT INTO {self.dict_table} (data, sample_count, created_at) VALUES (?, ?, ?)",
+            (zdict, len(samples), datetime.now().isoformat()),
+        )
+        dict_id = cur.lastrowid
+        self._dicts[dict_id] = zdict
+        recompressed = self._recompress(conn, dict_id) if recompress else 0
+        return {
+            "dict_id": dict_id,
+            "trained": True,
+            "dict_size": len(zdict),
+            "samples": len(samples),
+            "recompressed": recompressed,
+        }
+
+    def _recompress(self, conn: sqlite3.Connection, dict_id: int) -> int:
+        rows = conn.execute(
+            f"SELECT hash, codec, dict_id, data FROM {self.table} WHERE dict_id != ?",
+            (dict_id,),
+        ).fetchall()
+        updates = []
+        for r in rows:
+            codec, data = self._encode(conn, self._decode(conn, r), dict_id)
+            updates.append((codec, dict_id, data, r["hash"]))
+        conn.executemany(
+            f"UPDATE {self.table} SET codec = ?, dict_id = ?, data = ? WHERE hash = ?",
+            updates,
+        )
+        return len(updates)
+
+    # ---- 编解码 ----
+
+    def _compressor(self, conn: sqlite3.Connection, dict_id: int):
+        primed = self._compressors.get(dict_id)
+        if primed is None:
+            # 原始 deflate 流（wbits=-15）：没有 zlib 头尾，小块也不多付 6 字节
+            zdict = self._dictionary(conn, dict_id)
+            args = (COMPRESS_LEVEL, zlib.DEFLATED, -15)
+            primed = zlib.compressobj(*args, zdict=zdict) if zdict else zlib.compressobj(*args)
+            self._compressors[dict_id] = primed
+        return primed.copy()
+
+    def _decompressor(self, conn: sqlite3.Connection, dict_id: int):
+        primed = self._decompressors.get(dict_id)
+        if primed is None:
+            zdict = self._dictionary(conn, dict_id)
+            primed = zlib.decompressobj(-15, zdict=zdict) if zdict else zlib.decompressobj(-15)
+            self._decompressors[dict_id] = primed
+        return primed.copy()
+
+    def _encode(self, conn: sqlite3.Connection, raw: bytes, dict_id: int) -> tuple[int, bytes]:
+        c = self._compressor(conn, dict_id)
+        packed = c.compress(raw) + c.flush()
+        if len(packed) < len(raw):
+            return CODEC_DEFLATE, packed
+        return CODEC_RAW, raw
+
+    def _decode(self, conn: sqlite3.Connection, row) -> bytes:
+        return self._decode_raw(conn, row["codec"], row["dict_id"], bytes(row["data"]))
+
+    def _decode_raw(self, conn: sqlite3.Connection, codec: int, dict_id: int, data: bytes) -> bytes:
+        if codec == CODEC_RAW:
+            return data
+        d = self._decompressor(conn, dict_id)
+        return d.decompress(data) + d.flush()
+
+    def encode(self, conn: sqlite3.Connection, raw: bytes) -> bytes:
+        """用当前字典压缩，产出带 (codec, dict_id) 头的字节串，供块表之外的列存放"""
+        dict_id = self.current_dict_id(conn)
+        codec, data = self._encode(conn, raw, dict_id)
+        return _HEADER.pack(codec, dict_id) + data
+
+    def decode(self, conn: sqlite3.Connection, packed: bytes) -> bytes:
+        codec, dict_id = _HEADER.unpack_from(packed)
+        return self._decode_raw(conn, codec, dict_id, bytes(packed[_HEADER.size :]))
+
+    # ---- 读写 ----
+
+    def put(self, conn: sqlite3.Connection, blobs: Mapping[str, str]) -> None:
+        """为 {hash: 文本} 中每个块增加一次引用，库中没有的先压缩写入"""
+        if not blobs:
+            return
+        hashes = list(blobs)
+        existing = set()
+        for chunk in _chunks(hashes):
+            marks = ",".join("?" * len(chunk))
+            existing.update(
+                r[0]
+                for r in conn.execute(
+                    f"SELECT hash FROM {self.table} WHERE hash IN ({marks})", chunk
+                )
+            )
+        dict_id = self.current_dict_id(conn)
+        rows = []
+        for h in hashes:
+            if h in existing:
+                continue
+            raw = blobs[h].encode("utf-8")
+            codec, data = self._encode(conn, raw, dict_id)
+            rows.append((h, codec, dict_id, len(raw), data))
+        # 并发写入同一新块时 ON CONFLICT 保证只存一份，引用数统一在下面累加
+        conn.executemany(
+            f"INSERT INTO {self.table} (hash, codec, dict_id, raw_size, data) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT(hash) DO NOTHING",
+            rows,
+        )
+        conn.executemany(
+            f"UPDATE {self.table} SET refs = refs + 1 WHERE hash = ?",
+            [(h,) for h in hashes],
+        )
+
+    def release(self, conn: sqlite3.Connection, hashes: Iterable[str]) -> None:
+        """每个块减少一次引用，无人引用的块删除"""
+        hashes = list(set(hashes))
+        if not hashes:
+            return
+        conn.executemany(
+            f"UPDATE {self.table} SET refs = refs - 1 WHERE hash = ?",
+            [(h,) for h in hashes],
+        )
+        for chunk in _chunks(hashes):
+            marks = ",".join("?" * len(chunk))
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE refs <= 0 AND hash IN ({marks})",
+                chunk,
+            )
+
+    def get(self, conn: sqlite3.Connection, hashes: Iterable[str]) -> dict[str, str]:
+        """按哈希批量读取并解压，返回 {hash: 文本}"""
+        result: dict[str, str] = {}
+        for chunk in _chunks(list(set(hashes))):
+            marks = ",".join("?" * len(chunk))
+            for r in conn.execute(
+                f"SELECT hash, codec, dict_id, data FROM {self.table} WHERE hash IN ({marks})",
+                chunk,
+            ):
+                result[r["hash"]] = self._decode(conn, r).decode("utf-8")
+        return result
+
+    def stats(self, conn: sqlite3.Connection) -> dict:
+        """块数、原始/压缩后字节数，以及去重前的逻辑字节数（原始大小 × 引用数）"""
+        row = conn.execute(
+            f"""SELECT COUNT(*) AS blobs,
+                       COALESCE(SUM(refs), 0) AS refs,
+                       COALESCE(SUM(raw_size), 0) AS raw_bytes,
+                       COALESCE(SUM(length(data)), 0) AS stored_bytes,
+                       COALESCE(SUM(raw_size * refs), 0) AS logical_bytes,
+                       COALESCE(SUM(codec = {CODEC_DEFLATE}), 0) AS compressed_blobs
+                FROM {self.table}"""
+        ).fetchone()
+        stats = dict(row)
+        stats["dict_id"] = self.current_dict_id(conn)
+        stats["dedup_ratio"] = round(stats["logical_bytes"] / max(stats["raw_bytes"], 1), 2)
+        stats["compression_ratio"] = round(stats["raw_bytes"] / max(stats["stored_bytes"], 1), 2)
+        return stats
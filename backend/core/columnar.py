@@ -0,0 +1,211 @@
+"""
+列式表与向量化分组 — 大量记录的分析查询用 NumPy 数组代替 dict 列表
+数值列为定长 NumPy 数组，字符串维度列存为整数编码（Categories 维护 编码 ↔ 取值），
+时间列为 datetime64。追加按容量倍增摊还为 O(1)；查询先用布尔掩码过滤，
+再把各分组键的编码合成一个整数键，用 np.bincount 一次完成计数与求和。
+"""
+
+from typing import Iterable, Mapping, Sequence
+
+import numpy as np
+
+CATEGORY = "category"
+_INITIAL_CAPACITY = 1024
+# 分组键组合数不超过该值时直接 bincount，否则先 np.unique 压缩
+_DENSE_GROUP_LIMIT = 1 << 20
+
+
+class Categories:
+    """字符串维度的编码表，编码按首次出现顺序分配且不会改变"""
+
+    def __init__(self):
+        self.labels: list[str] = []
+        self._codes: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def code(self, label: str) -> int:
+        """已有取值的编码，未出现过的返回 -1"""
+        return self._codes.get(label, -1)
+
+    def encode(self, labels: Iterable[str]) -> np.ndarray:
+        codes = self._codes
+        out = []
+        for label in labels:
+            code = codes.get(label)
+            if code is None:
+                code = codes[label] = len(self.labels)
+                self.labels.append(label)
+            out.append(code)
+        return np.asarray(out, dtype=np.int32)
+
+
+class ColumnTable:
+    """只追加的列式表；schema 为 {列名: dtype 或 CATEGORY}"""
+
+    def __init__(self, schema: Mapping[str, str]):
+        self.schema = dict(schema)
+        self.categories = {name: Categories() for name, kind in schema.items() if kind == CATEGORY}
+        self._data = {
+            name: np.empty(_INITIAL_CAPACITY, dtype=np.int32 if kind == CATEGORY else kind)
+            for name, kind in schema.items()
+        }
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """列的只读视图（不复制）；维度列返回编码"""
+        view = self._data[name][: self._size]
+        view.flags.writeable = False
+        return view
+
+    def snapshot(self) -> "ColumnTable":
+        """固定当前行数的只读快照，共享底层数组不复制
+
+        追加只写入快照行数之后的位置（扩容时换新数组），快照上的一次查询
+        看到的各列与掩码长度始终一致。快照本身不可再 append。
+        """
+        view = object.__new__(ColumnTable)
+        view.schema = self.schema
+        view.categories = self.categories
+        view._data = dict(self._data)
+        view._size = self._size
+        return view
+
+    def append(self, columns: Mapping[str, Sequence]) -> None:
+        """批量追加，columns 需包含全部列且长度一致；维度列传原始字符串"""
+        n = len(next(iter(columns.values())))
+        if n == 0:
+            return
+        arrays = {}
+        for name, kind in self.schema.items():
+            values = columns[name]
+            if kind == CATEGORY:
+                arrays[name] = self.categories[name].encode(values)
+            else:
+                arrays[name] = np.asarray(values, dtype=kind)
+            if len(arrays[name]) != n:
+                raise ValueError(f"列 {name} 长度 {len(arrays[name])} != {n}")
+        self._reserve(self._size + n)
+        for name, values in arrays.items():
+            self._data[name][self._size : self._size + n] = values
+        self._size += n
+
+    def _reserve(self, size: int) -> None:
+        capacity = len(next(iter(self._data.values())))
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name, old in self._data.items():
+            grown = np.empty(capacity, dtype=old.dtype)
+            grown[: self._size] = old[: self._size]
+            self._data[name] = grown
+
+    # -- 过滤 ---------------------------------------------------------------
+
+    def isin(self, name: str, values: Iterable) -> np.ndarray:
+        """列取值属于 values 的行掩码；维度列按字符串取值比较"""
+        if name in self.categories:
+            cats = self.categories[name]
+            codes = [c for c in (cats.code(v) for v in values) if c >= 0]
+            return np.isin(self[name], np.asarray(codes, dtype=np.int32))
+        return np.isin(self[name], np.asarray(list(values), dtype=self.schema[name]))
+
+    def tail_per_group(self, key: str, n: int, where: np.ndarray | None = None) -> np.ndarray:
+        """每个分组按追加顺序的最后 n 行（在 where 过滤之后）的行掩码"""
+        mask = np.zeros(self._size, dtype=bool)
+        rows = np.arange(self._size) if where is None else np.flatnonzero(where)
+        if n <= 0 or len(rows) == 0:
+            return mask
+        keys = self[key][rows]
+        # 只需每组最后 n 行：从末尾取一段窗口，窗口内各组行数都够 n
+        # （或已是该组全部行）即可，窗口不够再倍增，通常远小于全表
+        need = np.minimum(np.bincount(keys), n)
+        window = min(len(keys), max(4 * n * int(np.count_nonzero(need)), 1024))
+        while True:
+            tail = keys[-window:]
+            if window == len(keys) or (np.bincount(tail, minlength=len(need)) >= need).all():
+                break
+            window = min(len(keys), window * 2)
+        # 稳定排序后同组行连续且保持原顺序，保留距组末尾不足 n 行的
+        order = np.argsort(tail, kind="stable")
+        sorted_keys = tail[order]
+        starts = np.r_[0, np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1]
+        ends = np.r_[starts[1:], len(sorted_keys)]
+        group_end = np.repeat(ends, ends - starts)
+        keep = order[np.arange(len(sorted_keys)) >= group_end - n] + len(keys) - window
+        mask[rows[keep]] = True
+        return mask
+
+    # -- 分组聚合 -----------------------------------------------------------
+
+    def group_by(
+        self,
+        keys: Sequence[str],
+        sums: Sequence[str] = (),
+        where: np.ndarray | None = None,
+    ) -> dict[tuple, dict[str, float | int]]:
+        """按 keys 分组，返回 {分组取值元组: {"count": 行数, 列名: 合计}}
+
+        keys 为空时整体汇总为一个分组 ()（无匹配行时为空 dict）；
+        维度列的分组取值为原字符串，datetime64 列为 np.datetime64。
+        """
+        rows = slice(None) if where is None else where
+        codes: list[np.ndarray] = []
+        labels: list[Sequence] = []
+        for name in keys:
+            column = self[name][rows]
+            if name in self.categories:
+                codes.append(column.astype(np.int64))
+                # 复制一份：并发追加可能新增取值，分组编码与解码需用同一长度
+                labels.append(list(self.categories[name].labels))
+            else:
+                uniq, inverse = np.unique(column, return_inverse=True)
+                codes.append(inverse.astype(np.int64))
+                labels.append(uniq)
+        n_rows = len(self[self._first_column()][rows])
+        if n_rows == 0:
+            return {}
+
+        composite = codes[0] if codes else np.zeros(n_rows, dtype=np.int64)
+        size = len(labels[0]) if labels else 1
+        for code, label in zip(codes[1:], labels[1:]):
+            composite = composite * len(label) + code
+            size *= len(label)
+        dense = size <= _DENSE_GROUP_LIMIT
+        if dense:
+            counts = np.bincount(composite, minlength=size)
+            present = np.flatnonzero(counts)
+            counts = counts[present]
+            inverse = composite
+        else:
+            present, inverse, counts = np.unique(composite, return_inverse=True, return_counts=True)
+
+        totals = {}
+        for name in sums:
+            weights = self[name][rows]
+            summed = np.bincount(inverse, weights=weights, minlength=len(present))
+            if dense:
+                summed = summed[present]
+            if np.issubdtype(weights.dtype, np.integer) or weights.dtype == bool:
+                summed = np.rint(summed).astype(np.int64)
+            totals[name] = summed.tolist()
+
+        result: dict[tuple, dict[str, float | int]] = {}
+        for i, group in enumerate(present.tolist()):
+            parts = []
+            for label in reversed(labels):
+                group, code = divmod(group, len(label))
+                parts.append(label[code])
+            cell: dict[str, float | int] = {"count": int(counts[i])}
+            for name in sums:
+                cell[name] = totals[name][i]
+            result[tuple(reversed(parts))] = cell
+        return result
+
+    def _first_column(self) -> str:
+        return next(iter(self.schema))
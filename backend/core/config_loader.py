@@ -0,0 +1,142 @@
+"""
+YAML 配置加载与热重载 — 按文件指纹跳过未变化的文件，按 id 比较新旧配置
+每个文件缓存 (mtime_ns, size, 内容摘要, 解析结果)：stat 未变化直接跳过；
+stat 变化但内容摘要相同（touch、原样保存）也不重新解析。解析优先用 libyaml 的
+CSafeLoader，未编译 libyaml 时退回纯 Python 的 SafeLoader。
+多 worker 部署时通过 SharedGeneration（共享 SQLite 计数器）广播重载：
+处理 reload 请求的 worker 递增计数，其他 worker 轮询到变化后各自重载。
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable
+
+import yaml
+
+from core.sqlite_pool import SQLitePool
+
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# 修改时间距今不足该值的文件，stat 相同也要比对摘要：
+# 同一时间戳精度内被原样大小改写的文件仅凭 stat 无法区分（racy-clean）
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def load_yaml(path: Path) -> Any:
+    with open(path, "rb") as f:
+        return yaml.load(f, Loader=YamlLoader)
+
+
+@dataclass(slots=True)
+class _Entry:
+    mtime_ns: int
+    size: int
+    digest: bytes
+    data: Any
+
+
+class ConfigLoader:
+    """一组 YAML 配置文件的缓存；refresh 只解析内容确实变化的文件
+
+    文件内容解析失败时抛出异常，本次 refresh 的全部结果都不生效，
+    get 继续返回上一次成功加载的内容。
+    """
+
+    def __init__(self, directory: Path, names: Iterable[str]):
+        self.directory = directory
+        self.names = tuple(names)
+        self._entries: dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Any:
+        return self._entries[name].data
+
+    def refresh(self) -> dict[str, Any]:
+        """重新检查全部文件，返回 {文件名: 新内容}，只包含内容变化的文件"""
+        with self._lock:
+            now = time.time_ns()
+            pending: dict[str, _Entry] = {}
+            changed: dict[str, Any] = {}
+            for name in self.names:
+                path = self.directory / name
+                stat = path.stat()
+                entry = self._entries.get(name)
+                if (
+                    entry is not None
+                    and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size)
+                    and now - stat.st_mtime_ns > RACY_WINDOW_NS
+                ):
+                    continue
+                raw = path.read_bytes()
+                digest = hashlib.blake2b(raw, digest_size=16).digest()
+                if entry is not None and entry.digest == digest:
+                    data = entry.data
+                else:
+                    data = yaml.load(raw, Loader=YamlLoader)
+                    changed[name] = data
+                pending[name] = _Entry(stat.st_mtime_ns, stat.st_size, digest, data)
+            self._entries.update(pending)
+            return changed
+
+    def invalidate(self, names: Iterable[str]) -> None:
+        """下次 refresh 时重新解析这些文件并视为变化（应用新配置失败时调用）"""
+        with self._lock:
+            for name in names:
+                entry = self._entries.get(name)
+                if entry is not None:
+                    entry.mtime_ns, entry.digest = -1, b""
+
+
+@dataclass(slots=True)
+class IdDiff:
+    """两份按 id 标识的配置列表之间的差异"""
+
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def as_dict(self) -> dict[str, list[str]]:
+        return {"added": self.added, "removed": self.removed, "changed": self.changed}
+
+
+def diff_by_id(old: list[dict], new: list[dict], key: str = "id") -> IdDiff:
+    """按 key 比较新旧列表；仅顺序变化不算差异"""
+    before = {item[key]: item for item in old}
+    after = {item[key]: item for item in new}
+    return IdDiff(
+        added=[k for k in after if k not in before],
+        removed=[k for k in before if k not in after],
+        changed=[k for k in after if k in before and after[k] != before[k]],
+    )
+
+
+class SharedGeneration:
+    """多进程共享的单调递增计数器（SQLite 单行），用于广播配置重载"""
+
+    def __init__(self, path: Path):
+        self.pool = SQLitePool(path)
+        with self.pool.transaction(immediate=True) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS generation "
+                "(id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER NOT NULL)"
+            )
+            conn.execute("INSERT OR IGNORE INTO generation VALUES (0, 0)")
+
+    def current(self) -> int:
+        return self._read(self.pool.connection())
+
+    def bump(self) -> int:
+        with self.pool.transaction(immediate=True) as conn:
+            conn.execute("UPDATE generation SET value = value + 1 WHERE id = 0")
+            return self._read(conn)
+
+    @staticmethod
+    def _read(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT value FROM generation WHERE id = 0").fetchone()[0]
@@ -0,0 +1,531 @@
+"""
+评测集污染检测 — 词级 n-gram + 单字 Bloom filter，索引以 np.memmap 映射
+  - 分词：小写后按码点类别查表，连续字母数字成词，中日韩字符各自成词，其余为分隔符。
+    一批文本拼成一个码点数组，按"前缀和 × 逆元幂"（mod 2^64，底数为奇数故可逆）
+    先算出每个词的多项式哈希，再对词哈希序列算出所有 n 个连续词的哈希，
+    与 n-gram 在文本中的位置无关；n-gram 不跨文本，不足 ngram 个词的文本没有 n-gram
+  - Bloom filter：单字（register-blocked）— 每个 n-gram 的 k 位都落在同一个 64 位字内，
+    建库与探测每个 n-gram 只有一次随机访存；字数与 k 按 Poisson 近似的假阳性率选定
+  - 建库：评测集文件（.jsonl / .json / .txt，以及经 core.quality 读取的 .parquet / .csv）
+    逐条流式读取，只保留当前分片的原文；哈希分片交给进程池，置位在调用进程中完成
+  - 探测：每条文本的污染率 = 命中过滤器的 n-gram 数 / n-gram 总数，记录取其文本中的
+    最大值，≥ threshold 即标记。子进程只读映射同一个位数组文件（共享页缓存），按分片并行
+Bloom filter 只有假阳性：干净样本的污染率期望约为 error_rate，不会漏报。
+
+索引目录结构：
+  bloom.bin   uint64 位数组，np.memmap 只读映射
+  meta.json   参数、已写入的 n-gram 数与来源文件（最后写入，作为提交点）
+重建时先写临时文件再原子替换，正在探测的读者继续使用旧文件直到重新打开。
+"""
+
+import json
+import math
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Sequence
+
+import numpy as np
+
+NGRAM = 13  # 常用的评测污染判定长度（13 个词 / 13 个汉字）
+ERROR_RATE = 0.01  # 单个 n-gram 的假阳性率，远低于 THRESHOLD
+THRESHOLD = 0.2  # 污染率达到该值的样本被标记
+SHARD_CHARS = 1 << 20  # 每个进程池任务的字符数
+BLOCK_CHARS = 1 << 17  # 每次向量化处理的字符数，使中间数组留在 CPU 缓存内
+MAX_FLAGGED = 1000  # 扫描结果中最多列出的被标记样本数
+EVAL_SUFFIXES = (".jsonl", ".json", ".txt", ".parquet", ".csv")
+
+_BASE = 0x100000001B3
+_BASE_INVERSE = pow(_BASE, -1, 1 << 64)
+_DRAWS_PER_MIX = 10  # 每个 64 位随机数切出 10 个 6 位的位下标
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+# 自成一词的文字：假名、CJK 统一表意文字（含扩展 A）、谚文、兼容表意文字
+_STANDALONE_RANGES = (
+    (0x3040, 0x30FF),
+    (0x3400, 0x4DBF),
+    (0x4E00, 0x9FFF),
+    (0xAC00, 0xD7AF),
+    (0xF900, 0xFAFF),
+)
+_SEPARATOR, _WORD, _STANDALONE = 0, 1, 2
+
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+    """splitmix64 终混，打散多项式哈希的低熵位"""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+_classes_lock = threading.Lock()
+_classes: np.ndarray | None = None
+
+
+def _char_classes() -> np.ndarray:
+    """码点 → 类别查找表（uint8[0x110000]）：字母数字为词字符，其余为分隔符"""
+    global _classes
+    with _classes_lock:
+        if _classes is None:
+            table = np.fromiter(
+                (chr(c).isalnum() for c in range(0x110000)), dtype=np.uint8, count=0x110000
+            )
+            for lo, hi in _STANDALONE_RANGES:
+                table[lo : hi + 1] = _STANDALONE
+            _classes = table
+        return _classes
+
+
+_powers_lock = threading.Lock()
+_power = np.ones(1, dtype=np.uint64)
+_inverse = np.ones(1, dtype=np.uint64)
+
+
+def _powers(length: int) -> tuple[np.ndarray, np.ndarray]:
+    """底数及其逆元的 0..length-1 次幂（mod 2^64），按需倍增缓存"""
+    global _power, _inverse
+    with _powers_lock:
+        if len(_power) < length:
+            size = max(length, 2 * len(_power))
+            _power = np.empty(size, dtype=np.uint64)
+            _power[0] = 1
+            np.cumprod(np.full(size - 1, _BASE, dtype=np.uint64), out=_power[1:])
+            _inverse = np.empty(size, dtype=np.uint64)
+            _inverse[0] = 1
+            np.cumprod(np.full(size - 1, _BASE_INVERSE, dtype=np.uint64), out=_inverse[1:])
+        return _power, _inverse
+
+
+class NGramHasher:
+    """批量计算词级 n-gram 的 64 位哈希；参数相同的实例（包括子进程中的）结果一致"""
+
+    def __init__(self, ngram: int = NGRAM):
+        self.ngram = ngram
+
+    def grams(self, texts: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+        """所有文本的 n-gram 哈希（uint64，按文本顺序）与每条文本的 n-gram 数"""
+        hashes, counts = [], []
+        for lo, hi in _blocks(texts):
+            h, c = self._block_grams(texts[lo:hi])
+            hashes.append(h)
+            counts.append(c)
+        if not hashes:
+            return np.empty(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(hashes), np.concatenate(counts)
+
+    def _block_grams(self, texts: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+        n = self.ngram
+        docs = [t.lower() for t in texts]
+        lengths = np.fromiter(map(len, docs), dtype=np.int64, count=len(docs))
+        doc_start = np.cumsum(lengths + 1) - (lengths + 1)  # 文本之间以一个空格分隔
+        codes = np.frombuffer(" ".join(docs).encode("utf-32-le"), dtype=np.uint32)
+        cls = _char_classes()[codes]
+        word = cls == _WORD
+        alone = cls == _STANDALONE
+        starts = np.flatnonzero(alone | (word & ~np.r_[False, word[:-1]]))
+        ends = np.flatnonzero(alone | (word & ~np.r_[word[1:], False])) + 1
+        owner = np.searchsorted(doc_start, starts, side="right") - 1
+        total = len(starts)
+        if total < n:
+            return np.empty(0, dtype=np.uint64), np.zeros(len(docs), dtype=np.int64)
+        power, inverse = _powers(max(len(codes), total))
+        # 词哈希：sum(c_j * B^(e-1-j)), j ∈ [s, e) = B^(e-1) * (prefix[e] - prefix[s])
+        prefix = np.zeros(len(codes) + 1, dtype=np.uint64)
+        np.cumsum(codes.astype(np.uint64) * inverse[: len(codes)], out=prefix[1:])
+        tokens = _mix64(power[ends - 1] * (prefix[ends] - prefix[starts]))
+        # n-gram 哈希：对词哈希序列再做一次同样的多项式，标点与空白的多少不影响结果
+        prefix = np.zeros(total + 1, dtype=np.uint64)
+        np.cumsum(tokens * inverse[:total], out=prefix[1:])
+        first = np.arange(total - n + 1)
+        first = first[owner[first] == owner[first + n - 1]]  # n-gram 不跨文本
+        last = first + n
+        hashes = _mix64(power[last - 1] * (prefix[last] - prefix[first]))
+        return hashes, np.bincount(owner[first], minlength=len(docs))
+
+
+def _blocks(texts: Sequence[str]) -> Iterator[tuple[int, int]]:
+    """按累计字符数约 BLOCK_CHARS 切分的 [lo, hi) 区间"""
+    ends = np.cumsum(np.fromiter(map(len, texts), dtype=np.int64, count=len(texts)))
+    if not len(texts):
+        return
+    cuts = np.searchsorted(ends, np.arange(BLOCK_CHARS, ends[-1], BLOCK_CHARS)) + 1
+    bounds = np.unique(np.concatenate([[0], np.minimum(cuts, len(texts)), [len(texts)]]))
+    yield from zip(bounds[:-1].tolist(), bounds[1:].tolist())
+
+
+class BloomFilter:
+    """单字（register-blocked）Bloom filter，位数组为 uint64[words]（可以是 np.memmap）
+
+    每个 key 的 k 位都落在同一个 64 位字内：置位是一次 np.bitwise_or.at，
+    探测是一次随机读取。同样的假阳性率比标准 Bloom filter 多用约 25%～70% 的位。
+    """
+
+    def __init__(self, words: np.ndarray, hashes: int):
+        if not 0 < len(words) < 1 << 32:
+            raise ValueError("位数组的字数必须在 1 到 2^32 - 1 之间")
+        self.words = words
+        self.hashes = hashes
+        self._size = np.uint64(len(words))
+
+    @staticmethod
+    def false_positive_rate(keys_per_word: float, hashes: int) -> float:
+        """每字 key 数服从 Poisson 分布时的假阳性率：字内有 j 个 key 时置位比例约为
+        1 - (63/64)^(k·j)，命中需要 k 位全部已置位"""
+        j = np.arange(int(keys_per_word * 4) + 32)
+        log_pmf = j * math.log(max(keys_per_word, 1e-12)) - keys_per_word
+        log_pmf -= np.array([math.lgamma(x + 1) for x in j.tolist()])
+        filled = 1 - (63 / 64) ** (hashes * j)
+        return float((np.exp(log_pmf) * filled**hashes).sum())
+
+    @classmethod
+    def size_for(cls, capacity: int, error_rate: float) -> tuple[int, int]:
+        """容量与假阳性率对应的 (uint64 字数, 哈希数)；每个 key 的位数以 1/4 位为步长递增"""
+        capacity = max(capacity, 1)
+        bits_per_key = 4.0
+        while True:
+            load = 64 / bits_per_key
+            rates = [cls.false_positive_rate(load, k) for k in range(1, 17)]
+            best = min(range(16), key=rates.__getitem__)
+            if rates[best] <= error_rate or bits_per_key >= 64:
+                return min(math.ceil(capacity * bits_per_key / 64), (1 << 32) - 1), best + 1
+            bits_per_key += 0.25
+
+    def _locate(self, keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """(字下标, 位掩码)；高 32 位乘字数取高位选字，另一个 64 位随机数每 6 位选一位"""
+        mask = np.zeros(len(keys), dtype=np.uint64)
+        draw = keys
+        for i in range(self.hashes):
+            if i % _DRAWS_PER_MIX == 0:
+                draw = _mix64(draw + _GOLDEN)
+            mask |= np.uint64(1) << ((draw >> np.uint64(6 * (i % _DRAWS_PER_MIX))) & np.uint64(63))
+        word = ((keys >> np.uint64(32)) * self._size) >> np.uint64(32)
+        return word.view(np.int64), mask
+
+    def add(self, keys: np.ndarray) -> None:
+        word, mask = self._locate(keys)
+        np.bitwise_or.at(self.words, word, mask)
+
+    def contains(self, keys: np.ndarray) -> np.ndarray:
+        word, mask = self._locate(keys)
+        return (self.words[word] & mask) == mask
+
+
+@dataclass
+class ScanResult:
+    """一次扫描的统计；flagged 为 [(key, 污染率, 命中数, n-gram 数)]，按污染率降序"""
+
+    records: int = 0
+    texts: int = 0
+    ngrams: int = 0
+    hits: int = 0
+    flagged_count: int = 0
+    flagged: list[tuple[Any, float, int, int]] = field(default_factory=list)
+    seconds: float = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "records": self.records,
+            "flagged": self.flagged_count,
+            "contamination_ratio": round(self.flagged_count / max(self.records, 1), 4),
+            "ngrams": self.ngrams,
+            "ngram_hit_ratio": round(self.hits / max(self.ngrams, 1), 6),
+            "seconds": round(self.seconds, 3),
+            "ngrams_per_sec": round(self.ngrams / self.seconds) if self.seconds else 0,
+        }
+
+
+_worker_hasher: NGramHasher | None = None
+_worker_index: tuple[str, "ContaminationIndex"] | None = None
+
+
+def _gram_shard(ngram: int, texts: list[str]) -> np.ndarray:
+    """进程池任务（建库）：子进程内按参数复用一个 NGramHasher"""
+    global _worker_hasher
+    if _worker_hasher is None or _worker_hasher.ngram != ngram:
+        _worker_hasher = NGramHasher(ngram)
+    return _worker_hasher.grams(texts)[0]
+
+
+def _probe_shard(directory: str, build_id: str, texts: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """进程池任务（探测）：子进程只读映射索引，重建后按 build_id 重新打开"""
+    global _worker_index
+    if _worker_index is None or _worker_index[0] != build_id:
+        _worker_index = (build_id, ContaminationIndex(directory, workers=1))
+        if _worker_index[1].meta["build_id"] != build_id:
+            raise RuntimeError("索引已在探测过程中重建")
+    return _worker_index[1].probe(texts)
+
+
+def record_texts(record: Any) -> list[str]:
+    """记录中的所有字符串（递归展开 dict / list），各自作为一条文本"""
+    if isinstance(record, str):
+        return [record]
+    if isinstance(record, dict):
+        record = record.values()
+    elif not isinstance(record, (list, tuple)):
+        return []
+    return [text for value in record for text in record_texts(value)]
+
+
+def iter_texts(path: Path) -> Iterator[str]:
+    """流式读取评测集文件中的文本"""
+    path = Path(path)
+    if path.suffix == ".jsonl":
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield from record_texts(json.loads(line))
+    elif path.suffix == ".json":
+        with open(path, encoding="utf-8") as f:
+            yield from record_texts(json.load(f))
+    elif path.suffix in (".parquet", ".csv"):
+        from core.quality import read_chunks
+
+        for chunk in read_chunks(path):
+            for values in chunk.values():
+                if values.dtype == object:
+                    yield from (v for v in values.tolist() if isinstance(v, str))
+    else:
+        with open(path, encoding="utf-8") as f:
+            yield from (line for line in f if line.strip())
+
+
+def eval_files(directory: Path) -> list[Path]:
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    return sorted(p for p in directory.iterdir() if p.suffix in EVAL_SUFFIXES and p.is_file())
+
+
+def _shards(texts: Iterable[str], chars: int) -> Iterator[list[str]]:
+    shard: list[str] = []
+    size = 0
+    for text in texts:
+        shard.append(text)
+        size += len(text)
+        if size >= chars:
+            yield shard
+            shard, size = [], 0
+    if shard:
+        yield shard
+
+
+class ContaminationIndex:
+    """评测集 n-gram 索引；build() 由评测集构建，probe() / scan() 检测样本"""
+
+    def __init__(self, directory: Path, workers: int | None = None):
+        self.directory = Path(directory)
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.meta: dict | None = None
+        self.bloom: BloomFilter | None = None
+        self.hasher = NGramHasher()
+        self._pool: ProcessPoolExecutor | None = None
+        self._pool_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def built(self) -> bool:
+        return self.meta is not None
+
+    def _load(self) -> None:
+        meta_path = self.directory / "meta.json"
+        if not meta_path.exists():
+            return
+        meta = json.loads(meta_path.read_text())
+        words = np.memmap(
+            self.directory / "bloom.bin", dtype=np.uint64, mode="r", shape=(meta["words"],)
+        )
+        self.bloom = BloomFilter(words, meta["hashes"])
+        self.hasher = NGramHasher(meta["ngram"])
+        self.meta = meta
+
+    # -- 进程池 -------------------------------------------------------------
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn 而非 fork：服务进程里有线程与 SQLite 连接，fork 不安全
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def _map(
+        self, local: Callable[[list[str]], Any], task: Callable, args: tuple, shards: Iterator
+    ) -> Iterator[Any]:
+        """按顺序产出每个分片的结果；只有一个分片或 workers <= 1 时在当前进程计算，
+        否则交给进程池，同时在途的分片不超过 2 × workers，原文不会整体驻留内存"""
+        shards = iter(shards)
+        first = next(shards, None)
+        if first is None:
+            return
+        second = next(shards, None)
+        if second is None or self.workers <= 1:
+            yield local(first)
+            if second is not None:
+                yield local(second)
+                yield from map(local, shards)
+            return
+        pool = self._executor()
+        pending = deque([pool.submit(task, *args, first), pool.submit(task, *args, second)])
+        for shard in shards:
+            if len(pending) >= 2 * self.workers:
+                yield pending.popleft().result()
+            pending.append(pool.submit(task, *args, shard))
+        while pending:
+            yield pending.popleft().result()
+
+    def close(self) -> None:
+        """关闭进程池（服务退出时调用）"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+    # -- 建库 ---------------------------------------------------------------
+
+    def build(
+        self,
+        texts: Iterable[str],
+        capacity: int,
+        error_rate: float = ERROR_RATE,
+        ngram: int = NGRAM,
+        sources: Sequence[str] = (),
+    ) -> dict:
+        """由评测集文本构建索引并替换当前索引；capacity 为预计的 n-gram 数"""
+        t0 = time.perf_counter()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        words, hashes = BloomFilter.size_for(capacity, error_rate)
+        tmp = self.directory / "bloom.bin.tmp"
+        with open(tmp, "wb") as f:
+            f.truncate(words * 8)  # 稀疏文件，按需分配
+        bloom = BloomFilter(np.memmap(tmp, dtype=np.uint64, mode="r+", shape=(words,)), hashes)
+        hasher = NGramHasher(ngram)
+        count = 0
+        for keys in self._map(
+            lambda shard: hasher.grams(shard)[0], _gram_shard, (ngram,), _shards(texts, SHARD_CHARS)
+        ):
+            bloom.add(keys)
+            count += len(keys)
+        bloom.words.flush()
+        del bloom
+
+        meta = {
+            "build_id": uuid.uuid4().hex,
+            "ngram": ngram,
+            "error_rate": error_rate,
+            "capacity": capacity,
+            "words": words,
+            "hashes": hashes,
+            "ngrams": count,
+            "sources": list(sources),
+            "built_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        with self._lock:
+            os.replace(tmp, self.directory / "bloom.bin")
+            meta_tmp = self.directory / "meta.json.tmp"
+            meta_tmp.write_text(json.dumps(meta, ensure_ascii=False, indent=2))
+            os.replace(meta_tmp, self.directory / "meta.json")
+            self._load()
+        return {**meta, "seconds": round(time.perf_counter() - t0, 3)}
+
+    def build_files(
+        self,
+        paths: Sequence[Path],
+        capacity: int | None = None,
+        error_rate: float = ERROR_RATE,
+        ngram: int = NGRAM,
+    ) -> dict:
+        """由评测集文件构建；未给出 capacity 时按文件字节数估计（约 3 字节一个词）"""
+        if capacity is None:
+            capacity = max(sum(Path(p).stat().st_size for p in paths) // 3, 1 << 16)
+        texts = (text for path in paths for text in iter_texts(path))
+        return self.build(texts, capacity, error_rate, ngram, [Path(p).name for p in paths])
+
+    # -- 探测 ---------------------------------------------------------------
+
+    def probe(self, texts: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+        """每条文本命中的 n-gram 数与 n-gram 总数（当前进程计算）"""
+        with self._lock:
+            bloom, hasher = self.bloom, self.hasher
+        if bloom is None:
+            raise ValueError("污染检测索引尚未构建")
+        hits, grams = [], []
+        for lo, hi in _blocks(texts):
+            keys, counts = hasher._block_grams(texts[lo:hi])
+            owner = np.repeat(np.arange(hi - lo), counts)
+            hits.append(np.bincount(owner[bloom.contains(keys)], minlength=hi - lo))
+            grams.append(counts)
+        if not hits:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(hits), np.concatenate(grams)
+
+    def scan(
+        self,
+        records: Iterable[tuple[Any, Sequence[str]]],
+        threshold: float = THRESHOLD,
+        max_flagged: int = MAX_FLAGGED,
+    ) -> ScanResult:
+        """流式检测 (key, 文本列表) 记录
+
+        记录的污染率取其各条文本（如 prompt 与每个 response）污染率的最大值，
+        泄漏的评测题不会被同一记录中的长回答稀释；命中数与 n-gram 数为全部文本合计。
+        """
+        t0 = time.perf_counter()
+        if self.meta is None:
+            raise ValueError("污染检测索引尚未构建")
+        result = ScanResult()
+        build_id = self.meta["build_id"]
+        batches: deque = deque()  # 与在途分片一一对应的 (keys, 每条记录的文本数)
+
+        def shards() -> Iterator[list[str]]:
+            keys, sizes, texts, chars = [], [], [], 0
+            for key, record in records:
+                keys.append(key)
+                sizes.append(len(record))
+                texts.extend(record)
+                chars += sum(map(len, record))
+                if chars >= SHARD_CHARS:
+                    batches.append((keys, sizes))
+                    yield texts
+                    keys, sizes, texts, chars = [], [], [], 0
+            if keys:
+                batches.append((keys, sizes))
+                yield texts
+
+        flagged: list[tuple[Any, float, int, int]] = []
+        for hits, grams in self._map(
+            self.probe, _probe_shard, (str(self.directory), build_id), shards()
+        ):
+            keys, sizes = batches.popleft()
+            owner = np.repeat(np.arange(len(keys)), sizes)
+            record_hits = np.bincount(owner, weights=hits, minlength=len(keys)).astype(np.int64)
+            record_grams = np.bincount(owner, weights=grams, minlength=len(keys)).astype(np.int64)
+            ratio = np.zeros(len(keys))
+            np.maximum.at(ratio, owner, hits / np.maximum(grams, 1))
+            marked = np.flatnonzero((ratio >= threshold) & (record_grams > 0))
+            result.records += len(keys)
+            result.texts += len(hits)
+            result.ngrams += int(grams.sum())
+            result.hits += int(hits.sum())
+            result.flagged_count += len(marked)
+            flagged.extend(
+                (keys[i], round(float(ratio[i]), 4), int(record_hits[i]), int(record_grams[i]))
+                for i in marked.tolist()
+            )
+            if len(flagged) > 2 * max_flagged:
+                flagged = sorted(flagged, key=lambda f: -f[1])[:max_flagged]
+        result.flagged = sorted(flagged, key=lambda f: -f[1])[:max_flagged]
+        result.seconds = time.perf_counter() - t0
+        return result
@@ -0,0 +1,459 @@
+"""
+近似去重 — 字符 n-gram shingle + MinHash 签名 + 分段（banded）LSH，索引持久化
+  - shingle：文本小写并折叠空白后取字符 n-gram。一批文档拼成一个码点数组
+    （文档之间以 ngram 个 \\0 填充），滚动多项式哈希一次算出所有窗口
+  - MinHash：单次哈希分桶（one permutation hashing）— 每个 shingle 只算一个 64 位
+    哈希，高 32 位决定落入 num_perm 个桶中的哪一个，低 32 位参与桶内取最小值
+    （np.minimum.at）；空桶用循环右侧最近的非空桶加偏移填充（rotation densification）。
+    代价与 shingle 数成正比，与 num_perm 无关
+  - LSH：签名切成 bands 段，每段 rows 个值线性组合成一个 64 位桶键；
+    同一段桶键相同的文档为候选，签名逐位相等的比例（估计 Jaccard）≥ threshold 为重复
+签名计算是 CPU 密集部分，文档数达到 PARALLEL_THRESHOLD 时分片交给进程池；
+LSH 查找在调用线程中向量化完成。
+
+索引只收录保留下来的文档，目录结构：
+  meta.json        参数与已提交的文档数 count（最后写入，作为提交点）
+  signatures.bin   uint32[count, num_perm]，查询时 np.memmap 按需读取
+  bands.bin        uint64[count, bands]，打开时读入并按段排序（searchsorted 查找）
+  ids.jsonl        文档 id，每行一个
+新批次先与历史索引比对、再在批内按桶比对，保留的文档追加到文件末尾；
+多个进程共用一个目录时以 .lock 文件（core.filelock）串行化，发现其他进程追加后重新加载。
+"""
+
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+
+import numpy as np
+
+from core import filelock
+
+NUM_PERM = 128
+BANDS = 16
+NGRAM = 5
+THRESHOLD = 0.8
+SEED = 1
+PARALLEL_THRESHOLD = 2000  # 少于该文档数的批次直接在当前进程计算签名
+SHARD_DOCS = 500  # 每个进程池任务的文档数
+BLOCK_CHARS = 1 << 17  # 每次向量化处理的字符数，使中间数组留在 CPU 缓存内
+MAX_BUCKET_CANDIDATES = 8  # 每段桶内最多比对的历史文档数
+BATCH_DOCS = 50_000  # dedup_jsonl 每批读入的文档数
+
+_ROLL = np.uint64(0x100000001B3)
+_EMPTY = np.uint32(0xFFFFFFFF)
+_ROTATION = np.uint32(0x9E3779B1)  # 空桶借用右侧第 d 个桶时加 d × _ROTATION
+
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+    """splitmix64 终混，打散滚动哈希的低熵位"""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class MinHasher:
+    """批量计算 MinHash 签名；参数相同的实例（包括子进程中的）签名一致"""
+
+    def __init__(self, num_perm: int = NUM_PERM, ngram: int = NGRAM, seed: int = SEED):
+        self.num_perm = num_perm
+        self.ngram = ngram
+        self.seed = seed
+        self.params = (num_perm, ngram, seed)
+        self._salt = np.random.default_rng(seed).integers(0, 1 << 63, dtype=np.uint64)
+
+    def shingles(self, texts: Sequence[str]) -> tuple[np.ndarray, np.ndarray]:
+        """所有文档的 shingle 哈希（uint64）与每篇文档的 shingle 数
+
+        短于 ngram 的文档取一个含填充的窗口，空文档也有一个 shingle。
+        """
+        n = self.ngram
+        pad = "\0" * n
+        texts = [normalize(t) for t in texts]
+        lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+        joined = "".join(t + pad for t in texts).encode("utf-32-le")
+        codes = np.frombuffer(joined, dtype=np.uint32).astype(np.uint64)
+        windows = len(codes) - n + 1
+        rolled = np.zeros(max(windows, 0), dtype=np.uint64)
+        for k in range(n):
+            rolled *= _ROLL
+            rolled += codes[k : k + windows]
+        counts = np.maximum(lengths - n + 1, 1)
+        doc_start = np.cumsum(lengths + n) - (lengths + n)
+        starts = np.cumsum(counts) - counts
+        # 第 i 篇文档的窗口为 doc_start[i] .. doc_start[i] + counts[i] - 1
+        positions = np.repeat(doc_start - starts, counts) + np.arange(counts.sum())
+        return _mix64(rolled[positions] ^ self._salt), counts
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """uint32[len(texts), num_perm]；按 BLOCK_CHARS 切块计算，结果与切分方式无关"""
+        out = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        ends = np.cumsum(np.fromiter(map(len, texts), dtype=np.int64, count=len(texts)))
+        if not len(texts):
+            return out
+        cuts = np.searchsorted(ends, np.arange(BLOCK_CHARS, ends[-1], BLOCK_CHARS)) + 1
+        bounds = np.unique(np.concatenate([[0], np.minimum(cuts, len(texts)), [len(texts)]]))
+        for lo, hi in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            out[lo:hi] = self._block_signatures(texts[lo:hi])
+        return out
+
+    def _block_signatures(self, texts: Sequence[str]) -> np.ndarray:
+        p = self.num_perm
+        hashes, counts = self.shingles(texts)
+        # 高 32 位乘 num_perm 取高位得到桶号（num_perm 不必是 2 的幂）
+        bucket = ((hashes >> np.uint64(32)) * np.uint64(p)) >> np.uint64(32)
+        slot = np.repeat(np.arange(len(texts), dtype=np.uint64) * np.uint64(p), counts) + bucket
+        sig = np.full(len(texts) * p, _EMPTY, dtype=np.uint32)
+        np.minimum.at(sig, slot.astype(np.int64), hashes.astype(np.uint32))
+        return _densify(sig.reshape(len(texts), p))
+
+
+def _densify(sig: np.ndarray) -> np.ndarray:
+    """空桶取循环右侧最近的非空桶的值 + 距离 × _ROTATION"""
+    empty = sig == _EMPTY
+    if not empty.any():
+        return sig
+    n, p = sig.shape
+    # 拼接两份后，每个位置右侧（含自身）最近的非空位置
+    pos = np.where(np.concatenate([~empty, ~empty], axis=1), np.arange(2 * p), 2 * p)
+    nearest = np.minimum.accumulate(pos[:, ::-1], axis=1)[:, ::-1][:, :p]
+    distance = (nearest - np.arange(p)).astype(np.uint32)
+    borrowed = np.take_along_axis(sig, nearest % p, axis=1) + distance * _ROTATION
+    return np.where(empty, borrowed, sig)
+
+
+def band_keys(signatures: np.ndarray, bands: int) -> np.ndarray:
+    """uint64[N, bands]：每段 rows 个 32 位签名值的线性组合（mod 2^64）"""
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    coeffs = np.random.default_rng(0xBA4D).integers(1, 1 << 63, rows, dtype=np.uint64)
+    grouped = signatures[:, : bands * rows].reshape(n, bands, rows).astype(np.uint64)
+    return (grouped * (coeffs | np.uint64(1))).sum(axis=2, dtype=np.uint64)
+
+
+_worker_hasher: MinHasher | None = None
+
+
+def _signature_shard(params: tuple[int, int, int], texts: list[str]) -> np.ndarray:
+    """进程池任务：子进程内按参数复用一个 MinHasher"""
+    global _worker_hasher
+    if _worker_hasher is None or _worker_hasher.params != params:
+        _worker_hasher = MinHasher(*params)
+    return _worker_hasher.signatures(texts)
+
+
+@dataclass
+class DedupResult:
+    """一批文档的去重结果；duplicates 为 {重复文档 id: 命中的文档 id}"""
+
+    docs: int = 0
+    kept: list[str] = field(default_factory=list)
+    duplicates: dict[str, str] = field(default_factory=dict)
+    seconds: float = 0.0
+    keep: np.ndarray | None = None  # 按输入顺序的保留掩码
+
+    def stats(self) -> dict:
+        return {
+            "docs": self.docs,
+            "kept": len(self.kept),
+            "duplicates": len(self.duplicates),
+            "dedup_ratio": round(len(self.duplicates) / max(self.docs, 1), 4),
+            "seconds": round(self.seconds, 3),
+            "docs_per_sec": round(self.docs / self.seconds) if self.seconds else 0,
+        }
+
+
+class DedupIndex:
+    """持久化的 MinHash-LSH 索引；dedup() 对新批次去重并把保留的文档加入索引"""
+
+    def __init__(
+        self,
+        directory: Path,
+        num_perm: int = NUM_PERM,
+        bands: int = BANDS,
+        ngram: int = NGRAM,
+        threshold: float = THRESHOLD,
+        seed: int = SEED,
+        workers: int | None = None,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm 必须是 bands 的整数倍")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.params = {"num_perm": num_perm, "bands": bands, "ngram": ngram, "seed": seed}
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, ngram, seed)
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self._pool: ProcessPoolExecutor | None = None
+        self._pool_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.count = 0
+        self.ids: list[str] = []
+        self._signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self._sorted_keys: list[np.ndarray] = []
+        self._sorted_docs: list[np.ndarray] = []
+        with self._file_lock():
+            self._load()
+
+    def __len__(self) -> int:
+        return self.count
+
+    # -- 持久化 -------------------------------------------------------------
+
+    def _path(self, name: str) -> Path:
+        return self.directory / name
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        with open(self._path(".lock"), "a") as f:
+            filelock.lock(f.fileno())
+            try:
+                yield
+            finally:
+                filelock.unlock(f.fileno())
+
+    def _committed_count(self) -> int:
+        meta_path = self._path("meta.json")
+        if not meta_path.exists():
+            return 0
+        meta = json.loads(meta_path.read_text())
+        stored = {k: meta[k] for k in self.params}
+        if stored != self.params:
+            raise ValueError(f"索引参数不一致: 目录中为 {stored}，当前为 {self.params}")
+        return meta["count"]
+
+    def _load(self) -> None:
+        """按 meta.json 的 count 读取；count 之后的残留（上次追加中断）截掉"""
+        count = self._committed_count()
+        num_perm, bands = self.params["num_perm"], self.params["bands"]
+        for name, width in (("signatures.bin", num_perm * 4), ("bands.bin", bands * 8)):
+            path = self._path(name)
+            if not path.exists():
+                path.touch()
+            if path.stat().st_size > count * width:
+                os.truncate(path, count * width)
+        ids_path = self._path("ids.jsonl")
+        ids_path.touch()
+        with open(ids_path, "rb") as f:
+            lines = list(islice(f, count))
+        if len(lines) != count:
+            raise ValueError(f"ids.jsonl 只有 {len(lines)} 行，meta.json 记录 {count} 篇")
+        if ids_path.stat().st_size > sum(map(len, lines)):
+            os.truncate(ids_path, sum(map(len, lines)))
+        keys = np.fromfile(self._path("bands.bin"), dtype=np.uint64).reshape(count, bands)
+        order = np.argsort(keys, axis=0, kind="stable")
+        self._sorted_docs = [order[:, b].astype(np.int64) for b in range(bands)]
+        self._sorted_keys = [keys[order[:, b], b] for b in range(bands)]
+        self.ids = [json.loads(line) for line in lines]
+        self.count = count
+        self._map_signatures()
+
+    def _map_signatures(self) -> None:
+        if self.count:
+            self._signatures = np.memmap(
+                self._path("signatures.bin"),
+                dtype=np.uint32,
+                mode="r",
+                shape=(self.count, self.params["num_perm"]),
+            )
+        else:
+            self._signatures = np.empty((0, self.params["num_perm"]), dtype=np.uint32)
+
+    def _append(self, ids: list[str], signatures: np.ndarray, keys: np.ndarray) -> None:
+        """追加保留的文档：先写数据文件，最后原子替换 meta.json 提交"""
+        if not ids:
+            return
+        with open(self._path("signatures.bin"), "ab") as f:
+            signatures.tofile(f)
+        with open(self._path("bands.bin"), "ab") as f:
+            keys.tofile(f)
+        with open(self._path("ids.jsonl"), "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(i, ensure_ascii=False) + "\n" for i in ids)
+        count = self.count + len(ids)
+        tmp = self._path("meta.json.tmp")
+        tmp.write_text(json.dumps({**self.params, "count": count}))
+        os.replace(tmp, self._path("meta.json"))
+
+        new_docs = np.arange(self.count, count, dtype=np.int64)
+        for b in range(self.params["bands"]):
+            order = np.argsort(keys[:, b], kind="stable")
+            new_keys = keys[order, b]
+            at = np.searchsorted(self._sorted_keys[b], new_keys, side="right")
+            self._sorted_keys[b] = np.insert(self._sorted_keys[b], at, new_keys)
+            self._sorted_docs[b] = np.insert(self._sorted_docs[b], at, new_docs[order])
+        self.ids.extend(ids)
+        self.count = count
+        self._map_signatures()
+
+    # -- 签名 ---------------------------------------------------------------
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn 而非 fork：服务进程里有线程与 SQLite 连接，fork 不安全
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """批量签名；文档数达到 PARALLEL_THRESHOLD 且 workers > 1 时分片并行"""
+        if self.workers <= 1 or len(texts) < PARALLEL_THRESHOLD:
+            return self.hasher.signatures(texts)
+        params = self.hasher.params
+        shards = [list(texts[i : i + SHARD_DOCS]) for i in range(0, len(texts), SHARD_DOCS)]
+        parts = self._executor().map(_signature_shard, [params] * len(shards), shards)
+        return np.concatenate(list(parts))
+
+    def close(self) -> None:
+        """关闭进程池（服务退出时调用）"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+    # -- 去重 ---------------------------------------------------------------
+
+    def _similar(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        return np.count_nonzero(a == b, axis=1) >= self.threshold * a.shape[1]
+
+    def _history_matches(self, signatures: np.ndarray, keys: np.ndarray) -> np.ndarray:
+        """每篇新文档命中的最早历史文档编号，无则为 -1"""
+        match = np.full(len(keys), self.count, dtype=np.int64)
+        if not self.count:
+            return np.full(len(keys), -1, dtype=np.int64)
+        docs, hits = [], []
+        for b in range(self.params["bands"]):
+            sorted_keys = self._sorted_keys[b]
+            left = np.searchsorted(sorted_keys, keys[:, b], side="left")
+            right = np.searchsorted(sorted_keys, keys[:, b], side="right")
+            counts = np.minimum(right - left, MAX_BUCKET_CANDIDATES)
+            found = np.flatnonzero(counts)
+            if not len(found):
+                continue
+            counts = counts[found]
+            shift = np.repeat(left[found] - (np.cumsum(counts) - counts), counts)
+            docs.append(np.repeat(found, counts))
+            hits.append(self._sorted_docs[b][shift + np.arange(counts.sum())])
+        if docs:
+            pairs = np.unique(np.stack([np.concatenate(docs), np.concatenate(hits)]), axis=1)
+            doc, hit = pairs
+            ok = self._similar(signatures[doc], np.asarray(self._signatures[hit]))
+            np.minimum.at(match, doc[ok], hit[ok])
+        match[match == self.count] = -1
+        return match
+
+    def _batch_matches(self, signatures: np.ndarray, keys: np.ndarray) -> np.ndarray:
+        """每篇文档命中的批内更早文档编号（与桶内第一篇比对），无则为 -1"""
+        n = len(keys)
+        match = np.full(n, n, dtype=np.int64)
+        heads, docs = [], []
+        for b in range(self.params["bands"]):
+            order = np.argsort(keys[:, b], kind="stable")
+            sorted_keys = keys[order, b]
+            run_start = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+            head = order[np.flatnonzero(run_start)][np.cumsum(run_start) - 1]
+            follower = ~run_start
+            heads.append(head[follower])
+            docs.append(order[follower])
+        head = np.concatenate(heads)
+        doc = np.concatenate(docs)
+        if len(doc):
+            pairs = np.unique(np.stack([head, doc]), axis=1)
+            head, doc = pairs
+            ok = self._similar(signatures[head], signatures[doc])
+            np.minimum.at(match, doc[ok], head[ok])
+        match[match == n] = -1
+        return match
+
+    def dedup(self, ids: Sequence[str], texts: Sequence[str]) -> DedupResult:
+        """对一批文档去重：先与历史索引比对，再在批内比对；保留的文档加入索引"""
+        t0 = time.perf_counter()
+        signatures = self.signatures(texts)
+        keys = band_keys(signatures, self.params["bands"])
+        with self._lock, self._file_lock():
+            if self._committed_count() != self.count:
+                self._load()  # 其他进程追加过
+            history = self._history_matches(signatures, keys)
+            batch = self._batch_matches(signatures, keys)
+            duplicate = (history >= 0) | (batch >= 0)
+            kept = np.flatnonzero(~duplicate)
+            kept_ids = [ids[i] for i in kept.tolist()]
+            try:
+                self._append(kept_ids, signatures[kept], keys[kept])
+            except BaseException:
+                self._load()  # 截掉未提交的部分写入
+                raise
+
+        result = DedupResult(docs=len(ids), kept=kept_ids, keep=~duplicate)
+        for i in np.flatnonzero(duplicate).tolist():
+            if history[i] >= 0:
+                result.duplicates[ids[i]] = self.ids[history[i]]
+            else:
+                result.duplicates[ids[i]] = ids[batch[i]]
+        result.seconds = time.perf_counter() - t0
+        return result
+
+
+def _read_batches(path: Path, batch_docs: int) -> Iterable[list[tuple[str, dict]]]:
+    with open(path, encoding="utf-8") as f:
+        batch = []
+        for line in f:
+            if line.strip():
+                batch.append((line, json.loads(line)))
+            if len(batch) == batch_docs:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def dedup_jsonl(
+    index: DedupIndex,
+    path: Path,
+    output: Path | None = None,
+    text_field: str = "text",
+    id_field: str = "id",
+    batch_docs: int = BATCH_DOCS,
+) -> dict:
+    """按批对 JSONL 语料去重，保留的行原样写入 output（给定时）
+
+    没有 id 字段的行以 "{文件名}:{行号}" 作为 id。返回汇总统计。
+    """
+    path = Path(path)
+    total = DedupResult()
+    out = open(output, "w", encoding="utf-8") if output else None
+    try:
+        offset = 0
+        for batch in _read_batches(path, batch_docs):
+            ids = [
+                str(record.get(id_field, f"{path.name}:{offset + i}"))
+                for i, (_, record) in enumerate(batch)
+            ]
+            texts = [str(record.get(text_field) or "") for _, record in batch]
+            result = index.dedup(ids, texts)
+            offset += len(batch)
+            total.docs += result.docs
+            total.kept.extend(result.kept)
+            total.duplicates.update(result.duplicates)
+            total.seconds += result.seconds
+            if out is not None:
+                out.writelines(line for (line, _), keep in zip(batch, result.keep) if keep)
+    finally:
+        if out is not None:
+            out.close()
+    return {**total.stats(), "index_size": len(index)}
@@ -0,0 +1,43 @@
+"""
+跨平台文件锁 — POSIX 用 flock，Windows（start.bat 启动）用 msvcrt.locking 锁住文件首字节
+锁随文件描述符关闭或进程退出释放；同一进程内对同一文件的两个描述符也互斥。
+"""
+
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Windows 下阻塞加锁的轮询间隔（秒）
+_POLL_INTERVAL = 0.05
+
+
+def lock(fd: int, blocking: bool = True) -> bool:
+    """对 fd 加独占锁；blocking=False 时锁被占用立即返回 False"""
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            return False
+        return True
+    while True:
+        os.lseek(fd, 0, os.SEEK_SET)
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not blocking:
+                return False
+            time.sleep(_POLL_INTERVAL)
+
+
+def unlock(fd: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,390 @@
+"""
+执行历史索引 — pipeline 执行与质量检查的列式表 + 向量化分组
+执行 / 检查各存一张 ColumnTable：pipeline_id / owner / status / rule_id 为整数编码，
+时间为 datetime64，数值为定长数组，每行只占几十字节。dashboard / cost / team /
+pipeline / rule 端点的统计都是一次布尔过滤 + np.bincount 分组，不逐条遍历 dict。
+
+明细（返回给前端的少量记录）仍是 dict：挂接 HistoryStore 时直接走存储的
+(pipeline_id, 时间) 索引；纯内存模式下由按 pipeline_id / owner / rule_id
+记录位置列表的二级索引提供，"某 pipeline 最近 N 条" 为 O(N) 切片
+"""
+
+import heapq
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import islice
+from operator import itemgetter
+from typing import Iterable
+
+import numpy as np
+
+from core.columnar import CATEGORY, ColumnTable
+from core.store import HistoryStore, Watermark
+
+
+@dataclass(slots=True)
+class ExecutionRollup:
+    """一个分组的执行累计值"""
+
+    runs: int = 0
+    cost_yuan: float = 0.0
+    rows_processed: int = 0
+    duration_minutes: int = 0
+
+
+@dataclass(slots=True)
+class CheckRollup:
+    """一个分组的质量检查计数"""
+
+    checks: int = 0
+    passed: int = 0
+
+
+EXECUTION_SCHEMA = {
+    "start_time": "datetime64[s]",
+    "day": "datetime64[D]",
+    "pipeline_id": CATEGORY,
+    "owner": CATEGORY,
+    "status": CATEGORY,
+    "duration_minutes": "int32",
+    "rows_processed": "int64",
+    "cost_yuan": "float64",
+}
+CHECK_SCHEMA = {
+    "check_time": "datetime64[s]",
+    "day": "datetime64[D]",
+    "pipeline_id": CATEGORY,
+    "rule_id": CATEGORY,
+    "passed": "bool",
+}
+_EXEC_SUMS = ("cost_yuan", "rows_processed", "duration_minutes")
+
+# 从存储增量读取的列：时间只取到秒（不含时区与小数秒），与原先按字符串前缀取日期一致
+_STORE_EXEC_COLUMNS = (
+    "substr(start_time, 1, 19)",
+    "pipeline_id",
+    "pipeline_name",
+    "owner",
+    "status",
+    "duration_minutes",
+    "rows_processed",
+    "cost_yuan",
+)
+_STORE_CHECK_COLUMNS = ("substr(check_time, 1, 19)", "pipeline_id", "rule_id", "passed")
+
+
+def recent_days(days: int, now: datetime | None = None) -> list[str]:
+    """最近 N 天（不含今天）的日期字符串，按时间升序"""
+    now = now or datetime.now()
+    return [(now - timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(days, 0, -1)]
+
+
+def _label(value) -> str:
+    return str(value) if isinstance(value, np.datetime64) else value
+
+
+def _columns(rows: list[tuple], width: int) -> list[list]:
+    """行元组转列表（比 zip(*rows) 在百万行时快一个数量级）"""
+    return [list(map(itemgetter(i), rows)) for i in range(width)]
+
+
+def _limit(mask: np.ndarray, latest: int | None, oldest: int | None) -> np.ndarray:
+    """在 mask 选中的行里只保留最后 latest 行 / 最前 oldest 行"""
+    if latest is None and oldest is None:
+        return mask
+    rows = np.flatnonzero(mask)
+    rows = rows[-latest:] if latest is not None else rows[:oldest]
+    limited = np.zeros(len(mask), dtype=bool)
+    if len(rows) and (latest is None or latest > 0) and (oldest is None or oldest > 0):
+        limited[rows] = True
+    return limited
+
+
+class ExecutionHistory:
+    """执行记录与质量检查的列式统计视图 + 明细二级索引
+
+    入参沿用 generate_all 的倒序（最新在前）；内部按时间升序存放，
+    追加为摊还 O(1)，"最近 N 条" 按追加顺序计。
+    通过 from_store 构建时只保留列式表，明细读写经由 HistoryStore。
+    """
+
+    def __init__(self, executions: list[dict], quality_checks: list[dict]):
+        self._store: HistoryStore | None = None
+        self._sync_lock = threading.Lock()
+        self._generation = -1
+        self._watermark: Watermark = {}
+        self._executions: list[dict] = executions[::-1]
+        self._checks: list[dict] = quality_checks[::-1]
+        self.executions = ColumnTable(EXECUTION_SCHEMA)
+        self.checks = ColumnTable(CHECK_SCHEMA)
+        self.pipeline_names: dict[str, str] = {}
+        self._exec_pos_by_pipeline: dict[str, list[int]] = {}
+        self._exec_pos_by_owner: dict[str, list[int]] = {}
+        self._check_pos_by_rule: dict[str, list[int]] = {}
+        self._check_pos_by_pipeline: dict[str, list[int]] = {}
+        for pos, e in enumerate(self._executions):
+            self._exec_pos_by_pipeline.setdefault(e["pipeline_id"], []).append(pos)
+            self._exec_pos_by_owner.setdefault(e["owner"], []).append(pos)
+        for pos, qc in enumerate(self._checks):
+            self._check_pos_by_rule.setdefault(qc["rule_id"], []).append(pos)
+            self._check_pos_by_pipeline.setdefault(qc["pipeline_id"], []).append(pos)
+        self._append_execution_rows([_execution_row(e) for e in self._executions])
+        self._append_check_rows([_check_row(qc) for qc in self._checks])
+
+    @classmethod
+    def from_store(cls, store: HistoryStore) -> "ExecutionHistory":
+        history = cls([], [])
+        history._store = store
+        history.sync()
+        return history
+
+    def sync(self) -> bool:
+        """合并其他进程写入存储的新记录；存储 generation 未变化时只有一次查询"""
+        if self._store is None:
+            return False
+        with self._sync_lock:
+            generation = self._store.generation()
+            if generation == self._generation:
+                return False
+            mark = self._store.marks()
+            for rows in self._store.rows_between(
+                "executions", _STORE_EXEC_COLUMNS, self._watermark, mark
+            ):
+                self._append_execution_rows(rows)
+            for rows in self._store.rows_between(
+                "quality_checks", _STORE_CHECK_COLUMNS, self._watermark, mark
+            ):
+                self._append_check_rows(rows)
+            self._watermark = mark
+            self._generation = generation
+            return True
+
+    # -- 增量维护 -----------------------------------------------------------
+
+    def _append_execution_rows(self, rows: list[tuple]) -> None:
+        """rows 的列顺序同 _STORE_EXEC_COLUMNS"""
+        if not rows:
+            return
+        start, pids, names, owners, statuses, durations, processed, costs = _columns(rows, 8)
+        start_time = np.array(start, dtype="datetime64[s]")
+        # 同一 pipeline 取第一次出现的名称
+        for pid, name in dict(zip(reversed(pids), reversed(names))).items():
+            self.pipeline_names.setdefault(pid, name)
+        self.executions.append(
+            {
+                "start_time": start_time,
+                "day": start_time.astype("datetime64[D]"),
+                "pipeline_id": pids,
+                "owner": owners,
+                "status": statuses,
+                "duration_minutes": durations,
+                "rows_processed": processed,
+                "cost_yuan": costs,
+            }
+        )
+
+    def _append_check_rows(self, rows: list[tuple]) -> None:
+        """rows 的列顺序同 _STORE_CHECK_COLUMNS"""
+        if not rows:
+            return
+        check_time, pids, rule_ids, passed = _columns(rows, 4)
+        check_time = np.array(check_time, dtype="datetime64[s]")
+        self.checks.append(
+            {
+                "check_time": check_time,
+                "day": check_time.astype("datetime64[D]"),
+                "pipeline_id": pids,
+                "rule_id": rule_ids,
+                "passed": passed,
+            }
+        )
+
+    def append_execution(self, e: dict) -> None:
+        """追加一条新执行记录（最新），同步更新列式表与索引"""
+        if self._store is not None:
+            self._store.append_executions([e])
+            self.sync()
+            return
+        pos = len(self._executions)
+        self._executions.append(e)
+        self._exec_pos_by_pipeline.setdefault(e["pipeline_id"], []).append(pos)
+        self._exec_pos_by_owner.setdefault(e["owner"], []).append(pos)
+        self._append_execution_rows([_execution_row(e)])
+
+    def append_check(self, qc: dict) -> None:
+        """追加一条新质量检查记录（最新），同步更新列式表与索引"""
+        if self._store is not None:
+            self._store.append_checks([qc])
+            self.sync()
+            return
+        pos = len(self._checks)
+        self._checks.append(qc)
+        self._check_pos_by_rule.setdefault(qc["rule_id"], []).append(pos)
+        self._check_pos_by_pipeline.setdefault(qc["pipeline_id"], []).append(pos)
+        self._append_check_rows([_check_row(qc)])
+
+    # -- 统计 ---------------------------------------------------------------
+
+    @property
+    def latest_day(self) -> str:
+        days = self.executions["day"]
+        return str(days.max()) if len(days) else ""
+
+    def execution_totals(
+        self,
+        by: Iterable[str] = (),
+        days: Iterable[str] | None = None,
+        latest_per_pipeline: int | None = None,
+    ) -> dict[tuple, ExecutionRollup]:
+        """按 day / pipeline_id / owner / status 的子集分组汇总
+
+        days 为空时汇总全部历史；latest_per_pipeline 只统计每个 pipeline
+        最近的 N 次执行。day 的分组取值为 "YYYY-MM-DD"。
+        """
+        table = self.executions.snapshot()
+        mask = None if days is None else table.isin("day", days)
+        if latest_per_pipeline is not None:
+            mask = table.tail_per_group("pipeline_id", latest_per_pipeline, mask)
+        groups = table.group_by(tuple(by), _EXEC_SUMS, where=mask)
+        return {
+            tuple(_label(v) for v in key): ExecutionRollup(
+                cell["count"],
+                cell["cost_yuan"],
+                cell["rows_processed"],
+                cell["duration_minutes"],
+            )
+            for key, cell in groups.items()
+        }
+
+    def execution_total(self, days: Iterable[str] | None = None) -> ExecutionRollup:
+        return self.execution_totals((), days).get((), ExecutionRollup())
+
+    def check_totals(
+        self,
+        by: Iterable[str] = (),
+        days: Iterable[str] | None = None,
+        pipeline_ids: Iterable[str] | None = None,
+        latest: int | None = None,
+        oldest: int | None = None,
+        latest_per_rule: int | None = None,
+    ) -> dict[tuple, CheckRollup]:
+        """按 day / pipeline_id / rule_id 的子集分组统计检查数与通过数
+
+        过滤顺序：days、pipeline_ids → 只保留最近 latest 条 / 最早 oldest 条
+        → 每条规则只保留最近 latest_per_rule 条。
+        """
+        table = self.checks.snapshot()
+        mask = np.ones(len(table), dtype=bool)
+        if days is not None:
+            mask &= table.isin("day", days)
+        if pipeline_ids is not None:
+            mask &= table.isin("pipeline_id", pipeline_ids)
+        mask = _limit(mask, latest, oldest)
+        if latest_per_rule is not None:
+            mask = table.tail_per_group("rule_id", latest_per_rule, mask)
+        groups = table.group_by(tuple(by), ("passed",), where=mask)
+        return {
+            tuple(_label(v) for v in key): CheckRollup(cell["count"], cell["passed"])
+            for key, cell in groups.items()
+        }
+
+    def check_total(self, **filters) -> CheckRollup:
+        return self.check_totals((), **filters).get((), CheckRollup())
+
+    # -- 明细（最新在前） ---------------------------------------------------
+
+    @property
+    def execution_count(self) -> int:
+        return len(self.executions)
+
+    @property
+    def check_count(self) -> int:
+        return len(self.checks)
+
+    @staticmethod
+    def _latest(
+        records: list[dict],
+        positions: list[int],
+        limit: int,
+        time_key: str = "",
+        start: str | None = None,
+        end: str | None = None,
+    ) -> list[dict]:
+        if not (start or end):
+            return [records[i] for i in reversed(positions[-limit:])]
+        result = []
+        for i in reversed(positions):
+            ts = records[i][time_key]
+            if end and ts >= end:
+                continue
+            if start and ts < start:
+                break
+            result.append(records[i])
+            if len(result) >= limit:
+                break
+        return result
+
+    def latest_executions(
+        self,
+        limit: int,
+        pipeline_id: str | None = None,
+        owner: str | None = None,
+        start: str | None = None,
+        end: str | None = None,
+    ) -> list[dict]:
+        """最近 limit 条执行记录，可按 pipeline_id / owner 与时间窗口 [start, end) 过滤"""
+        if limit <= 0:
+            return []
+        if self._store is not None:
+            return self._store.executions(
+                limit, pipeline_id=pipeline_id, owner=owner, start=start, end=end
+            )
+        if pipeline_id is not None:
+            positions = self._exec_pos_by_pipeline.get(pipeline_id, [])
+        elif owner is not None:
+            positions = self._exec_pos_by_owner.get(owner, [])
+        else:
+            positions = range(len(self._executions))
+        return self._latest(self._executions, positions, limit, "start_time", start, end)
+
+    def latest_checks(
+        self,
+        limit: int,
+        rule_id: str | None = None,
+        pipeline_ids: Iterable[str] | None = None,
+    ) -> list[dict]:
+        """最近 limit 条质量检查，可按 rule_id 或一组 pipeline_id 过滤"""
+        if limit <= 0:
+            return []
+        if self._store is not None:
+            return self._store.checks(limit, rule_id=rule_id, pipeline_ids=pipeline_ids)
+        if rule_id is not None:
+            positions = self._check_pos_by_rule.get(rule_id, [])
+            return self._latest(self._checks, positions, limit)
+        if pipeline_ids is None:
+            return self._checks[-limit:][::-1]
+        streams = [
+            reversed(self._check_pos_by_pipeline[pid])
+            for pid in set(pipeline_ids)
+            if pid in self._check_pos_by_pipeline
+        ]
+        merged = heapq.merge(*streams, reverse=True)
+        return [self._checks[i] for i in islice(merged, limit)]
+
+
+def _execution_row(e: dict) -> tuple:
+    return (
+        e["start_time"][:19],
+        e["pipeline_id"],
+        e["pipeline_name"],
+        e["owner"],
+        e["status"],
+        e["duration_minutes"],
+        e["rows_processed"],
+        e["cost_yuan"],
+    )
+
+
+def _check_row(qc: dict) -> tuple:
+    return (qc["check_time"][:19], qc["pipeline_id"], qc["rule_id"], qc["passed"])
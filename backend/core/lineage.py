@@ -0,0 +1,256 @@
+"""
+数据血缘图 — 由 pipeline 配置构建的表级有向图，配置加载时构建一次
+节点为表，边为 pipeline 的 source_table → target_table，以及 dependencies 中
+上游 pipeline 的 target_table → 本 pipeline 的 target_table（is_dependency）。
+表名映射为整数编号，正向 / 反向邻接以 CSR（indptr + 边编号）NumPy 数组保存；
+拓扑分层按 Kahn 算法预先计算（配置错误形成环时，环上及其下游的表无法排序，
+记入 cyclic）。
+上下游闭包为带深度限制的逐层 BFS，每层一次向量化展开；关键路径为按 pipeline
+平均耗时加权的最长路径，按拓扑层逐层 np.maximum.at 动态规划。
+"""
+
+from typing import Mapping
+
+import numpy as np
+
+
+def table_type(name: str) -> str:
+    if name.startswith("ods_"):
+        return "ods"
+    if name.startswith("dw_"):
+        return "dw"
+    return "dm"
+
+
+def _csr(keys: np.ndarray, size: int) -> tuple[np.ndarray, np.ndarray]:
+    """按 keys 分桶的边编号：桶 k 的边为 edges[indptr[k]:indptr[k + 1]]"""
+    edges = np.argsort(keys, kind="stable").astype(np.int64)
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=indptr[1:])
+    return indptr, edges
+
+
+def _expand(frontier: np.ndarray, indptr: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """frontier 中各节点在 CSR 里的全部边编号"""
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    # 第 i 个节点的边在输出中从 cumsum[i] - counts[i] 开始
+    shift = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    return edges[shift + np.arange(total)]
+
+
+class LineageGraph:
+    """表级血缘图；构建后只读，配置重载时整体替换"""
+
+    def __init__(self, pipelines: list[dict]):
+        self.tables: list[str] = []
+        self._index: dict[str, int] = {}
+        self.edges: list[dict] = []
+        self.pipeline_ids: list[str] = []
+        pipeline_codes: dict[str, int] = {}
+        src: list[int] = []
+        dst: list[int] = []
+        edge_pipeline: list[int] = []
+
+        producers: dict[str, dict] = {}
+        for p in pipelines:
+            producers.setdefault(p["id"], p)
+
+        def add_edge(source: str, pipeline: dict, extra: dict) -> None:
+            target = pipeline["target_table"]
+            code = pipeline_codes.setdefault(pipeline["id"], len(pipeline_codes))
+            if code == len(self.pipeline_ids):
+                self.pipeline_ids.append(pipeline["id"])
+            src.append(self._node(source))
+            dst.append(self._node(target))
+            edge_pipeline.append(code)
+            self.edges.append(
+                {
+                    "source": source,
+                    "target": target,
+                    "pipeline": pipeline["name"],
+                    "pipeline_id": pipeline["id"],
+                    "status": pipeline["status"],
+                    **extra,
+                }
+            )
+
+        for p in pipelines:
+            self._node(p["target_table"])
+            for source in p.get("source_tables", []):
+                add_edge(source, p, {})
+            for dep_id in p.get("dependencies", []):
+                dep_pipe = producers.get(dep_id)
+                if dep_pipe:
+                    add_edge(dep_pipe["target_table"], p, {"is_dependency": True})
+
+        n = len(self.tables)
+        self._names = np.array(self.tables, dtype=object)
+        self._src = np.array(src, dtype=np.int64)
+        self._dst = np.array(dst, dtype=np.int64)
+        self._edge_pipeline = np.array(edge_pipeline, dtype=np.int64)
+        self._out = _csr(self._src, n)
+        self._in = _csr(self._dst, n)
+        self._levels = self._topological_levels()
+        self.order = np.concatenate(self._levels or [np.empty(0, np.int64)])
+        self._rank = np.full(n, n, dtype=np.int64)
+        self._rank[self.order] = np.arange(len(self.order))
+        self.cyclic = sorted(self._names[self._rank == n].tolist())
+        # 关键路径按目标节点的拓扑层分组处理边（指向 cyclic 的边不参与）
+        depth = np.full(n, -1, dtype=np.int64)
+        for level, nodes in enumerate(self._levels):
+            depth[nodes] = level
+        edge_level = depth[self._dst] if len(self._dst) else self._dst
+        valid = np.flatnonzero(edge_level > 0)
+        self._edges_by_level = valid[np.argsort(edge_level[valid], kind="stable")]
+        self._level_bounds = np.searchsorted(
+            edge_level[self._edges_by_level], np.arange(1, len(self._levels) + 1)
+        )
+        self._payload = {
+            "nodes": [{"id": name, "type": table_type(name)} for name in sorted(self.tables)],
+            "edges": self.edges,
+        }
+
+    def _node(self, name: str) -> int:
+        node = self._index.get(name)
+        if node is None:
+            node = self._index[name] = len(self.tables)
+            self.tables.append(name)
+        return node
+
+    def _topological_levels(self) -> list[np.ndarray]:
+        """Kahn 算法逐层剥离入度为 0 的节点；第 k 层为距源表的最长跳数 k"""
+        indegree = np.bincount(self._dst, minlength=len(self.tables))
+        frontier = np.flatnonzero(indegree == 0)
+        levels = []
+        while len(frontier):
+            levels.append(frontier)
+            children = self._dst[_expand(frontier, *self._out)]
+            indegree -= np.bincount(children, minlength=len(self.tables))
+            children = np.unique(children)
+            frontier = children[indegree[children] == 0]
+        return levels
+
+    # -- 查询 ---------------------------------------------------------------
+
+    def __contains__(self, table: str) -> bool:
+        return table in self._index
+
+    def to_dict(self) -> dict:
+        """完整图（/api/lineage 的响应），构建时生成"""
+        return self._payload
+
+    def _walk(
+        self, table: str, downstream: bool, depth: int | None
+    ) -> tuple[list[np.ndarray], np.ndarray]:
+        """逐层 BFS，返回 (各层节点（按拓扑序）, 经过的边)，不含起点"""
+        indptr, csr_edges = self._out if downstream else self._in
+        endpoint = self._dst if downstream else self._src
+        visited = np.zeros(len(self.tables), dtype=bool)
+        start = self._index[table]
+        visited[start] = True
+        frontier = np.array([start], dtype=np.int64)
+        levels: list[np.ndarray] = []
+        walked: list[np.ndarray] = []
+        while depth is None or len(levels) < depth:
+            edges = _expand(frontier, indptr, csr_edges)
+            walked.append(edges)
+            nodes = endpoint[edges]
+            nodes = np.unique(nodes[~visited[nodes]])
+            if not len(nodes):
+                break
+            visited[nodes] = True
+            frontier = nodes[np.argsort(self._rank[nodes], kind="stable")]
+            levels.append(frontier)
+        return levels, np.concatenate(walked) if walked else np.empty(0, np.int64)
+
+    def closure(self, table: str, downstream: bool = True, depth: int | None = None) -> dict:
+        """上游 / 下游传递闭包；depth 为最大跳数，None 表示不限
+
+        levels[k] 为距 table k + 1 跳的表。下游闭包即"该表延迟或出错时
+        受影响的表与 pipeline"。
+        """
+        levels, edges = self._walk(table, downstream, depth)
+        pipelines = np.unique(self._edge_pipeline[edges])
+        return {
+            "table": table,
+            "direction": "downstream" if downstream else "upstream",
+            "depth": depth,
+            "count": int(sum(len(level) for level in levels)),
+            "levels": [self._names[level].tolist() for level in levels],
+            "pipelines": sorted(self.pipeline_ids[i] for i in pipelines.tolist()),
+        }
+
+    def subgraph(self, table: str, upstream: int | None, downstream: int | None) -> dict:
+        """以 table 为中心、向上 / 向下各限定深度的子图（nodes + edges）
+
+        节点的 distance 上游为负、下游为正。
+        """
+        up, up_edges = self._walk(table, False, upstream)
+        down, down_edges = self._walk(table, True, downstream)
+        nodes = [{"id": table, "type": table_type(table), "distance": 0}]
+        for sign, levels in ((-1, up), (1, down)):
+            for hops, level in enumerate(levels, 1):
+                nodes.extend(
+                    {"id": name, "type": table_type(name), "distance": sign * hops}
+                    for name in self._names[level].tolist()
+                )
+        edges = np.unique(np.concatenate([up_edges, down_edges]))
+        return {
+            "center": table,
+            "nodes": nodes,
+            "edges": [self.edges[e] for e in edges.tolist()],
+        }
+
+    def critical_path(self, durations: Mapping[str, float], target: str | None = None) -> dict:
+        """按 pipeline 耗时加权的最长路径
+
+        每条边的权重为产出它的 pipeline 的耗时（durations 中没有的按 0）。
+        target 为空时返回全图最长路径，否则返回到达 target 的最长路径，
+        即决定 target 何时就绪的那条链路。cyclic 中的表不参与计算。
+        """
+        if not self.tables:
+            return {"target": None, "total_minutes": 0.0, "tables": [], "steps": []}
+        per_pipeline = np.array(
+            [float(durations.get(pid, 0.0)) for pid in self.pipeline_ids], dtype=np.float64
+        )
+        weight = per_pipeline[self._edge_pipeline] if len(per_pipeline) else np.empty(0)
+        finish = np.zeros(len(self.tables))
+        lo = 0
+        for hi in self._level_bounds.tolist()[1:] + [len(self._edges_by_level)]:
+            edges = self._edges_by_level[lo:hi]
+            np.maximum.at(finish, self._dst[edges], finish[self._src[edges]] + weight[edges])
+            lo = hi
+
+        end = self._index[target] if target is not None else int(np.argmax(finish))
+        # 回溯：每步取一条恰好取得 finish[node] 的入边（DP 中的同一浮点表达式，可精确比较）
+        indptr, in_edges = self._in
+        steps = []
+        node = end
+        while self._rank[node] < len(self.tables):
+            candidates = in_edges[indptr[node] : indptr[node + 1]]
+            cost = finish[self._src[candidates]] + weight[candidates]
+            match = candidates[cost == finish[node]]
+            if not len(match):
+                break
+            e = int(match[0])
+            pipeline_id = self.pipeline_ids[self._edge_pipeline[e]]
+            steps.append(
+                {
+                    "source": self.tables[self._src[e]],
+                    "target": self.tables[node],
+                    "pipeline_id": pipeline_id,
+                    "duration_minutes": float(weight[e]),
+                }
+            )
+            node = int(self._src[e])
+        steps.reverse()
+        return {
+            "target": self.tables[end],
+            "total_minutes": float(finish[end]),
+            "tables": [self.tables[node]] + [s["target"] for s in steps],
+            "steps": steps,
+        }
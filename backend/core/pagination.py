@@ -0,0 +1,36 @@
+"""
+游标分页 — 基于排序键的 keyset 分页与不透明的翻页 token
+列表按 (时间, id) 倒序返回，下一页条件为 (时间, id) < 上一页最后一条；
+配合 (过滤列..., 时间, id) 复合索引，翻到任意深度都只扫描一页的数据。
+"""
+
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(*key) -> str:
+    """把排序键编码为 URL 安全的 token"""
+    raw = json.dumps(list(key), ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, size: int = 2) -> tuple:
+    """解析 encode_cursor 生成的 token，格式不对时抛出 ValueError"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as exc:
+        raise ValueError("无效的分页游标") from exc
+    if not isinstance(key, list) or len(key) != size:
+        raise ValueError("无效的分页游标")
+    # 排序键只会是字符串或数字，其他类型（对象、数组、null、布尔）无法绑定为 SQL 参数
+    if not all(isinstance(k, (str, int, float)) and not isinstance(k, bool) for k in key):
+        raise ValueError("无效的分页游标")
+    return tuple(key)
+
+
+def clamp_page_size(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
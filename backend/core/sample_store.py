@@ -0,0 +1,270 @@
+"""
+标注样本库 — 样本按 (task_id, sample_id) 存入 SQLite，按需读取而不是整体常驻内存
+每个任务一个 JSONL 样本文件（每行一个样本），分块导入：每块一个短事务，不长时间占用写锁。
+导入用代数（gen）实现整体替换：新一代样本逐块 upsert，全部写完后再删除旧一代残留，
+导入过程中读到的每个样本要么是旧版本要么是新版本，任务不会出现"半空"状态。
+文件的大小与修改时间记录在任务表中，启动与热重载时未变化的文件直接跳过。
+读方法与 BlobStore 一样接收调用方的连接，可在 AsyncSQLite.read 的读线程中执行。
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from core.sqlite_pool import SQLitePool
+
+INGEST_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+DEFAULT_DIFFICULTY = "medium"
+
+
+class SampleStore:
+    """一个样本表 + 任务表（{table}_tasks：样本数、当前代数、来源文件指纹）"""
+
+    def __init__(self, pool: SQLitePool, table: str = "samples"):
+        self.pool = pool
+        self.table = table
+        self._ingest_lock = threading.Lock()
+
+    def init_schema(self, conn: sqlite3.Connection) -> None:
+        conn.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                task_id TEXT NOT NULL,
+                sample_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                difficulty TEXT NOT NULL,
+                domain TEXT NOT NULL,
+                gen INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (task_id, sample_id)
+            );
+            -- 按文件顺序 keyset 翻页
+            CREATE INDEX IF NOT EXISTS idx_{self.table}_task_seq
+                ON {self.table}(task_id, seq, sample_id);
+            CREATE TABLE IF NOT EXISTS {self.table}_tasks (
+                task_id TEXT PRIMARY KEY,
+                sample_count INTEGER NOT NULL,
+                gen INTEGER NOT NULL,
+                source TEXT,
+                source_size INTEGER,
+                source_mtime_ns INTEGER,
+                updated_at TEXT NOT NULL
+            );
+            """
+        )
+
+    # ---- 读 ----
+
+    def get(self, conn: sqlite3.Connection, task_id: str, sample_id: str) -> Optional[dict]:
+        row = conn.execute(
+            f"SELECT data FROM {self.table} WHERE task_id=? AND sample_id=?",
+            (task_id, sample_id),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(
+        self, conn: sqlite3.Connection, task_id: str, sample_ids: Iterable[str]
+    ) -> dict[str, dict]:
+        """批量按 ID 读取，返回 {sample_id: sample}，不存在的 ID 不出现在结果中"""
+        rows = conn.execute(
+            f"""SELECT sample_id, data FROM {self.table}
+                WHERE task_id=? AND sample_id IN (SELECT value FROM json_each(?))""",
+            (task_id, json.dumps(list(sample_ids))),
+        )
+        return {r[0]: json.loads(r[1]) for r in rows}
+
+    def page(
+        self,
+        conn: sqlite3.Connection,
+        task_id: str,
+        limit: int,
+        after: Optional[tuple[int, str]] = None,
+    ) -> list[tuple[int, dict]]:
+        """按文件顺序读取一页，after 为上一页最后一条的 (seq, sample_id)"""
+        sql = f"SELECT seq, data FROM {self.table} WHERE task_id=?"
+        params: list = [task_id]
+        if after:
+            sql += " AND (seq, sample_id) > (?, ?)"
+            params.extend(after)
+        sql += " ORDER BY seq, sample_id LIMIT ?"
+        params.append(limit)
+        rows = conn.execute(sql, params)
+        return [(r[0], json.loads(r[1])) for r in rows]
+
+    def count(self, conn: sqlite3.Connection, task_id: str) -> int:
+        row = conn.execute(
+            f"SELECT sample_count FROM {self.table}_tasks WHERE task_id=?", (task_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def counts(self, conn: sqlite3.Connection) -> dict[str, int]:
+        """各任务的样本数（来自任务表，不扫描样本）"""
+        rows = conn.execute(f"SELECT task_id, sample_count FROM {self.table}_tasks")
+        return {r[0]: r[1] for r in rows}
+
+    # ---- 导入 ----
+
+    def ingest(
+        self,
+        task_id: str,
+        samples: Iterable,
+        replace: bool = False,
+        source: Optional[Path] = None,
+    ) -> dict:
+        """导入样本；samples 的元素可以是 dict，也可以是 JSONL 的一行（bytes/str）
+
+        replace=True 时导入完成后删除本次未出现的旧样本（整体替换）；
+        否则追加，已存在的 ID 以本次内容为准。同一批内 ID 重复时保留第一个。
+        """
+        # 先取文件指纹再读内容：导入期间文件被改写时下次同步会重新导入
+        stat = source.stat() if source else None
+        with self._ingest_lock:
+            with self.pool.transaction(immediate=True) as conn:
+                row = conn.execute(
+                    f"SELECT gen FROM {self.table}_tasks WHERE task_id=?", (task_id,)
+                ).fetchone()
+                gen = (row[0] if row else 0) + 1
+                next_seq = conn.execute(
+                    f"SELECT COALESCE(MAX(seq) + 1, 0) FROM {self.table} WHERE task_id=?",
+                    (task_id,),
+                ).fetchone()[0]
+            errors: list[dict] = []
+            error_count = 0
+            ingested = 0
+            chunk: list[tuple] = []
+            for line_no, item in enumerate(samples, 1):
+                sample, error = _parse_sample(item)
+                if error:
+                    error_count += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append({"line": line_no, "message": error})
+                    continue
+                # 整体替换时按文件顺序重新编号；追加时排在已有样本之后
+                seq = line_no if replace else next_seq + line_no
+                chunk.append(_sample_row(task_id, sample, seq, gen))
+                if len(chunk) >= INGEST_CHUNK_SIZE:
+                    ingested += self._write_chunk(chunk, replace)
+                    chunk = []
+            if chunk:
+                ingested += self._write_chunk(chunk, replace)
+            with self.pool.transaction(immediate=True) as conn:
+                if replace:
+                    conn.execute(
+                        f"DELETE FROM {self.table} WHERE task_id=? AND gen<?",
+                        (task_id, gen),
+                    )
+                sample_count = conn.execute(
+                    f"SELECT COUNT(*) FROM {self.table} WHERE task_id=?", (task_id,)
+                ).fetchone()[0]
+                # 非文件导入（上传）保留原文件指纹：文件未变化时重启不会覆盖上传内容
+                conn.execute(
+                    f"""INSERT INTO {self.table}_tasks
+                        (task_id, sample_count, gen, source, source_size,
+                         source_mtime_ns, updated_at)
+                        VALUES (?,?,?,?,?,?,?)
+                        ON CONFLICT(task_id) DO UPDATE SET
+                            sample_count = excluded.sample_count,
+                            gen = excluded.gen,
+                            source = COALESCE(excluded.source, source),
+                            source_size = COALESCE(excluded.source_size, source_size),
+                            source_mtime_ns =
+                                COALESCE(excluded.source_mtime_ns, source_mtime_ns),
+                            updated_at = excluded.updated_at""",
+                    (
+                        task_id,
+                        sample_count,
+                        gen,
+                        str(source) if source else None,
+                        stat.st_size if stat else None,
+                        stat.st_mtime_ns if stat else None,
+                        datetime.now().isoformat(),
+                    ),
+                )
+        return {
+            "task_id": task_id,
+            "ingested": ingested,
+            "samples": sample_count,
+            "error_count": error_count,
+            "errors": errors,
+        }
+
+    def _write_chunk(self, rows: list[tuple], replace: bool) -> int:
+        # WHERE gen < excluded.gen：同一批内的重复 ID 不覆盖第一个
+        seq_update = "seq = excluded.seq," if replace else ""
+        with self.pool.transaction(immediate=True) as conn:
+            before = conn.total_changes
+            conn.executemany(
+                f"""INSERT INTO {self.table}
+                    (task_id, sample_id, seq, difficulty, domain, gen, data)
+                    VALUES (?,?,?,?,?,?,?)
+                    ON CONFLICT(task_id, sample_id) DO UPDATE SET
+                        {seq_update}
+                        difficulty = excluded.difficulty,
+                        domain = excluded.domain,
+                        gen = excluded.gen,
+                        data = excluded.data
+                    WHERE gen < excluded.gen""",
+                rows,
+            )
+            return conn.total_changes - before
+
+    def ingest_file(self, task_id: str, path: Path) -> dict:
+        """以 JSONL 文件整体替换任务的样本"""
+        return self.ingest(task_id, _iter_lines(path), replace=True, source=path)
+
+    def sync_dir(self, directory: Path) -> dict:
+        """导入目录下的 <task_id>.jsonl；大小与修改时间未变化的文件跳过"""
+        known = {
+            r[0]: (r[1], r[2], r[3])
+            for r in self.pool.connection().execute(
+                f"""SELECT task_id, source, source_size, source_mtime_ns
+                    FROM {self.table}_tasks"""
+            )
+        }
+        ingested: list[dict] = []
+        skipped = 0
+        for path in sorted(directory.glob("*.jsonl")):
+            stat = path.stat()
+            task_id = path.stem
+            if known.get(task_id) == (str(path), stat.st_size, stat.st_mtime_ns):
+                skipped += 1
+                continue
+            ingested.append(self.ingest_file(task_id, path))
+        return {"ingested": ingested, "skipped": skipped}
+
+
+def _iter_lines(path: Path) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield line
+
+
+def _parse_sample(item) -> tuple[Optional[dict], Optional[str]]:
+    if isinstance(item, (bytes, str)):
+        try:
+            item = json.loads(item)
+        except ValueError:
+            return None, "无效的 JSON"
+    if not isinstance(item, dict):
+        return None, "样本必须为 JSON 对象"
+    for key in ("id", "prompt"):
+        if not isinstance(item.get(key), str) or not item[key]:
+            return None, f"缺少字段 '{key}'"
+    return item, None
+
+
+def _sample_row(task_id: str, sample: dict, seq: int, gen: int) -> tuple:
+    return (
+        task_id,
+        sample["id"],
+        seq,
+        sample.get("difficulty", DEFAULT_DIFFICULTY),
+        sample.get("domain", "unknown"),
+        gen,
+        json.dumps(sample, ensure_ascii=False),
+    )
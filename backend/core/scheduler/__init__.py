@@ -1 +1,6 @@
 # Pipeline scheduler — 读取 configs/pipelines.yaml 驱动调度行为
+from core.scheduler.cron import CronSchedule
+from core.scheduler.engine import PipelineScheduler, topological_order
+from core.scheduler.leader import LeaderLock
+
+__all__ = ["CronSchedule", "LeaderLock", "PipelineScheduler", "topological_order"]
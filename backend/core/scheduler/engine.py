@@ -0,0 +1,296 @@
+"""
+Pipeline 调度引擎 — 按 pipelines.yaml 的 schedule / dependencies / config 驱动执行
+
+- 定时: 所有 pipeline 的下一次触发时间放在一个小顶堆中，循环只等待堆顶，
+  每次唤醒的开销与 pipeline 总数无关
+- 依赖: 加载时对 dependencies 做拓扑排序（检测环），同一批触发按拓扑序派发；
+  下游等待正在运行的上游结束，上游最近一次失败则本次记为 skipped
+- 执行: 信号量限制并发 worker 数，按 config.timeout_minutes 超时、
+  config.retry_count 重试，每次运行产出一条与 mock_data 同结构的执行记录
+- 处理函数: 按 pipeline_id 注册，或按 pipelines.yaml 中的 handler 字段注册处理类型；
+  两者都没有的 pipeline 不会被触发
+- 同步处理函数在线程池中运行，线程无法被取消：超时后不再重试，
+  后台线程结束前该 pipeline 的后续触发记为 skipped，避免同一任务并发执行
+"""
+
+import asyncio
+import hashlib
+import heapq
+import inspect
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+
+from core.scheduler.cron import CronSchedule
+
+PipelineHandler = Callable[[dict], Awaitable[dict | None] | dict | None]
+ExecutionSink = Callable[[dict], None]
+
+DEFAULT_TIMEOUT_MINUTES = 60
+
+
+def topological_order(pipelines: list[dict]) -> list[str]:
+    """按 dependencies 拓扑排序（Kahn 算法），存在环时抛 ValueError
+
+    指向未配置 pipeline 的依赖会被忽略。
+    """
+    ids = [p["id"] for p in pipelines]
+    known = set(ids)
+    indegree = {pid: 0 for pid in ids}
+    downstream: dict[str, list[str]] = {pid: [] for pid in ids}
+    for p in pipelines:
+        for dep in p.get("dependencies", []):
+            if dep in known:
+                indegree[p["id"]] += 1
+                downstream[dep].append(p["id"])
+
+    ready = [pid for pid in ids if indegree[pid] == 0]
+    order: list[str] = []
+    while ready:
+        pid = ready.pop(0)
+        order.append(pid)
+        for child in downstream[pid]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                ready.append(child)
+
+    if len(order) != len(ids):
+        cyclic = sorted(pid for pid, d in indegree.items() if d > 0)
+        raise ValueError(f"pipeline 依赖存在环: {cyclic}")
+    return order
+
+
+class PipelineScheduler:
+    """asyncio 调度器
+
+    on_execution 在每次运行结束（含重试、超时、跳过）后收到一条执行记录；
+    handlers 按 pipeline_id 注册实际执行逻辑，handler_types 按配置中的 handler 字段注册，
+    前者优先；处理函数可为同步或异步函数，返回值中的 rows_processed / cost_yuan
+    会写入执行记录；
+    没有处理函数的 pipeline 到期时只推进下次触发时间，不产生执行记录。
+    """
+
+    def __init__(
+        self,
+        pipelines: list[dict],
+        on_execution: ExecutionSink,
+        max_workers: int = 4,
+        last_status: dict[str, str] | None = None,
+        clock: Callable[[], datetime] = datetime.now,
+    ):
+        self.on_execution = on_execution
+        self.handlers: dict[str, PipelineHandler] = {}
+        self.handler_types: dict[str, PipelineHandler] = {}
+        self.clock = clock
+        self._workers = asyncio.Semaphore(max_workers)
+        self._last_status: dict[str, str] = dict(last_status or {})
+        self._running: dict[str, asyncio.Task] = {}
+        # 已超时但线程仍在运行的同步处理函数
+        self._orphans: dict[str, asyncio.Future] = {}
+        self._heap: list[tuple[datetime, int, str]] = []
+        self._pipelines: dict[str, dict] = {}
+        self._schedules: dict[str, CronSchedule] = {}
+        self._rank: dict[str, int] = {}
+        self._wakeup = asyncio.Event()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stopped = False
+        self.load(pipelines)
+
+    # -- 配置 ---------------------------------------------------------------
+
+    def register_handler(self, pipeline_id: str, handler: PipelineHandler) -> None:
+        self.handlers[pipeline_id] = handler
+
+    def register_handler_type(self, name: str, handler: PipelineHandler) -> None:
+        """注册处理类型，供配置中 handler: <name> 的 pipeline 使用"""
+        self.handler_types[name] = handler
+
+    def handler_for(self, pipeline_id: str) -> PipelineHandler | None:
+        handler = self.handlers.get(pipeline_id)
+        if handler is None:
+            pipeline = self._pipelines.get(pipeline_id, {})
+            handler = self.handler_types.get(pipeline.get("handler", ""))
+        return handler
+
+    def load(self, pipelines: list[dict], now: datetime | None = None) -> None:
+        """(重新) 加载 pipeline 配置并重建定时堆，配置热重载时调用
+
+        可在任意线程调用：校验与解析在调用方线程完成，出错直接抛出；
+        调度循环运行中时，状态替换投递到事件循环线程执行。
+        """
+        order = topological_order(pipelines)
+        schedules = {
+            p["id"]: CronSchedule(p["schedule"]) for p in pipelines if p.get("status") != "paused"
+        }
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            loop.call_soon_threadsafe(self._apply, pipelines, order, schedules, now)
+        else:
+            self._apply(pipelines, order, schedules, now)
+
+    def _apply(
+        self,
+        pipelines: list[dict],
+        order: list[str],
+        schedules: dict[str, CronSchedule],
+        now: datetime | None,
+    ) -> None:
+        now = now or self.clock()
+        self._pipelines = {p["id"]: p for p in pipelines}
+        self._rank = {pid: i for i, pid in enumerate(order)}
+        self._schedules = schedules
+        self._heap = [
+            (cron.next_after(now), self._rank[pid], pid) for pid, cron in schedules.items()
+        ]
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+
+    def next_fire_time(self) -> datetime | None:
+        return self._heap[0][0] if self._heap else None
+
+    # -- 主循环 -------------------------------------------------------------
+
+    async def run_forever(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopped = False
+        while not self._stopped:
+            self._wakeup.clear()
+            now = self.clock()
+            fire_at = self.next_fire_time()
+            if fire_at is not None and fire_at <= now:
+                self.tick(now)
+                continue
+            delay = None if fire_at is None else (fire_at - now).total_seconds()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self) -> None:
+        """停止调度并等待正在运行的 pipeline 结束"""
+        self._stopped = True
+        self._wakeup.set()
+        if self._running:
+            await asyncio.gather(*self._running.values(), return_exceptions=True)
+
+    def tick(self, now: datetime) -> list[asyncio.Task]:
+        """弹出所有到期的触发并按拓扑序派发，返回本批创建的任务
+
+        错过的多次触发（例如进程挂起）合并为一次运行；未注册处理函数的跳过。
+        """
+        due: list[tuple[int, str]] = []
+        while self._heap and self._heap[0][0] <= now:
+            _, rank, pid = heapq.heappop(self._heap)
+            heapq.heappush(self._heap, (self._schedules[pid].next_after(now), rank, pid))
+            if self.handler_for(pid) is not None:
+                due.append((rank, pid))
+        due.sort()
+        return [self.trigger(pid) for _, pid in due]
+
+    def trigger(self, pipeline_id: str) -> asyncio.Task:
+        """立即触发一次运行；同一 pipeline 已在运行时复用该任务
+
+        pipeline 未注册处理函数时抛 KeyError。
+        """
+        if self.handler_for(pipeline_id) is None:
+            raise KeyError(f"pipeline 未注册处理函数: {pipeline_id}")
+        running = self._running.get(pipeline_id)
+        if running is not None and not running.done():
+            return running
+        task = asyncio.get_running_loop().create_task(self._run(pipeline_id))
+        self._running[pipeline_id] = task
+        task.add_done_callback(lambda t: self._forget(pipeline_id, t))
+        return task
+
+    def _forget(self, pipeline_id: str, task: asyncio.Task) -> None:
+        if self._running.get(pipeline_id) is task:
+            del self._running[pipeline_id]
+
+    # -- 执行 ---------------------------------------------------------------
+
+    async def _wait_dependencies(self, pipeline: dict) -> list[str]:
+        """等待运行中的上游结束，返回最近一次未成功的上游列表"""
+        deps = [d for d in pipeline.get("dependencies", []) if d in self._pipelines]
+        upstream = [self._running[d] for d in deps if d in self._running]
+        if upstream:
+            await asyncio.gather(*upstream, return_exceptions=True)
+        return [d for d in deps if self._last_status.get(d, "success") != "success"]
+
+    async def _call_handler(self, pipeline: dict, timeout: float) -> dict:
+        """执行处理函数，超时抛 asyncio.TimeoutError
+
+        异步处理函数超时即被取消；同步处理函数的线程无法取消，
+        超时后记入 _orphans，直到线程真正结束。
+        """
+        pipeline_id = pipeline["id"]
+        handler = self.handler_for(pipeline_id)
+        if inspect.iscoroutinefunction(handler):
+            result = await asyncio.wait_for(handler(pipeline), timeout)
+        else:
+            work = asyncio.ensure_future(asyncio.to_thread(handler, pipeline))
+            try:
+                result = await asyncio.wait_for(asyncio.shield(work), timeout)
+            except asyncio.TimeoutError:
+                self._orphans[pipeline_id] = work
+                work.add_done_callback(lambda f: self._release_orphan(pipeline_id, f))
+                raise
+        return result or {}
+
+    def _release_orphan(self, pipeline_id: str, work: asyncio.Future) -> None:
+        if self._orphans.get(pipeline_id) is work:
+            del self._orphans[pipeline_id]
+        if not work.cancelled():
+            work.exception()  # 已按超时记录，取走异常避免 "never retrieved" 警告
+
+    async def _run(self, pipeline_id: str) -> dict:
+        pipeline = self._pipelines[pipeline_id]
+        cfg = pipeline.get("config", {})
+        timeout = cfg.get("timeout_minutes", DEFAULT_TIMEOUT_MINUTES) * 60
+        attempts_allowed = 1 + max(cfg.get("retry_count", 0), 0)
+
+        failed_deps = await self._wait_dependencies(pipeline)
+        start = self.clock()
+        result: dict[str, Any] = {}
+        attempts = 0
+        error = None
+        if failed_deps:
+            status = "skipped"
+            error = f"上游未成功: {', '.join(failed_deps)}"
+        elif pipeline_id in self._orphans:
+            status = "skipped"
+            error = "上次超时的运行仍在后台执行"
+        else:
+            async with self._workers:
+                start = self.clock()
+                status = "failed"
+                while attempts < attempts_allowed and status != "success":
+                    attempts += 1
+                    try:
+                        result = await self._call_handler(pipeline, timeout)
+                        status = "success"
+                    except asyncio.TimeoutError:
+                        status, error = "timeout", f"超过 {timeout // 60} 分钟未完成"
+                        if pipeline_id in self._orphans:
+                            break  # 线程仍在运行，重试会与它并发
+                    except Exception as exc:
+                        status, error = "failed", str(exc)
+
+        end = self.clock()
+        self._last_status[pipeline_id] = status
+        exec_id = hashlib.md5(f"{pipeline_id}-{start.isoformat()}".encode()).hexdigest()
+        record = {
+            "id": exec_id[:12],
+            "pipeline_id": pipeline_id,
+            "pipeline_name": pipeline["name"],
+            "start_time": start.isoformat(),
+            "end_time": end.isoformat(),
+            "duration_minutes": round((end - start).total_seconds() / 60),
+            "status": status,
+            "rows_processed": int(result.get("rows_processed", 0)),
+            "cost_yuan": round(float(result.get("cost_yuan", 0.0)), 2),
+            "owner": pipeline["owner"],
+            "attempts": attempts,
+        }
+        if error:
+            record["error"] = error
+        self.on_execution(record)
+        return record
@@ -0,0 +1,43 @@
+"""
+调度器 leader 选举 — 多个 uvicorn worker 共用一个锁文件（core.filelock），只有持锁的 worker 运行调度器
+
+锁随持有进程退出由内核释放，leader 崩溃或重启后其他 worker 在下一次轮询时接替。
+"""
+
+import os
+from pathlib import Path
+
+from core import filelock
+
+
+class LeaderLock:
+    """非阻塞的独占文件锁；try_acquire 成功后一直持有到 release"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._fd: int | None = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if not filelock.lock(fd, blocking=False):
+            os.close(fd)
+            return False
+        # 记下持锁进程，便于排查
+        os.ftruncate(fd, 0)
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is not None:
+            filelock.unlock(self._fd)
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,89 @@
+"""
+SQLite 连接池 — 每个线程复用一个已配置好的连接
+连接只在首次使用时打开并执行 PRAGMA；sqlite3 自带的语句缓存（cached_statements）
+让同一连接上的重复 SQL 复用预编译语句。写操作通过 transaction() 合并为单个事务。
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # WAL 下 NORMAL 只在 checkpoint 时 fsync
+    "cache_size": -65536,  # 64MB page cache
+    "mmap_size": 268435456,  # 256MB
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+
+class SQLitePool:
+    """线程本地连接池
+
+    FastAPI 的同步路由运行在线程池中，每个 worker 线程持有一个长连接；
+    连接以 autocommit 模式打开，事务边界由 transaction() 显式控制。
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        pragmas: dict | None = None,
+        cached_statements: int = 256,
+    ):
+        self.path = path
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: list[sqlite3.Connection] = []
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            str(self.path),
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        for key, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {key}={value}")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """当前线程的连接；不要 close，由连接池统一管理"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    @contextmanager
+    def transaction(self, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+        """单事务执行，异常时回滚
+
+        immediate=True 在开始时即获取写锁，适合"先查后写"的流程，
+        避免两个事务读到相同状态后再争抢写锁。嵌套调用复用外层事务。
+        """
+        conn = self.connection()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def close_all(self) -> None:
+        """关闭所有线程的连接（测试清理或进程退出时调用）"""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
@@ -0,0 +1,380 @@
+"""
+执行历史持久化 — 按月分段的 append-only SQLite 存储
+每个月一个段文件 history-YYYY-MM.db，内含 executions / quality_checks / alerts 三张表，
+按 (pipeline_id, 时间) 建索引；时间窗口查询只打开覆盖到的段。
+meta.db 保存全局 generation，每次追加后递增，供多进程判断是否有新数据。
+多个 uvicorn worker 通过 WAL 模式共享同一份数据。
+每个段文件与 meta.db 各用一个 SQLitePool，连接与 PRAGMA 只在每个线程首次使用时建立；
+段的建表语句每个进程只执行一次，且在一个事务中完成：其他进程刚创建、尚未建表的
+段文件对读取方不可见（查询时跳过）。
+"""
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+
+from core.sqlite_pool import SQLitePool
+
+# 多进程同时追加时等待写锁的时间
+_PRAGMAS = {"busy_timeout": 30000}
+
+_SEGMENT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS executions (
+    id TEXT PRIMARY KEY,
+    pipeline_id TEXT NOT NULL,
+    pipeline_name TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    duration_minutes INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    rows_processed INTEGER NOT NULL,
+    cost_yuan REAL NOT NULL,
+    owner TEXT NOT NULL,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_exec_time ON executions(start_time);
+CREATE INDEX IF NOT EXISTS idx_exec_pipeline ON executions(pipeline_id, start_time);
+CREATE INDEX IF NOT EXISTS idx_exec_owner ON executions(owner, start_time);
+
+CREATE TABLE IF NOT EXISTS quality_checks (
+    rule_id TEXT NOT NULL,
+    rule_name TEXT NOT NULL,
+    pipeline_id TEXT NOT NULL,
+    target_table TEXT NOT NULL,
+    check_type TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    check_time TEXT NOT NULL,
+    passed INTEGER NOT NULL,
+    violation_ratio REAL NOT NULL,
+    threshold NOT NULL,
+    extra TEXT,
+    UNIQUE (rule_id, check_time)
+);
+CREATE INDEX IF NOT EXISTS idx_check_time ON quality_checks(check_time);
+CREATE INDEX IF NOT EXISTS idx_check_pipeline ON quality_checks(pipeline_id, check_time);
+
+CREATE TABLE IF NOT EXISTS alerts (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    pipeline_id TEXT NOT NULL,
+    pipeline_name TEXT NOT NULL,
+    message TEXT NOT NULL,
+    time TEXT NOT NULL,
+    resolved INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_alert_time ON alerts(time);
+"""
+
+_EXEC_COLUMNS = (
+    "id",
+    "pipeline_id",
+    "pipeline_name",
+    "start_time",
+    "end_time",
+    "duration_minutes",
+    "status",
+    "rows_processed",
+    "cost_yuan",
+    "owner",
+)
+_CHECK_COLUMNS = (
+    "rule_id",
+    "rule_name",
+    "pipeline_id",
+    "target_table",
+    "check_type",
+    "severity",
+    "check_time",
+    "passed",
+    "violation_ratio",
+    "threshold",
+)
+_ALERT_COLUMNS = (
+    "id",
+    "type",
+    "severity",
+    "pipeline_id",
+    "pipeline_name",
+    "message",
+    "time",
+    "resolved",
+)
+
+# 各表: (时间列, 列名, 是否有 extra 列)
+_TABLES = {
+    "executions": ("start_time", _EXEC_COLUMNS, True),
+    "quality_checks": ("check_time", _CHECK_COLUMNS, True),
+    "alerts": ("time", _ALERT_COLUMNS, False),
+}
+
+# (segment 月份) -> (executions 最大 rowid, quality_checks 最大 rowid)
+Watermark = dict[str, tuple[int, int]]
+
+
+class HistoryStore:
+    """执行 / 质量检查 / 告警历史的分段存储"""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._meta = SQLitePool(self.root / "meta.db", _PRAGMAS)
+        self._pools: dict[str, SQLitePool] = {}
+        self._ready: set[str] = set()  # 本进程已执行过建表语句的段
+        self._lock = threading.Lock()
+        with self._meta.transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)")
+
+    def close(self) -> None:
+        """关闭所有段与 meta.db 的连接"""
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+            self._ready.clear()
+        for pool in pools:
+            pool.close_all()
+        self._meta.close_all()
+
+    # -- 段管理 -------------------------------------------------------------
+
+    def _segment_path(self, month: str) -> Path:
+        return self.root / f"history-{month}.db"
+
+    def segments(self) -> list[str]:
+        """已有段的月份列表，升序"""
+        return sorted(p.stem[len("history-") :] for p in self.root.glob("history-*.db"))
+
+    def _pool(self, month: str) -> SQLitePool:
+        pool = self._pools.get(month)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(month)
+                if pool is None:
+                    pool = self._pools[month] = SQLitePool(self._segment_path(month), _PRAGMAS)
+        return pool
+
+    def _segment(self, month: str) -> sqlite3.Connection:
+        """当前线程在该段上的连接（不要 close）"""
+        return self._pool(month).connection()
+
+    def _open_segment(self, month: str) -> SQLitePool:
+        """写入用的段，必要时创建；建表语句幂等，多进程同时创建也安全"""
+        pool = self._pool(month)
+        if month not in self._ready:
+            # 连接建立时段文件即已创建，建表放在同一事务里，读取方不会看到只建了一半的段
+            with pool.transaction(immediate=True) as conn:
+                for statement in _SEGMENT_SCHEMA.split(";"):
+                    if statement.strip():
+                        conn.execute(statement)
+            with self._lock:
+                self._ready.add(month)
+        return pool
+
+    def _readable(self, month: str) -> bool:
+        """段的建表事务是否已提交；结果为真时记入 _ready，之后不再检查"""
+        if month in self._ready:
+            return True
+        conn = self._segment(month)
+        found = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'alerts'"
+        ).fetchone()
+        if found is None:
+            return False
+        with self._lock:
+            self._ready.add(month)
+        return True
+
+    def _readable_segments(self) -> list[str]:
+        return [m for m in self.segments() if self._readable(m)]
+
+    def _segments_in(self, start: str | None, end: str | None) -> list[str]:
+        lo = start[:7] if start else ""
+        hi = end[:7] if end else "9999-99"
+        return [m for m in self._readable_segments() if lo <= m <= hi]
+
+    # -- 写入 ---------------------------------------------------------------
+
+    def generation(self) -> int:
+        conn = self._meta.connection()
+        return conn.execute("SELECT value FROM meta WHERE key='generation'").fetchone()[0]
+
+    def _bump_generation(self) -> None:
+        # 连接为 autocommit 模式，单条 UPDATE 即一个事务
+        self._meta.connection().execute("UPDATE meta SET value = value + 1 WHERE key='generation'")
+
+    def _append(self, table: str, records: Iterable[dict]) -> int:
+        time_col, columns, has_extra = _TABLES[table]
+        by_month: dict[str, list[tuple]] = {}
+        for r in records:
+            row = [r[c] for c in columns]
+            if has_extra:
+                extra = {k: v for k, v in r.items() if k not in columns}
+                row.append(json.dumps(extra, ensure_ascii=False) if extra else None)
+            by_month.setdefault(r[time_col][:7], []).append(tuple(row))
+        if not by_month:
+            return 0
+
+        names = list(columns) + (["extra"] if has_extra else [])
+        sql = (
+            f"INSERT OR IGNORE INTO {table} ({', '.join(names)}) "
+            f"VALUES ({', '.join('?' * len(names))})"
+        )
+        inserted = 0
+        for month, rows in by_month.items():
+            with self._open_segment(month).transaction() as conn:
+                inserted += conn.executemany(sql, rows).rowcount
+        if inserted:
+            self._bump_generation()
+        return inserted
+
+    def append_executions(self, records: Iterable[dict]) -> int:
+        return self._append("executions", records)
+
+    def append_checks(self, records: Iterable[dict]) -> int:
+        return self._append("quality_checks", records)
+
+    def append_alerts(self, records: Iterable[dict]) -> int:
+        return self._append("alerts", records)
+
+    def is_empty(self) -> bool:
+        return not self.segments()
+
+    # -- 查询 ---------------------------------------------------------------
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        d = dict(row)
+        extra = d.pop("extra", None)
+        if extra:
+            d.update(json.loads(extra))
+        for flag in ("passed", "resolved"):
+            if flag in d:
+                d[flag] = bool(d[flag])
+        return d
+
+    def _query(
+        self,
+        table: str,
+        where: list[tuple[str, list]],
+        start: str | None,
+        end: str | None,
+        limit: int,
+        oldest_first: bool,
+    ) -> list[dict]:
+        """跨段查询；按时间顺序逐段扫描，凑够 limit 条即停止"""
+        time_col = _TABLES[table][0]
+        clauses = [c for c, _ in where]
+        params = [p for _, ps in where for p in ps]
+        if start:
+            clauses.append(f"{time_col} >= ?")
+            params.append(start)
+        if end:
+            clauses.append(f"{time_col} < ?")
+            params.append(end)
+        sql = f"SELECT * FROM {table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        order = "ASC" if oldest_first else "DESC"
+        # rowid 作为同一时间点的次序键，与写入顺序一致
+        sql += f" ORDER BY {time_col} {order}, rowid {order} LIMIT ?"
+
+        months = self._segments_in(start, end)
+        if not oldest_first:
+            months.reverse()
+        result: list[dict] = []
+        for month in months:
+            remaining = limit - len(result) if limit > 0 else -1
+            rows = self._segment(month).execute(sql, params + [remaining]).fetchall()
+            result.extend(self._to_dict(r) for r in rows)
+            if limit > 0 and len(result) >= limit:
+                break
+        return result
+
+    def executions(
+        self,
+        limit: int = 0,
+        pipeline_id: str | None = None,
+        owner: str | None = None,
+        start: str | None = None,
+        end: str | None = None,
+        oldest_first: bool = False,
+    ) -> list[dict]:
+        """按时间窗口 [start, end) 与 pipeline / owner 查询执行记录"""
+        where = []
+        if pipeline_id is not None:
+            where.append(("pipeline_id = ?", [pipeline_id]))
+        if owner is not None:
+            where.append(("owner = ?", [owner]))
+        return self._query("executions", where, start, end, limit, oldest_first)
+
+    def checks(
+        self,
+        limit: int = 0,
+        rule_id: str | None = None,
+        pipeline_ids: Iterable[str] | None = None,
+        start: str | None = None,
+        end: str | None = None,
+        oldest_first: bool = False,
+    ) -> list[dict]:
+        """按时间窗口与 rule / pipeline 集合查询质量检查"""
+        where = []
+        if rule_id is not None:
+            where.append(("rule_id = ?", [rule_id]))
+        if pipeline_ids is not None:
+            ids = sorted(set(pipeline_ids))
+            if not ids:
+                return []
+            where.append((f"pipeline_id IN ({', '.join('?' * len(ids))})", ids))
+        return self._query("quality_checks", where, start, end, limit, oldest_first)
+
+    def alerts(self, limit: int = 0) -> list[dict]:
+        return self._query("alerts", [], None, None, limit, False)
+
+    def count_unresolved_alerts(self) -> int:
+        total = 0
+        for month in self._readable_segments():
+            conn = self._segment(month)
+            total += conn.execute("SELECT COUNT(*) FROM alerts WHERE resolved = 0").fetchone()[0]
+        return total
+
+    def marks(self) -> Watermark:
+        """各段 executions / quality_checks 当前的最大 rowid"""
+        mark: Watermark = {}
+        for month in self._readable_segments():
+            conn = self._segment(month)
+            mark[month] = tuple(
+                conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0]
+                for table in ("executions", "quality_checks")
+            )
+        return mark
+
+    def rows_between(
+        self,
+        table: str,
+        columns: Sequence[str],
+        since: Watermark,
+        until: Watermark,
+        chunk_size: int = 100_000,
+    ) -> Iterator[list[tuple]]:
+        """(since, until] 之间新增的行，逐段按时间顺序分块返回
+
+        columns 可以是 SQL 表达式；table 为 executions 或 quality_checks。
+        供 ExecutionHistory 增量追加到列式表。
+        """
+        time_col = _TABLES[table][0]
+        slot = 0 if table == "executions" else 1
+        sql = (
+            f"SELECT {', '.join(columns)} FROM {table} "
+            f"WHERE rowid > ? AND rowid <= ? ORDER BY {time_col}, rowid"
+        )
+        for month in sorted(until):
+            seen = since.get(month, (0, 0))[slot]
+            upto = until[month][slot]
+            if upto <= seen:
+                continue
+            cur = self._segment(month).execute(sql, (seen, upto))
+            while rows := cur.fetchmany(chunk_size):
+                yield rows
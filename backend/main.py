@@ -3,15 +3,27 @@ DataOps Studio — 大模型训练数据管理和探索平台 API 后端
 启动: uvicorn main:app --reload --port 8000
 """
 
-from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import os
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime
 from pathlib import Path
 
-import yaml
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from agent_annotation import router as agent_annotation_router
+import rlhf_annotation
+from agent_annotation import router as agent_annotation_router, importer_registry
 from ai_chat import router as ai_chat_router
+from core.config_loader import ConfigLoader, SharedGeneration, diff_by_id
+from core.dedup import DedupIndex, dedup_jsonl
+from core.history import CheckRollup, ExecutionHistory, ExecutionRollup, recent_days
+from core.lineage import LineageGraph
+from core.quality import find_table_file, run_rules
+from core.scheduler import LeaderLock, PipelineScheduler
+from core.store import HistoryStore
 from data_insight import router as data_insight_router
 from mock_data import TEAM_NAMES, generate_all
 from quality_lab import router as quality_lab_router
@@ -28,7 +40,31 @@ from system_log import (
     log_audit,
 )
 
-app = FastAPI(title="DataOps Studio API", version="1.0.0")
+# 设为 0 可关闭后台调度；多 worker 部署时由 leader 锁保证只有一个 worker 运行调度器
+SCHEDULER_ENABLED = os.getenv("DATAOPS_SCHEDULER", "1") != "0"
+# 非 leader 的 worker 争抢 leader 锁的间隔（秒），leader 退出后由其他 worker 接替
+SCHEDULER_LEADER_INTERVAL = float(os.getenv("DATAOPS_SCHEDULER_LEADER_INTERVAL", "5"))
+# 多 worker 部署时各 worker 轮询共享 generation 的间隔（秒），跟随其他 worker 的重载
+CONFIG_WATCH_INTERVAL = float(os.getenv("DATAOPS_CONFIG_WATCH_INTERVAL", "1"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    task = asyncio.create_task(_run_scheduler_as_leader()) if SCHEDULER_ENABLED else None
+    watcher = asyncio.create_task(_watch_config_generation())
+    yield
+    watcher.cancel()
+    if task is not None:
+        await SCHEDULER.stop()
+        task.cancel()
+    importer_registry.close()
+    if _dedup_index is not None:
+        _dedup_index.close()
+    rlhf_annotation.close_contamination_index()
+    STORE.close()
+
+
+app = FastAPI(title="DataOps Studio API", version="1.0.0", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -50,26 +86,167 @@ app.add_middleware(LoggingMiddleware)
 # 加载 YAML 配置
 # ---------------------------------------------------------------------------
 CONFIG_DIR = Path(__file__).parent / "configs"
+CONFIG_FILES = ("pipelines.yaml", "quality.yaml", "permission.yaml", "annotation.yaml")
+CONFIG = ConfigLoader(CONFIG_DIR, CONFIG_FILES)
+CONFIG.refresh()
+
+PIPELINES = CONFIG.get("pipelines.yaml")["pipelines"]
+QUALITY_RULES = CONFIG.get("quality.yaml")["rules"]
+# 运行时数据（执行历史、配置 generation、调度 leader 锁）目录；测试指向临时目录
+DATA_DIR = Path(os.getenv("DATAOPS_DATA_DIR", Path(__file__).parent / "data"))
+# 质量规则引擎读取的本地数据文件目录：{target_table}.parquet / .csv / .jsonl
+QUALITY_TABLE_DIR = Path(
+    os.getenv("DATAOPS_TABLE_DIR", Path(__file__).parent / "data" / "tables")
+)
 
 
-def _load_yaml(name: str):
-    with open(CONFIG_DIR / name, encoding="utf-8") as f:
-        return yaml.safe_load(f)
-
+def _index_pipelines(pipelines: list[dict]) -> dict[str, dict]:
+    # ID 重复时与线性查找一致，取第一个
+    index: dict[str, dict] = {}
+    for p in pipelines:
+        index.setdefault(p["id"], p)
+    return index
 
-_pipelines_cfg = _load_yaml("pipelines.yaml")
-_quality_cfg = _load_yaml("quality.yaml")
-_permission_cfg = _load_yaml("permission.yaml")
-_annotation_cfg = _load_yaml("annotation.yaml")
 
-PIPELINES = _pipelines_cfg["pipelines"]
-QUALITY_RULES = _quality_cfg["rules"]
+PIPELINE_BY_ID = _index_pipelines(PIPELINES)
+# 表级血缘图，pipeline 配置变化时重建
+LINEAGE = LineageGraph(PIPELINES)
 
 # 初始化 RLHF 标注模块
-init_annotation_config(_annotation_cfg)
+init_annotation_config(CONFIG.get("annotation.yaml"))
+
+# 配置重载的跨 worker 广播：启动时已加载最新配置，记下当前 generation
+CONFIG_GENERATION = SharedGeneration(DATA_DIR / "config.db")
+_config_lock = threading.Lock()
+_config_generation_seen = CONFIG_GENERATION.current()
+
+# 执行历史持久化；首次启动（存储为空）时写入模拟数据
+HISTORY_DIR = DATA_DIR / "history"
+STORE = HistoryStore(HISTORY_DIR)
+if STORE.is_empty():
+    _executions, _quality_checks, _alerts = generate_all(PIPELINES, QUALITY_RULES)
+    # generate_all 为倒序，按时间先后写入以保持 rowid 与追加顺序一致
+    STORE.append_executions(reversed(_executions))
+    STORE.append_checks(reversed(_quality_checks))
+    STORE.append_alerts(reversed(_alerts))
+HISTORY = ExecutionHistory.from_store(STORE)
+_history_lock = threading.Lock()
+
+
+def _record_execution(record: dict):
+    """调度器回调: 写入执行历史，未成功的运行生成告警"""
+    with _history_lock:
+        HISTORY.append_execution(record)
+    if record["status"] != "success":
+        STORE.append_alerts(
+            [
+                {
+                    "id": f"ALT-{record['id'][:8]}",
+                    "type": "execution_failure",
+                    "severity": "critical"
+                    if record["status"] == "failed"
+                    else "warning",
+                    "pipeline_id": record["pipeline_id"],
+                    "pipeline_name": record["pipeline_name"],
+                    "message": f"管道 [{record['pipeline_name']}] 执行{record['status']}, 耗时{record['duration_minutes']}分钟",
+                    "time": record["end_time"],
+                    "resolved": False,
+                }
+            ]
+        )
+
+
+def _last_status() -> dict[str, str]:
+    last = {}
+    for p in PIPELINES:
+        recent = HISTORY.latest_executions(1, pipeline_id=p["id"])
+        if recent:
+            last[p["id"]] = recent[0]["status"]
+    return last
+
+
+# Pipeline 调度器 — 由 lifespan 启动，配置热重载时重新加载
+SCHEDULER = PipelineScheduler(
+    PIPELINES, on_execution=_record_execution, last_status=_last_status()
+)
+
+# 近似去重：语料目录（输入 JSONL 与去重后的 *.dedup.jsonl）与持久化的 MinHash-LSH 索引
+CORPUS_DIR = Path(
+    os.getenv("DATAOPS_CORPUS_DIR", Path(__file__).parent / "data" / "corpora")
+)
+DEDUP_INDEX_DIR = Path(
+    os.getenv("DATAOPS_DEDUP_DIR", Path(__file__).parent / "data" / "dedup")
+)
+# pipelines.yaml 中未配置 dedup_pipeline 时手动运行使用的默认信息
+DEDUP_PIPELINE = {
+    "id": "dedup_pipeline",
+    "name": "数据去重 (MinHash LSH)",
+    "owner": "pretrain-data",
+}
+_dedup_index: DedupIndex | None = None
+_dedup_index_lock = threading.Lock()
+
+
+def _get_dedup_index() -> DedupIndex:
+    """首次使用时打开索引（读入历史桶键），之后各批次增量追加"""
+    global _dedup_index
+    with _dedup_index_lock:
+        if _dedup_index is None:
+            _dedup_index = DedupIndex(DEDUP_INDEX_DIR)
+        return _dedup_index
+
+
+def _dedup_corpus(corpus: str, text_field: str = "text", id_field: str = "id") -> dict:
+    path = CORPUS_DIR / Path(corpus).name
+    if not path.is_file():
+        raise FileNotFoundError(f"corpus not found: {path.name}")
+    output = path.with_name(f"{path.stem}.dedup.jsonl")
+    stats = dedup_jsonl(_get_dedup_index(), path, output, text_field, id_field)
+    return {"corpus": path.name, "output": output.name, **stats}
+
+
+def _dedup_handler(pipeline: dict) -> dict:
+    """dedup_pipeline 的调度处理函数；config.input 为 CORPUS_DIR 下的 JSONL 文件名"""
+    cfg = pipeline.get("config", {})
+    stats = _dedup_corpus(
+        cfg["input"], cfg.get("text_field", "text"), cfg.get("id_field", "id")
+    )
+    return {"rows_processed": stats["docs"], **stats}
+
+
+def _quality_check_handler(pipeline: dict) -> dict:
+    """对 pipeline 产出的 target_table 执行其质量规则，检查结果写入检查历史
+
+    数据文件不存在或规则执行出错时抛异常，本次运行记为失败。
+    """
+    table = pipeline["target_table"]
+    if find_table_file(QUALITY_TABLE_DIR, table) is None:
+        raise FileNotFoundError(f"table file not found: {table}")
+    rules = [r for r in QUALITY_RULES if r["pipeline_id"] == pipeline["id"]]
+    result = run_rules(rules, QUALITY_TABLE_DIR)
+    if result["checks"]:
+        STORE.append_checks(result["checks"])
+    if result["errors"]:
+        error = result["errors"][0]
+        raise ValueError(f"{error['rule_id']}: {error['error']}")
+    rows = sum(t["rows"] for t in result["tables"].values())
+    return {"rows_processed": rows, "checks": len(result["checks"])}
+
+
+# pipelines.yaml 中 handler 字段的取值 → 处理函数
+SCHEDULER.register_handler_type("dedup", _dedup_handler)
+SCHEDULER.register_handler_type("quality_check", _quality_check_handler)
+SCHEDULER_LOCK = LeaderLock(DATA_DIR / "scheduler.lock")
 
-# 生成模拟数据
-EXECUTIONS, QUALITY_CHECKS, ALERTS = generate_all(PIPELINES, QUALITY_RULES)
+
+async def _run_scheduler_as_leader():
+    """轮询争抢 leader 锁，抢到后在本 worker 运行调度器直到关闭"""
+    while not SCHEDULER_LOCK.try_acquire():
+        await asyncio.sleep(SCHEDULER_LEADER_INTERVAL)
+    try:
+        await SCHEDULER.run_forever()
+    finally:
+        SCHEDULER_LOCK.release()
 
 
 # ---------------------------------------------------------------------------
@@ -79,25 +256,21 @@ EXECUTIONS, QUALITY_CHECKS, ALERTS = generate_all(PIPELINES, QUALITY_RULES)
 
 @app.get("/api/dashboard/stats")
 def dashboard_stats():
+    HISTORY.sync()
     active_count = sum(1 for p in PIPELINES if p["status"] == "active")
-    total_execs_today = sum(
-        1
-        for e in EXECUTIONS
-        if e["start_time"][:10] == datetime.now().strftime("%Y-%m-%d")
-    )
+    today = datetime.now().strftime("%Y-%m-%d")
+    total_execs_today = HISTORY.execution_total([today]).runs
     if total_execs_today == 0:
-        latest_date = EXECUTIONS[0]["start_time"][:10] if EXECUTIONS else ""
-        total_execs_today = sum(
-            1 for e in EXECUTIONS if e["start_time"][:10] == latest_date
-        )
+        total_execs_today = HISTORY.execution_total([HISTORY.latest_day]).runs
 
-    failed_checks = sum(1 for qc in QUALITY_CHECKS[-200:] if not qc["passed"])
-    total_checks = min(200, len(QUALITY_CHECKS))
-    quality_score = round((1 - failed_checks / max(total_checks, 1)) * 100, 1)
+    oldest = HISTORY.check_total(oldest=200)
+    failed_checks = oldest.checks - oldest.passed
+    quality_score = round((1 - failed_checks / max(oldest.checks, 1)) * 100, 1)
 
-    total_cost = round(sum(e["cost_yuan"] for e in EXECUTIONS), 2)
-    total_tokens = sum(e["rows_processed"] for e in EXECUTIONS)
-    unresolved_alerts = sum(1 for a in ALERTS if not a["resolved"])
+    overall = HISTORY.execution_total(recent_days(30))
+    total_cost = round(overall.cost_yuan, 2)
+    total_tokens = overall.rows_processed
+    unresolved_alerts = STORE.count_unresolved_alerts()
 
     return {
         "active_pipelines": active_count,
@@ -118,17 +291,21 @@ def dashboard_stats():
 @app.get("/api/dashboard/execution-trend")
 def execution_trend():
     """最近 14 天每天的执行成功/失败数"""
-    now = datetime.now()
+    HISTORY.sync()
+    days = recent_days(14)
+    by_day = HISTORY.execution_totals(("day",), days)
+    by_status = HISTORY.execution_totals(("day", "status"), days)
     trend = []
-    for day_offset in range(14, 0, -1):
-        day_str = (now - timedelta(days=day_offset)).strftime("%Y-%m-%d")
-        day_execs = [e for e in EXECUTIONS if e["start_time"][:10] == day_str]
+    for day_str in days:
+        total = by_day[(day_str,)].runs if (day_str,) in by_day else 0
+        cell = by_status.get((day_str, "success"))
+        success = cell.runs if cell else 0
         trend.append(
             {
                 "date": day_str,
-                "success": sum(1 for e in day_execs if e["status"] == "success"),
-                "failed": sum(1 for e in day_execs if e["status"] != "success"),
-                "total": len(day_execs),
+                "success": success,
+                "failed": total - success,
+                "total": total,
             }
         )
     return trend
@@ -136,28 +313,36 @@ def execution_trend():
 
 @app.get("/api/dashboard/alerts")
 def dashboard_alerts(limit: int = 20):
-    return ALERTS[:limit]
+    return STORE.alerts(limit)
 
 
 @app.get("/api/pipelines")
 def list_pipelines():
+    HISTORY.sync()
+    # 每个 pipeline 最近 30 次执行，按 (pipeline, status) 一次分组
+    recent = HISTORY.execution_totals(("pipeline_id", "status"), latest_per_pipeline=30)
+    totals: dict[str, ExecutionRollup] = {}
+    success: dict[str, int] = {}
+    for (pid, status), cell in recent.items():
+        total = totals.setdefault(pid, ExecutionRollup())
+        total.runs += cell.runs
+        total.cost_yuan += cell.cost_yuan
+        total.duration_minutes += cell.duration_minutes
+        if status == "success":
+            success[pid] = cell.runs
     result = []
     for p in PIPELINES:
         pid = p["id"]
-        recent = [e for e in EXECUTIONS if e["pipeline_id"] == pid][:30]
-        success_rate = (
-            sum(1 for e in recent if e["status"] == "success") / max(len(recent), 1)
-        ) * 100
-        avg_duration = sum(e["duration_minutes"] for e in recent) / max(len(recent), 1)
-        total_cost = sum(e["cost_yuan"] for e in recent)
-        last_exec = recent[0] if recent else None
+        total = totals.get(pid, ExecutionRollup())
+        runs = max(total.runs, 1)
+        last_exec = HISTORY.latest_executions(1, pipeline_id=pid)
         result.append(
             {
                 **p,
-                "success_rate_30d": round(success_rate, 1),
-                "avg_duration_30d": round(avg_duration, 1),
-                "total_cost_30d": round(total_cost, 2),
-                "last_execution": last_exec,
+                "success_rate_30d": round(success.get(pid, 0) / runs * 100, 1),
+                "avg_duration_30d": round(total.duration_minutes / runs, 1),
+                "total_cost_30d": round(total.cost_yuan, 2),
+                "last_execution": last_exec[0] if last_exec else None,
                 "team_name": TEAM_NAMES.get(p["owner"], p["owner"]),
             }
         )
@@ -166,36 +351,40 @@ def list_pipelines():
 
 @app.get("/api/pipelines/{pipeline_id}")
 def get_pipeline(pipeline_id: str):
-    for p in PIPELINES:
-        if p["id"] == pipeline_id:
-            recent = [e for e in EXECUTIONS if e["pipeline_id"] == pipeline_id][:50]
-            return {
-                **p,
-                "recent_executions": recent,
-                "team_name": TEAM_NAMES.get(p["owner"], p["owner"]),
-            }
-    return {"error": "not found"}
+    p = PIPELINE_BY_ID.get(pipeline_id)
+    if p is None:
+        return {"error": "not found"}
+    recent = HISTORY.latest_executions(50, pipeline_id=pipeline_id)
+    return {
+        **p,
+        "recent_executions": recent,
+        "team_name": TEAM_NAMES.get(p["owner"], p["owner"]),
+    }
 
 
 @app.get("/api/pipelines/{pipeline_id}/executions")
-def pipeline_executions(pipeline_id: str, limit: int = 50):
-    return [e for e in EXECUTIONS if e["pipeline_id"] == pipeline_id][:limit]
+def pipeline_executions(
+    pipeline_id: str, limit: int = 50, start: str = "", end: str = ""
+):
+    """执行记录，可选时间窗口 [start, end)，ISO 格式日期或时间"""
+    return HISTORY.latest_executions(
+        limit, pipeline_id=pipeline_id, start=start or None, end=end or None
+    )
 
 
 @app.get("/api/quality/rules")
 def list_quality_rules():
+    HISTORY.sync()
+    recent = HISTORY.check_totals(("rule_id",), latest_per_rule=30)
     result = []
     for r in QUALITY_RULES:
-        recent_checks = [qc for qc in QUALITY_CHECKS if qc["rule_id"] == r["id"]][:30]
-        pass_rate = (
-            sum(1 for qc in recent_checks if qc["passed"]) / max(len(recent_checks), 1)
-        ) * 100
+        cell = recent.get((r["id"],), CheckRollup())
         result.append(
             {
                 **r,
-                "pass_rate_30d": round(pass_rate, 1),
-                "total_checks_30d": len(recent_checks),
-                "recent_violations": sum(1 for qc in recent_checks if not qc["passed"]),
+                "pass_rate_30d": round(cell.passed / max(cell.checks, 1) * 100, 1),
+                "total_checks_30d": cell.checks,
+                "recent_violations": cell.checks - cell.passed,
             }
         )
     return result
@@ -203,45 +392,52 @@ def list_quality_rules():
 
 @app.get("/api/quality/checks")
 def list_quality_checks(limit: int = 100):
-    return QUALITY_CHECKS[:limit]
+    return HISTORY.latest_checks(limit)
+
+
+@app.post("/api/quality/run")
+def run_quality_checks(table: str = ""):
+    """对本地数据文件执行启用的质量规则（可只执行一张表），结果写入检查历史"""
+    rules = [r for r in QUALITY_RULES if not table or r["target_table"] == table]
+    if table and not rules:
+        return {"error": "not found"}
+    result = run_rules(rules, QUALITY_TABLE_DIR)
+    if result["checks"]:
+        STORE.append_checks(result["checks"])
+        HISTORY.sync()
+    return result
 
 
 @app.get("/api/quality/score-trend")
 def quality_score_trend():
     """最近 14 天质量评分趋势"""
-    now = datetime.now()
+    HISTORY.sync()
+    days = recent_days(14)
+    by_day = HISTORY.check_totals(("day",), days)
     trend = []
-    for day_offset in range(14, 0, -1):
-        day_str = (now - timedelta(days=day_offset)).strftime("%Y-%m-%d")
-        day_checks = [qc for qc in QUALITY_CHECKS if qc["check_time"][:10] == day_str]
-        if day_checks:
-            score = round(
-                (sum(1 for qc in day_checks if qc["passed"]) / len(day_checks)) * 100,
-                1,
-            )
+    for day_str in days:
+        day_checks = by_day.get((day_str,), CheckRollup())
+        if day_checks.checks:
+            score = round((day_checks.passed / day_checks.checks) * 100, 1)
         else:
             score = 0
-        trend.append({"date": day_str, "score": score, "checks": len(day_checks)})
+        trend.append({"date": day_str, "score": score, "checks": day_checks.checks})
     return trend
 
 
 @app.get("/api/cost/summary")
 def cost_summary():
-    total = sum(e["cost_yuan"] for e in EXECUTIONS)
+    HISTORY.sync()
+    days = recent_days(30)
+    total = HISTORY.execution_total(days).cost_yuan
     by_pipeline = {}
-    for e in EXECUTIONS:
-        pid = e["pipeline_id"]
-        by_pipeline.setdefault(
-            pid,
-            {
-                "pipeline_id": pid,
-                "pipeline_name": e["pipeline_name"],
-                "cost": 0,
-                "runs": 0,
-            },
-        )
-        by_pipeline[pid]["cost"] += e["cost_yuan"]
-        by_pipeline[pid]["runs"] += 1
+    for (pid,), cell in HISTORY.execution_totals(("pipeline_id",), days).items():
+        by_pipeline[pid] = {
+            "pipeline_id": pid,
+            "pipeline_name": HISTORY.pipeline_names.get(pid, pid),
+            "cost": cell.cost_yuan,
+            "runs": cell.runs,
+        }
     for v in by_pipeline.values():
         v["cost"] = round(v["cost"], 2)
         v["avg_cost_per_run"] = round(v["cost"] / max(v["runs"], 1), 2)
@@ -257,13 +453,12 @@ def cost_summary():
 
 @app.get("/api/cost/trend")
 def cost_trend():
-    now = datetime.now()
+    HISTORY.sync()
+    days = recent_days(30)
+    by_day = HISTORY.execution_totals(("day",), days)
     trend = []
-    for day_offset in range(30, 0, -1):
-        day_str = (now - timedelta(days=day_offset)).strftime("%Y-%m-%d")
-        day_cost = sum(
-            e["cost_yuan"] for e in EXECUTIONS if e["start_time"][:10] == day_str
-        )
+    for day_str in days:
+        day_cost = by_day[(day_str,)].cost_yuan if (day_str,) in by_day else 0.0
         trend.append({"date": day_str, "cost": round(day_cost, 2)})
     return trend
 
@@ -271,6 +466,7 @@ def cost_trend():
 @app.get("/api/teams/stats")
 def team_stats():
     """按团队统计"""
+    HISTORY.sync()
     teams = {}
     for p in PIPELINES:
         owner = p["owner"]
@@ -291,14 +487,13 @@ def team_stats():
         if p["status"] == "active":
             teams[owner]["active_count"] += 1
 
-    for e in EXECUTIONS:
-        owner = e["owner"]
+    for (owner, status), cell in HISTORY.execution_totals(("owner", "status")).items():
         if owner in teams:
-            teams[owner]["total_cost"] += e["cost_yuan"]
-            teams[owner]["total_runs"] += 1
-            teams[owner]["total_rows"] += e["rows_processed"]
-            if e["status"] == "success":
-                teams[owner]["success_runs"] += 1
+            teams[owner]["total_cost"] += cell.cost_yuan
+            teams[owner]["total_runs"] += cell.runs
+            teams[owner]["total_rows"] += cell.rows_processed
+            if status == "success":
+                teams[owner]["success_runs"] += cell.runs
 
     result = []
     for t in teams.values():
@@ -306,14 +501,10 @@ def team_stats():
         t["success_rate"] = round(
             (t["success_runs"] / max(t["total_runs"], 1)) * 100, 1
         )
-        team_pipelines = [p["id"] for p in PIPELINES if p["owner"] == t["team_id"]]
-        team_checks = [
-            qc for qc in QUALITY_CHECKS if qc["pipeline_id"] in team_pipelines
-        ][:100]
+        team_pipelines = {p["id"] for p in PIPELINES if p["owner"] == t["team_id"]}
+        team_checks = HISTORY.check_total(pipeline_ids=team_pipelines, latest=100)
         t["quality_score"] = round(
-            (sum(1 for qc in team_checks if qc["passed"]) / max(len(team_checks), 1))
-            * 100,
-            1,
+            team_checks.passed / max(team_checks.checks, 1) * 100, 1
         )
         result.append(t)
 
@@ -323,72 +514,164 @@ def team_stats():
 
 @app.get("/api/lineage")
 def data_lineage():
-    """数据血缘关系 — 从 pipeline 配置中提取"""
-    nodes = set()
-    edges = []
-    for p in PIPELINES:
-        target = p["target_table"]
-        nodes.add(target)
-        for src in p.get("source_tables", []):
-            nodes.add(src)
-            edges.append(
-                {
-                    "source": src,
-                    "target": target,
-                    "pipeline": p["name"],
-                    "pipeline_id": p["id"],
-                    "status": p["status"],
-                }
-            )
-        for dep_id in p.get("dependencies", []):
-            dep_pipe = next((pp for pp in PIPELINES if pp["id"] == dep_id), None)
-            if dep_pipe:
-                edges.append(
-                    {
-                        "source": dep_pipe["target_table"],
-                        "target": target,
-                        "pipeline": p["name"],
-                        "pipeline_id": p["id"],
-                        "status": p["status"],
-                        "is_dependency": True,
-                    }
-                )
+    """数据血缘关系 — 从 pipeline 配置中提取（配置加载时构建）"""
+    return LINEAGE.to_dict()
+
+
+def _avg_durations(last_runs: int = 30) -> dict[str, float]:
+    """各 pipeline 最近 last_runs 次执行的平均耗时（分钟）"""
+    HISTORY.sync()
+    totals = HISTORY.execution_totals(("pipeline_id",), latest_per_pipeline=last_runs)
+    return {pid: cell.duration_minutes / cell.runs for (pid,), cell in totals.items()}
+
+
+@app.get("/api/lineage/critical-path")
+def lineage_critical_path(target: str = ""):
+    """按最近 30 次平均耗时加权的最长链路；指定 target 时为决定该表就绪时间的链路"""
+    graph = LINEAGE
+    if target and target not in graph:
+        return {"error": "not found"}
+    return graph.critical_path(_avg_durations(), target or None)
+
+
+@app.get("/api/lineage/{table}/upstream")
+def lineage_upstream(table: str, depth: int | None = None):
+    """上游传递闭包，depth 为最大跳数（不传为不限）"""
+    graph = LINEAGE
+    if table not in graph:
+        return {"error": "not found"}
+    return graph.closure(table, downstream=False, depth=depth)
+
+
+@app.get("/api/lineage/{table}/downstream")
+def lineage_downstream(table: str, depth: int | None = None):
+    """下游传递闭包 — 该表延迟或出错时受影响的表与 pipeline"""
+    graph = LINEAGE
+    if table not in graph:
+        return {"error": "not found"}
+    return graph.closure(table, downstream=True, depth=depth)
+
+
+@app.get("/api/lineage/{table}/subgraph")
+def lineage_subgraph(table: str, upstream: int | None = 1, downstream: int | None = 1):
+    """以 table 为中心、上下游各限定深度的子图"""
+    graph = LINEAGE
+    if table not in graph:
+        return {"error": "not found"}
+    return graph.subgraph(table, upstream, downstream)
+
+
+@app.post("/api/dedup/run")
+def run_dedup(corpus: str, text_field: str = "text", id_field: str = "id"):
+    """对 CORPUS_DIR 下的 JSONL 语料做近似去重（与历史索引增量比对），
+    运行统计作为 dedup_pipeline 的执行记录写入执行历史"""
+    if not (CORPUS_DIR / Path(corpus).name).is_file():
+        return {"error": "not found"}
+    pipeline = PIPELINE_BY_ID.get("dedup_pipeline", DEDUP_PIPELINE)
+    start = datetime.now()
+    stats: dict = {}
+    error = None
+    try:
+        stats = _dedup_corpus(corpus, text_field, id_field)
+        status = "success"
+    except (OSError, ValueError) as e:
+        status, error = "failed", str(e)
+    end = datetime.now()
+    exec_id = hashlib.md5(f"{pipeline['id']}-{start.isoformat()}".encode()).hexdigest()
+    record = {
+        "id": exec_id[:12],
+        "pipeline_id": pipeline["id"],
+        "pipeline_name": pipeline["name"],
+        "start_time": start.isoformat(),
+        "end_time": end.isoformat(),
+        "duration_minutes": round((end - start).total_seconds() / 60),
+        "status": status,
+        "rows_processed": stats.get("docs", 0),
+        "cost_yuan": 0.0,
+        "owner": pipeline["owner"],
+    }
+    if error:
+        record["error"] = error
+    _record_execution(record)
+    return {"execution": record, **stats}
+
+
+def _apply_config_changes() -> dict:
+    """重新检查配置文件，只重建内容变化的部分；调用方持有 _config_lock
+
+    执行历史是持久化的真实记录，不依赖配置，重载时无需重建。
+    出错时让出错的文件下次重新解析，已生效的部分保留。
+    """
+    global PIPELINES, PIPELINE_BY_ID, LINEAGE, QUALITY_RULES
+    changed = CONFIG.refresh()
+    changes: dict[str, dict] = {}
+    try:
+        if "pipelines.yaml" in changed:
+            pipelines = changed["pipelines.yaml"]["pipelines"]
+            diff = diff_by_id(PIPELINES, pipelines)
+            if diff:
+                # 先交给调度器校验（依赖环、cron 表达式），通过后再替换
+                SCHEDULER.load(pipelines)
+                LINEAGE = LineageGraph(pipelines)
+            PIPELINES = pipelines
+            PIPELINE_BY_ID = _index_pipelines(pipelines)
+            changes["pipelines"] = diff.as_dict()
+        if "quality.yaml" in changed:
+            rules = changed["quality.yaml"]["rules"]
+            changes["quality_rules"] = diff_by_id(QUALITY_RULES, rules).as_dict()
+            QUALITY_RULES = rules
+        annotation_cfg = changed.get("annotation.yaml")
+        if annotation_cfg is not None:
+            changes["annotation_tasks"] = diff_by_id(
+                rlhf_annotation.ANNOTATION_TASKS, annotation_cfg["annotation_tasks"]
+            ).as_dict()
+        ann_result = reload_annotation_config(annotation_cfg)
+    except Exception:
+        CONFIG.invalidate(changed)
+        raise
     return {
-        "nodes": [
-            {
-                "id": n,
-                "type": "ods"
-                if n.startswith("ods_")
-                else "dw"
-                if n.startswith("dw_")
-                else "dm",
-            }
-            for n in sorted(nodes)
-        ],
-        "edges": edges,
+        "changed_files": sorted(changed),
+        "changes": changes,
+        "pipelines": len(PIPELINES),
+        "quality_rules": len(QUALITY_RULES),
+        "permissions": len(CONFIG.get("permission.yaml").get("roles", [])),
+        **ann_result,
     }
 
 
+def sync_config() -> dict | None:
+    """共享 generation 变化（其他 worker 执行了重载）时跟随重载，否则返回 None"""
+    global _config_generation_seen
+    with _config_lock:
+        generation = CONFIG_GENERATION.current()
+        if generation == _config_generation_seen:
+            return None
+        # 先记下：配置有误时不在每次轮询重复报错，修正后再次调用重载即可
+        _config_generation_seen = generation
+        return _apply_config_changes()
+
+
+async def _watch_config_generation():
+    while True:
+        await asyncio.sleep(CONFIG_WATCH_INTERVAL)
+        try:
+            await asyncio.to_thread(sync_config)
+        except Exception as e:
+            print(f"[WARN] config reload failed: {e}")
+
+
 @app.get("/api/config/reload")
 def reload_config():
-    """热重载 YAML 配置"""
-    global PIPELINES, QUALITY_RULES, _pipelines_cfg, _quality_cfg, _permission_cfg
-    _pipelines_cfg = _load_yaml("pipelines.yaml")
-    _quality_cfg = _load_yaml("quality.yaml")
-    _permission_cfg = _load_yaml("permission.yaml")
-    _annotation_cfg = _load_yaml("annotation.yaml")
-    PIPELINES = _pipelines_cfg["pipelines"]
-    QUALITY_RULES = _quality_cfg["rules"]
-
-    ann_result = reload_annotation_config(_annotation_cfg)
-
-    result = {
-        "status": "ok",
-        "pipelines": len(PIPELINES),
-        "quality_rules": len(QUALITY_RULES),
-        "permissions": len(_permission_cfg.get("roles", [])),
-        **ann_result,
-    }
+    """热重载 YAML 配置：只解析内容变化的文件、只重建受影响的部分，并通知其他 worker"""
+    global _config_generation_seen
+    with _config_lock:
+        expected = CONFIG_GENERATION.current() + 1
+        result = _apply_config_changes()
+        generation = CONFIG_GENERATION.bump()
+        # 期间其他 worker 也发布过重载时不标记为已同步，由轮询再检查一次
+        _config_generation_seen = generation if generation == expected else -1
+
+    result = {"status": "ok", "generation": generation, **result}
     log_audit(
         action="config_reload",
         resource_type="config",
@@ -4,12 +4,36 @@ RLHF / 后训练数据标注模块 — API 路由 + SQLite 存储
 """
 
 import json
+import os
 import sqlite3
+import tempfile
+import threading
+import zlib
 from datetime import datetime, timedelta
 from pathlib import Path
-
-from fastapi import APIRouter, Request
-
+from types import MappingProxyType
+from typing import Iterable, Iterator, Mapping, NamedTuple
+
+from fastapi import APIRouter, File, Request, UploadFile
+from fastapi.responses import StreamingResponse
+
+from core.pagination import (
+    DEFAULT_PAGE_SIZE,
+    clamp_page_size,
+    decode_cursor,
+    encode_cursor,
+)
+from core.async_db import AsyncSQLite
+from core.contamination import (
+    ERROR_RATE,
+    NGRAM,
+    THRESHOLD,
+    ContaminationIndex,
+    eval_files,
+    record_texts,
+)
+from core.sample_store import DEFAULT_DIFFICULTY, SampleStore
+from core.sqlite_pool import SQLitePool
 from system_log import log_audit
 
 router = APIRouter(tags=["annotation"])
@@ -20,7 +44,28 @@ router = APIRouter(tags=["annotation"])
 ANNOTATION_TASKS: list[dict] = []
 ANNOTATORS: list[dict] = []
 QUALITY_CONFIG: dict = {}
-ANNOTATION_SAMPLES: dict[str, list[dict]] = {}
+
+
+class _ConfigIndex(NamedTuple):
+    """配置的只读查找索引
+
+    重载时构建新实例后整体替换（单次赋值），处理请求时先取一次 _INDEX 引用，
+    之后的查找都落在同一份快照上。样本不在配置中，由 _sample_store 按需读取。
+    """
+
+    tasks: Mapping[str, dict]  # task_id → task
+
+
+def _build_index(tasks: list[dict]) -> _ConfigIndex:
+    # ID 重复时与原先的线性查找一致，取第一个
+    task_map: dict[str, dict] = {}
+    for task in tasks:
+        task_map.setdefault(task["id"], task)
+    return _ConfigIndex(MappingProxyType(task_map))
+
+
+_INDEX = _build_index([])
+_SAMPLE_DIR: Path | None = None
 
 TASK_TYPE_LABELS = {
     "rlhf_ranking": "RLHF 偏好排序",
@@ -31,31 +76,68 @@ TASK_TYPE_LABELS = {
 }
 
 
-def init_annotation_config(annotation_cfg: dict):
-    """从 YAML 配置初始化模块级变量，由 main.py 启动时调用"""
-    global ANNOTATION_TASKS, ANNOTATORS, QUALITY_CONFIG, ANNOTATION_SAMPLES
-    ANNOTATION_TASKS = annotation_cfg["annotation_tasks"]
+def init_annotation_config(annotation_cfg: dict) -> dict:
+    """从 YAML 配置初始化模块级变量，由 main.py 启动时调用
+
+    样本目录中有变化的 JSONL 文件导入样本库，未变化的跳过；配置中仍内联
+    annotation_samples 的（旧格式）按任务整体替换导入。返回样本导入情况。
+    """
+    global ANNOTATION_TASKS, ANNOTATORS, QUALITY_CONFIG, _INDEX, _SAMPLE_DIR
+    tasks = annotation_cfg["annotation_tasks"]
+    index = _build_index(tasks)
+    ANNOTATION_TASKS = tasks
     ANNOTATORS = annotation_cfg["annotators"]
     QUALITY_CONFIG = annotation_cfg["quality_config"]
-    ANNOTATION_SAMPLES = {}
-    for task_id, samples in annotation_cfg.get("annotation_samples", {}).items():
-        ANNOTATION_SAMPLES[task_id] = samples
-
-
-def reload_annotation_config(annotation_cfg: dict) -> dict:
-    """热重载标注配置，返回统计信息"""
-    init_annotation_config(annotation_cfg)
+    _INDEX = index
+    sample_dir = annotation_cfg.get("sample_data_dir")
+    _SAMPLE_DIR = Path(__file__).parent / sample_dir if sample_dir else None
+    return _sync_samples(annotation_cfg.get("annotation_samples"))
+
+
+def _sync_samples(inline_samples: dict | None = None) -> dict:
+    ingested: list[dict] = []
+    skipped = 0
+    if _SAMPLE_DIR is not None:
+        synced = _sample_store.sync_dir(_SAMPLE_DIR)
+        ingested += synced["ingested"]
+        skipped += synced["skipped"]
+    for task_id, samples in (inline_samples or {}).items():
+        ingested.append(_sample_store.ingest(task_id, samples, replace=True))
+    for result in ingested:
+        if result["error_count"]:
+            print(
+                f"[WARN] annotation samples {result['task_id']}: "
+                f"{result['error_count']} invalid lines skipped"
+            )
+    if ingested:
+        _backfill_difficulty()
+    return {"ingested": [r["task_id"] for r in ingested], "skipped": skipped}
+
+
+def reload_annotation_config(annotation_cfg: dict | None = None) -> dict:
+    """热重载标注配置，返回统计信息
+
+    annotation_cfg 为 None 表示 annotation.yaml 未变化：保留现有任务索引，
+    只同步样本目录（样本文件可以独立于配置更新）。
+    """
+    if annotation_cfg is None:
+        result = _sync_samples()
+    else:
+        result = init_annotation_config(annotation_cfg)
     return {
         "annotation_tasks": len(ANNOTATION_TASKS),
-        "annotation_samples": sum(len(v) for v in ANNOTATION_SAMPLES.values()),
+        "annotation_samples": sum(_sample_store.counts(_get_ann_db()).values()),
+        "annotation_sample_files_ingested": len(result["ingested"]),
+        "annotation_sample_files_skipped": result["skipped"],
     }
 
 
 # ---------------------------------------------------------------------------
 # SQLite 持久化
 # ---------------------------------------------------------------------------
-_ANN_DB_DIR = Path(__file__).parent / "data"
-_ANN_DB_DIR.mkdir(exist_ok=True)
+# 运行时数据库目录，DATAOPS_DATA_DIR 可覆盖（测试指向临时目录）
+_ANN_DB_DIR = Path(os.getenv("DATAOPS_DATA_DIR", Path(__file__).parent / "data"))
+_ANN_DB_DIR.mkdir(parents=True, exist_ok=True)
 _ann_db_path = _ANN_DB_DIR / "rlhf_annotation.db"
 
 _TYPE_SPECIFIC_FIELDS = {
@@ -67,11 +149,15 @@ _TYPE_SPECIFIC_FIELDS = {
 }
 
 
+_ann_pool = SQLitePool(_ann_db_path)
+# async 路由的写操作交给单写线程组提交，不在事件循环上阻塞
+_ann_dal = AsyncSQLite(_ann_pool)
+_sample_store = SampleStore(_ann_pool)
+
+
 def _get_ann_db() -> sqlite3.Connection:
-    conn = sqlite3.connect(str(_ann_db_path))
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
-    return conn
+    """当前线程的复用连接（由连接池管理，调用方无需 close）"""
+    return _ann_pool.connection()
 
 
 def _init_ann_db():
@@ -91,57 +177,291 @@ def _init_ann_db():
             review_status TEXT DEFAULT 'pending',
             review_comment TEXT,
             review_time TEXT,
-            annotation_data TEXT NOT NULL
+            annotation_data TEXT NOT NULL,
+            difficulty TEXT
         );
-        CREATE INDEX IF NOT EXISTS idx_sub_task ON submissions(task_id);
+        -- 同一任务下每个样本只允许一条提交，查重由唯一索引保证
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_sub_task_sample
+            ON submissions(task_id, sample_id);
         CREATE INDEX IF NOT EXISTS idx_sub_status ON submissions(review_status);
-        CREATE INDEX IF NOT EXISTS idx_sub_annotator ON submissions(annotator);
+        -- 列表按 (submit_time, id) keyset 翻页，过滤列在前、排序键在后
+        CREATE INDEX IF NOT EXISTS idx_sub_task_time
+            ON submissions(task_id, submit_time, id);
+        CREATE INDEX IF NOT EXISTS idx_sub_task_status_time
+            ON submissions(task_id, review_status, submit_time, id);
+        CREATE INDEX IF NOT EXISTS idx_sub_annotator_time
+            ON submissions(annotator, submit_time, id);
+        DROP INDEX IF EXISTS idx_sub_task;
+        DROP INDEX IF EXISTS idx_sub_task_status;
+        DROP INDEX IF EXISTS idx_sub_annotator;
+
+        -- 每个任务已分配的最大提交序号
+        CREATE TABLE IF NOT EXISTS submission_seq (
+            task_id TEXT PRIMARY KEY,
+            last_no INTEGER NOT NULL
+        );
+
+        -- 进度计数器：scope 为 all / task / task_type / domain / annotator，
+        -- 随提交与审核在同一事务内增量维护
+        CREATE TABLE IF NOT EXISTS submission_counters (
+            scope TEXT NOT NULL,
+            key TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            pending INTEGER NOT NULL DEFAULT 0,
+            approved INTEGER NOT NULL DEFAULT 0,
+            rejected INTEGER NOT NULL DEFAULT 0,
+            duration_sum INTEGER NOT NULL DEFAULT 0,
+            tasks INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (scope, key)
+        );
+        -- 标注人参与过的任务，用于维护 tasks（去重任务数）
+        CREATE TABLE IF NOT EXISTS annotator_tasks (
+            annotator TEXT NOT NULL,
+            task_id TEXT NOT NULL,
+            PRIMARY KEY (annotator, task_id)
+        );
         """
     )
-    conn.close()
-
+    _sample_store.init_schema(conn)
+    # 旧库补 difficulty 列；取值由 init_annotation_config 按样本库回填
+    columns = {r["name"] for r in conn.execute("PRAGMA table_info(submissions)")}
+    if "difficulty" not in columns:
+        conn.execute("ALTER TABLE submissions ADD COLUMN difficulty TEXT")
+    # 旧库没有序号表时，从已有提交 ID 的数字后缀回填
+    conn.execute(
+        """INSERT OR IGNORE INTO submission_seq (task_id, last_no)
+           SELECT task_id, MAX(CAST(substr(id, length(task_id) + 6) AS INTEGER))
+           FROM submissions GROUP BY task_id"""
+    )
+    # 旧库没有计数器时从 submissions 全量构建一次
+    has_counters = conn.execute("SELECT 1 FROM submission_counters LIMIT 1").fetchone()
+    has_subs = conn.execute("SELECT 1 FROM submissions LIMIT 1").fetchone()
+    if has_subs and not has_counters:
+        rebuild_submission_counters()
 
-_init_ann_db()
 
+def _allocate_sub_ids(conn: sqlite3.Connection, task_id: str, n: int = 1) -> list[str]:
+    """在当前写事务内为任务分配 n 个连续的提交 ID
 
-def _get_next_sub_id(task_id: str) -> str:
-    conn = _get_ann_db()
-    row = conn.execute(
-        "SELECT COUNT(*) FROM submissions WHERE task_id=?", (task_id,)
-    ).fetchone()
-    conn.close()
-    return f"SUB-{task_id}-{row[0] + 1:04d}"
+    序号保存在 submission_seq 中，随插入一起提交或回滚；
+    调用方需持有写事务（BEGIN IMMEDIATE），保证并发提交不会拿到相同序号。
+    """
+    if n <= 0:
+        return []
+    conn.execute(
+        """INSERT INTO submission_seq (task_id, last_no) VALUES (?, ?)
+           ON CONFLICT(task_id) DO UPDATE SET last_no = last_no + excluded.last_no""",
+        (task_id, n),
+    )
+    last = conn.execute(
+        "SELECT last_no FROM submission_seq WHERE task_id=?", (task_id,)
+    ).fetchone()[0]
+    return [f"SUB-{task_id}-{no:04d}" for no in range(last - n + 1, last + 1)]
 
 
-def _insert_submission(sub: dict):
+def _submission_row(sub: dict) -> tuple:
     task_type = sub["task_type"]
     type_fields = _TYPE_SPECIFIC_FIELDS.get(task_type, [])
     annotation_data = {k: sub[k] for k in type_fields if k in sub}
-    conn = _get_ann_db()
-    conn.execute(
+    return (
+        sub["id"],
+        sub["task_id"],
+        sub["task_type"],
+        sub["sample_id"],
+        sub["prompt"],
+        sub.get("domain", "unknown"),
+        sub.get("annotator", "anonymous"),
+        sub["submit_time"],
+        sub.get("duration_seconds", 0),
+        sub.get("review_status", "pending"),
+        sub.get("review_comment"),
+        sub.get("review_time"),
+        json.dumps(annotation_data, ensure_ascii=False),
+        sub.get("difficulty"),
+    )
+
+
+def _insert_submissions(conn: sqlite3.Connection, subs: list[dict]):
+    conn.executemany(
         """INSERT INTO submissions
            (id, task_id, task_type, sample_id, prompt, domain, annotator,
             submit_time, duration_seconds, review_status, review_comment,
-            review_time, annotation_data)
-           VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)""",
-        (
-            sub["id"],
-            sub["task_id"],
-            sub["task_type"],
-            sub["sample_id"],
-            sub["prompt"],
-            sub.get("domain", "unknown"),
-            sub.get("annotator", "anonymous"),
-            sub["submit_time"],
-            sub.get("duration_seconds", 0),
-            sub.get("review_status", "pending"),
-            sub.get("review_comment"),
-            sub.get("review_time"),
-            json.dumps(annotation_data, ensure_ascii=False),
-        ),
+            review_time, annotation_data, difficulty)
+           VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+        [_submission_row(sub) for sub in subs],
     )
-    conn.commit()
-    conn.close()
+    _count_new_submissions(conn, subs)
+
+
+# ---------------------------------------------------------------------------
+# 进度计数器
+# ---------------------------------------------------------------------------
+_COUNTER_FIELDS = ("total", "pending", "approved", "rejected", "duration_sum", "tasks")
+_REVIEW_STATUSES = ("pending", "approved", "rejected")
+
+_UPSERT_COUNTER_SQL = """
+    INSERT INTO submission_counters
+        (scope, key, total, pending, approved, rejected, duration_sum, tasks)
+    VALUES (?,?,?,?,?,?,?,?)
+    ON CONFLICT(scope, key) DO UPDATE SET
+        total = total + excluded.total,
+        pending = pending + excluded.pending,
+        approved = approved + excluded.approved,
+        rejected = rejected + excluded.rejected,
+        duration_sum = duration_sum + excluded.duration_sum,
+        tasks = tasks + excluded.tasks
+"""
+
+
+def _counter_keys(sub) -> list[tuple[str, str]]:
+    return [
+        ("all", ""),
+        ("task", sub["task_id"]),
+        ("task_type", sub["task_type"]),
+        ("domain", sub["domain"]),
+        ("annotator", sub["annotator"]),
+    ]
+
+
+def _apply_counter_deltas(
+    conn: sqlite3.Connection, deltas: dict[tuple[str, str], list[int]]
+) -> None:
+    conn.executemany(
+        _UPSERT_COUNTER_SQL, [(*key, *delta) for key, delta in deltas.items()]
+    )
+
+
+def _count_new_submissions(conn: sqlite3.Connection, subs: list[dict]) -> None:
+    """新提交计入计数器；一批提交先在内存中合并，每个计数行只写一次"""
+    deltas: dict[tuple[str, str], list[int]] = {}
+    for sub in subs:
+        sub = {
+            **sub,
+            "annotator": sub.get("annotator", "anonymous"),
+            "domain": sub.get("domain", "unknown"),
+        }
+        status = sub.get("review_status", "pending")
+        for key in _counter_keys(sub):
+            delta = deltas.setdefault(key, [0] * len(_COUNTER_FIELDS))
+            delta[0] += 1
+            if status in _REVIEW_STATUSES:
+                delta[1 + _REVIEW_STATUSES.index(status)] += 1
+            delta[4] += sub.get("duration_seconds", 0) or 0
+        new_task = conn.execute(
+            "INSERT OR IGNORE INTO annotator_tasks (annotator, task_id) VALUES (?, ?)",
+            (sub["annotator"], sub["task_id"]),
+        ).rowcount
+        deltas[("annotator", sub["annotator"])][5] += new_task
+    _apply_counter_deltas(conn, deltas)
+
+
+def _count_review(conn: sqlite3.Connection, sub, old_status: str, new_status: str):
+    """审核状态变化：旧状态 -1，新状态 +1"""
+    delta = [0] * len(_COUNTER_FIELDS)
+    if old_status in _REVIEW_STATUSES:
+        delta[1 + _REVIEW_STATUSES.index(old_status)] -= 1
+    if new_status in _REVIEW_STATUSES:
+        delta[1 + _REVIEW_STATUSES.index(new_status)] += 1
+    _apply_counter_deltas(conn, {key: delta for key in _counter_keys(sub)})
+
+
+def _read_counters(scope: str, key: str | None = None) -> dict[str, dict]:
+    """读取某个 scope 下的计数器，返回 {key: {total, pending, ...}}"""
+    sql = "SELECT * FROM submission_counters WHERE scope=?"
+    params: list = [scope]
+    if key is not None:
+        sql += " AND key=?"
+        params.append(key)
+    rows = _get_ann_db().execute(sql, params).fetchall()
+    return {r["key"]: dict(r) for r in rows}
+
+
+def _empty_counter() -> dict:
+    return dict.fromkeys(_COUNTER_FIELDS, 0)
+
+
+def _expected_counters(conn: sqlite3.Connection) -> dict[tuple[str, str], tuple]:
+    """从 submissions 全量聚合出的计数器期望值"""
+    expected: dict[tuple[str, str], tuple] = {}
+    columns = {
+        "all": "''",
+        "task": "task_id",
+        "task_type": "task_type",
+        "domain": "domain",
+        "annotator": "annotator",
+    }
+    for scope, column in columns.items():
+        rows = conn.execute(
+            f"""SELECT {column} AS key, COUNT(*),
+                       SUM(review_status='pending'), SUM(review_status='approved'),
+                       SUM(review_status='rejected'),
+                       COALESCE(SUM(duration_seconds), 0),
+                       COUNT(DISTINCT task_id)
+                FROM submissions GROUP BY {column}"""
+        ).fetchall()
+        for r in rows:
+            tasks = r[6] if scope == "annotator" else 0
+            expected[(scope, r[0])] = (*r[1:6], tasks)
+    return expected
+
+
+def verify_submission_counters() -> list[dict]:
+    """对比计数器与 submissions 全量聚合，返回不一致的条目"""
+    with _ann_pool.transaction() as conn:
+        expected = _expected_counters(conn)
+        actual = {
+            (r["scope"], r["key"]): tuple(r[f] for f in _COUNTER_FIELDS)
+            for r in conn.execute("SELECT * FROM submission_counters")
+        }
+    drift = []
+    for key in sorted(expected.keys() | actual.keys()):
+        want = expected.get(key, (0,) * len(_COUNTER_FIELDS))
+        have = actual.get(key, (0,) * len(_COUNTER_FIELDS))
+        if want != have:
+            drift.append(
+                {
+                    "scope": key[0],
+                    "key": key[1],
+                    "expected": dict(zip(_COUNTER_FIELDS, want)),
+                    "actual": dict(zip(_COUNTER_FIELDS, have)),
+                }
+            )
+    return drift
+
+
+def rebuild_submission_counters() -> int:
+    """按 submissions 重建计数器与 annotator_tasks，返回计数行数"""
+    with _ann_pool.transaction(immediate=True) as conn:
+        expected = _expected_counters(conn)
+        conn.execute("DELETE FROM submission_counters")
+        conn.execute("DELETE FROM annotator_tasks")
+        conn.execute(
+            """INSERT INTO annotator_tasks (annotator, task_id)
+               SELECT DISTINCT annotator, task_id FROM submissions"""
+        )
+        conn.executemany(
+            _UPSERT_COUNTER_SQL, [(*key, *values) for key, values in expected.items()]
+        )
+    return len(expected)
+
+
+def _backfill_difficulty() -> int:
+    """为 difficulty 为空的提交（加列前的旧数据）按样本库回填，返回更新行数
+
+    找不到样本的提交保持为空，统计时按默认难度计。
+    """
+    with _ann_pool.transaction(immediate=True) as conn:
+        cur = conn.execute(
+            f"""UPDATE submissions SET difficulty = (
+                    SELECT s.difficulty FROM {_sample_store.table} s
+                    WHERE s.task_id = submissions.task_id
+                      AND s.sample_id = submissions.sample_id)
+                WHERE difficulty IS NULL"""
+        )
+        return cur.rowcount
+
+
+_init_ann_db()
 
 
 def _row_to_dict(row: sqlite3.Row) -> dict:
@@ -157,9 +477,19 @@ def _load_submissions(
     review_status: str | None = None,
     annotator: str | None = None,
     sample_id: str | None = None,
+    sample_ids: Iterable[str] | None = None,
+    domain: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    after: tuple[str, str] | None = None,
     limit: int = 0,
+    oldest_first: bool = False,
 ) -> list[dict]:
-    """按条件查询 submissions，返回 flat dict 列表"""
+    """按条件查询 submissions，按 (submit_time, id) 排序，返回 flat dict 列表
+
+    since / until 为 submit_time 的 [since, until) 区间；after 为上一页
+    最后一条的 (submit_time, id)，用于 keyset 翻页。
+    """
     clauses: list[str] = []
     params: list = []
     if task_id:
@@ -174,42 +504,193 @@ def _load_submissions(
     if sample_id:
         clauses.append("sample_id=?")
         params.append(sample_id)
+    if sample_ids is not None:
+        clauses.append("sample_id IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps(list(sample_ids)))
+    if domain:
+        clauses.append("domain=?")
+        params.append(domain)
+    if since:
+        clauses.append("submit_time >= ?")
+        params.append(since)
+    if until:
+        clauses.append("submit_time < ?")
+        params.append(until)
+    if after:
+        clauses.append(f"(submit_time, id) {'>' if oldest_first else '<'} (?, ?)")
+        params.extend(after)
     where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
-    sql = f"SELECT * FROM submissions{where} ORDER BY submit_time DESC"
+    order = "ASC" if oldest_first else "DESC"
+    sql = f"SELECT * FROM submissions{where} ORDER BY submit_time {order}, id {order}"
     if limit > 0:
-        sql += f" LIMIT {limit}"
-    conn = _get_ann_db()
-    rows = conn.execute(sql, params).fetchall()
-    conn.close()
+        sql += " LIMIT ?"
+        params.append(limit)
+    rows = _get_ann_db().execute(sql, params).fetchall()
     return [_row_to_dict(r) for r in rows]
 
 
+def _count_submissions(**filters) -> int:
+    """与 _load_submissions 相同过滤条件下的提交总数"""
+    columns = {
+        "task_id": "task_id=?",
+        "review_status": "review_status=?",
+        "annotator": "annotator=?",
+        "domain": "domain=?",
+        "since": "submit_time >= ?",
+        "until": "submit_time < ?",
+    }
+    clauses = [columns[k] for k, v in filters.items() if v]
+    params = [v for v in filters.values() if v]
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    return (
+        _get_ann_db()
+        .execute(f"SELECT COUNT(*) FROM submissions{where}", params)
+        .fetchone()[0]
+    )
+
+
 def _validate_annotation_config():
-    """启动时校验样本完整性"""
-    errors = []
-    for task in ANNOTATION_TASKS:
-        tid = task["id"]
-        samples = ANNOTATION_SAMPLES.get(tid, [])
-        if not samples:
-            errors.append(f"任务 {tid} 没有配置样本数据")
-            continue
-        for s in samples:
-            if not s.get("id") or not s.get("prompt") or not s.get("responses"):
-                errors.append(f"任务 {tid} 样本 {s.get('id', '?')} 缺少必要字段")
+    """启动时校验每个任务都有样本（样本字段在导入样本库时校验）"""
+    counts = _sample_store.counts(_get_ann_db())
+    errors = [
+        f"任务 {task['id']} 没有配置样本数据"
+        for task in ANNOTATION_TASKS
+        if not counts.get(task["id"])
+    ]
     if errors:
         print(f"[WARN] annotation config validation: {len(errors)} issues")
         for e in errors:
             print(f"  - {e}")
 
 
-def _get_sample_by_id(task_id: str, sample_id: str) -> dict | None:
-    """根据 task_id 和 sample_id 查找样本"""
-    for s in ANNOTATION_SAMPLES.get(task_id, []):
-        if s["id"] == sample_id:
-            return s
+def _get_task(task_id: str) -> dict | None:
+    return _INDEX.tasks.get(task_id)
+
+
+def _build_submission(task: dict, sample: dict, body: dict) -> dict:
+    """按任务类型从提交内容构造 submission（不含 id）"""
+    task_type = task["task_type"]
+    sub = {
+        "task_id": task["id"],
+        "task_type": task_type,
+        "sample_id": sample["id"],
+        "prompt": sample["prompt"],
+        "domain": sample.get("domain", "unknown"),
+        "difficulty": sample.get("difficulty", DEFAULT_DIFFICULTY),
+        "annotator": body.get("annotator", "anonymous"),
+        "submit_time": datetime.now().isoformat(),
+        "duration_seconds": body.get("duration_seconds", 0),
+        "review_status": "pending",
+    }
+
+    if task_type == "rlhf_ranking":
+        sub["ranking"] = body.get("ranking", [])
+        sub["rationale"] = body.get("rationale", "")
+    elif task_type == "dpo_pairwise":
+        sub["chosen_index"] = body.get("chosen_index")
+        sub["rejected_index"] = 1 - body.get("chosen_index", 0)
+        sub["rationale"] = body.get("rationale", "")
+    elif task_type == "kto_binary":
+        sub["feedback"] = body.get("feedback")
+        sub["safety_category"] = body.get("safety_category", "none")
+        sub["severity_score"] = body.get("severity_score", 0)
+        sub["rationale"] = body.get("rationale", "")
+    elif task_type == "sft_editing":
+        sub["original_response"] = (sample.get("responses", [{}])[0]).get("text", "")
+        sub["edited_response"] = body.get("edited_response", "")
+        original_len = max(len(sub["original_response"]), 1)
+        edited_len = len(sub["edited_response"])
+        sub["edit_ratio"] = round(abs(edited_len - original_len) / original_len, 2)
+    elif task_type == "reward_scoring":
+        sub["scores"] = body.get("scores", {})
+        score_values = list(sub["scores"].values())
+        sub["overall_score"] = (
+            round(sum(score_values) / max(len(score_values), 1), 1)
+            if score_values
+            else 0
+        )
+    return sub
+
+
+# 各任务类型必须由标注方给出的字段，其余类型字段可由服务端推导
+_REQUIRED_INPUT_FIELDS = {
+    "rlhf_ranking": {"ranking": list},
+    "dpo_pairwise": {"chosen_index": int},
+    "kto_binary": {"feedback": str},
+    "sft_editing": {"edited_response": str},
+    "reward_scoring": {"scores": dict},
+}
+_COMMON_INPUT_FIELDS = {"sample_id", "annotator", "duration_seconds"}
+
+MAX_BATCH_ITEMS = 100_000
+
+
+def _validate_submission_item(task_type: str, item) -> str | None:
+    """校验批量提交中的单条记录，返回错误信息或 None"""
+    if not isinstance(item, dict):
+        return "条目必须为 JSON 对象"
+    if not item.get("sample_id"):
+        return "缺少 sample_id"
+    if not isinstance(item["sample_id"], str):
+        return "字段 sample_id 类型应为 str"
+    if not isinstance(item.get("annotator", ""), str):
+        return "字段 annotator 类型应为 str"
+    duration = item.get("duration_seconds", 0)
+    if not isinstance(duration, (int, float)) or isinstance(duration, bool):
+        return "字段 duration_seconds 类型应为数字"
+    for field, expected in _REQUIRED_INPUT_FIELDS.get(task_type, {}).items():
+        if field not in item:
+            return f"缺少字段 {field}"
+        if not isinstance(item[field], expected) or isinstance(item[field], bool):
+            return f"字段 {field} 类型应为 {expected.__name__}"
+    if task_type == "dpo_pairwise" and item["chosen_index"] not in (0, 1):
+        return "chosen_index 必须为 0 或 1"
+    if task_type == "reward_scoring" and not all(
+        isinstance(v, (int, float)) and not isinstance(v, bool)
+        for v in item["scores"].values()
+    ):
+        return "scores 的取值必须为数字"
+    allowed = _COMMON_INPUT_FIELDS | set(_TYPE_SPECIFIC_FIELDS.get(task_type, []))
+    unknown = sorted(set(item) - allowed)
+    if unknown:
+        return f"{task_type} 不支持的字段: {', '.join(unknown)}"
     return None
 
 
+async def _read_batch_items(request: Request) -> tuple[str, list[tuple]]:
+    """读取批量提交内容，返回 (格式, [(条目, 解析错误)])
+
+    Content-Type 含 ndjson / jsonl 时按行流式解析，否则按 JSON 数组
+    （或 {"items": [...]}）解析。
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        items: list[tuple] = []
+        buf = b""
+
+        def parse(line: bytes):
+            if line.strip():
+                try:
+                    items.append((json.loads(line), None))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    items.append((None, "无效的 JSON 行"))
+
+        async for chunk in request.stream():
+            buf += chunk
+            *lines, buf = buf.split(b"\n")
+            for line in lines:
+                parse(line)
+        parse(buf)
+        return "jsonl", items
+
+    body = await request.json()
+    if isinstance(body, dict):
+        body = body.get("items", [])
+    if not isinstance(body, list):
+        body = []
+    return "json", [(item, None) for item in body]
+
+
 # ---------------------------------------------------------------------------
 # API 路由
 # ---------------------------------------------------------------------------
@@ -217,25 +698,18 @@ def _get_sample_by_id(task_id: str, sample_id: str) -> dict | None:
 
 @router.get("/api/annotation/tasks")
 def list_annotation_tasks():
-    conn = _get_ann_db()
+    counters = _read_counters("task")
+    sample_counts = _sample_store.counts(_get_ann_db())
     result = []
     for t in ANNOTATION_TASKS:
         tid = t["id"]
-        row = conn.execute(
-            """SELECT COUNT(*) as total,
-                      SUM(CASE WHEN review_status='approved' THEN 1 ELSE 0 END) as approved,
-                      SUM(CASE WHEN review_status='rejected' THEN 1 ELSE 0 END) as rejected,
-                      SUM(CASE WHEN review_status='pending' THEN 1 ELSE 0 END) as pending,
-                      COALESCE(AVG(duration_seconds), 0) as avg_dur
-               FROM submissions WHERE task_id=?""",
-            (tid,),
-        ).fetchone()
-        completed = row["total"]
-        approved = row["approved"]
-        rejected = row["rejected"]
-        pending_count = row["pending"]
-        avg_duration = row["avg_dur"]
-        sample_count = len(ANNOTATION_SAMPLES.get(tid, []))
+        c = counters.get(tid, _empty_counter())
+        completed = c["total"]
+        approved = c["approved"]
+        rejected = c["rejected"]
+        pending_count = c["pending"]
+        avg_duration = c["duration_sum"] / max(completed, 1)
+        sample_count = sample_counts.get(tid, 0)
         result.append(
             {
                 **t,
@@ -256,36 +730,50 @@ def list_annotation_tasks():
                 ],
             }
         )
-    conn.close()
     return result
 
 
 @router.get("/api/annotation/tasks/{task_id}")
 def get_annotation_task(task_id: str):
-    for t in ANNOTATION_TASKS:
-        if t["id"] == task_id:
-            subs = _load_submissions(task_id=task_id, limit=50)
-            sample_count = len(ANNOTATION_SAMPLES.get(task_id, []))
-            return {
-                **t,
-                "submissions": subs,
-                "sample_count": sample_count,
-                "type_label": TASK_TYPE_LABELS.get(t["task_type"], t["task_type"]),
-            }
-    return {"error": "not found"}
+    t = _get_task(task_id)
+    if not t:
+        return {"error": "not found"}
+    subs = _load_submissions(task_id=task_id, limit=50)
+    sample_count = _sample_store.count(_get_ann_db(), task_id)
+    return {
+        **t,
+        "submissions": subs,
+        "sample_count": sample_count,
+        "type_label": TASK_TYPE_LABELS.get(t["task_type"], t["task_type"]),
+    }
 
 
 @router.get("/api/annotation/tasks/{task_id}/samples")
-def get_task_samples(task_id: str, limit: int = 50):
-    """获取任务的标注样本（含 prompt 和候选 responses）"""
-    task = next((t for t in ANNOTATION_TASKS if t["id"] == task_id), None)
+def get_task_samples(task_id: str, limit: int = 50, cursor: str | None = None):
+    """获取任务的标注样本（含 prompt 和候选 responses），按样本文件顺序分页
+
+    cursor 传入上一页返回的 next_cursor；next_cursor 为 None 表示已到末页。
+    """
+    task = _get_task(task_id)
     if not task:
         return {"error": "not found"}
-    task_samples = ANNOTATION_SAMPLES.get(task_id, [])
-    all_subs = _load_submissions(task_id=task_id)
-    sub_by_sample = {s["sample_id"]: s for s in all_subs}
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as exc:
+        return {"status": "error", "message": str(exc)}
+    limit = clamp_page_size(limit)
+    rows = _sample_store.page(_get_ann_db(), task_id, limit + 1, after=after)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][0], rows[-1][1]["id"])
+    task_samples = [sample for _, sample in rows]
+    page_subs = _load_submissions(
+        task_id=task_id, sample_ids=[sp["id"] for sp in task_samples]
+    )
+    sub_by_sample = {s["sample_id"]: s for s in page_subs}
     samples = []
-    for sp in task_samples[:limit]:
+    for sp in task_samples:
         existing_sub = sub_by_sample.get(sp["id"])
         samples.append(
             {
@@ -294,13 +782,60 @@ def get_task_samples(task_id: str, limit: int = 50):
                 "annotated": existing_sub is not None,
             }
         )
-    return {"samples": samples, "total": len(task_samples), "task_id": task_id}
+    return {
+        "samples": samples,
+        "total": _sample_store.count(_get_ann_db(), task_id),
+        "task_id": task_id,
+        "next_cursor": next_cursor,
+    }
+
+
+@router.post("/api/annotation/tasks/{task_id}/samples/import")
+def import_task_samples(
+    task_id: str, file: UploadFile = File(...), replace: bool = False
+):
+    """导入任务样本（JSONL，每行一个样本），逐行分块写入样本库
+
+    replace=true 时以上传内容整体替换任务的样本，否则追加（已存在的 ID 更新内容）。
+    """
+    if not _get_task(task_id):
+        return {"status": "error", "message": "任务不存在"}
+    lines = (line for line in file.file if line.strip())
+    result = _sample_store.ingest(task_id, lines, replace=replace)
+    _backfill_difficulty()
+
+    log_audit(
+        action="annotation_samples_import",
+        resource_type="annotation",
+        resource_id=task_id,
+        summary=(
+            f"导入样本 {result['ingested']} 条（无效 {result['error_count']} 条）, "
+            f"任务 {task_id}"
+        ),
+        details={
+            "filename": file.filename,
+            "replace": replace,
+            "ingested": result["ingested"],
+            "failed": result["error_count"],
+        },
+    )
+    return {"status": "ok", **result}
+
+
+def _submit_tx(
+    conn: sqlite3.Connection, task_id: str, sub: dict
+) -> tuple[str, int, int]:
+    """写线程内执行：分配 ID、写入提交，返回 (提交 ID, 任务已完成数, 任务样本数)"""
+    sub_id = sub["id"] = _allocate_sub_ids(conn, task_id)[0]
+    _insert_submissions(conn, [sub])
+    count = _read_counters("task", task_id)[task_id]["total"]
+    return sub_id, count, _sample_store.count(conn, task_id)
 
 
 @router.post("/api/annotation/tasks/{task_id}/submit")
 async def submit_annotation(task_id: str, request: Request):
     """提交标注"""
-    task = next((t for t in ANNOTATION_TASKS if t["id"] == task_id), None)
+    task = _get_task(task_id)
     if not task:
         return {"status": "error", "message": "任务不存在"}
     if task["status"] != "active":
@@ -308,70 +843,19 @@ async def submit_annotation(task_id: str, request: Request):
 
     body = await request.json()
     sample_id = body.get("sample_id")
-    sample = _get_sample_by_id(task_id, sample_id)
+    sample = await _ann_dal.read(_sample_store.get, task_id, sample_id)
     if not sample:
         return {"status": "error", "message": f"样本 {sample_id} 不存在"}
 
-    conn = _get_ann_db()
-    dup = conn.execute(
-        "SELECT id FROM submissions WHERE task_id=? AND sample_id=?",
-        (task_id, sample_id),
-    ).fetchone()
-    conn.close()
-    if dup:
-        return {"status": "error", "message": f"样本 {sample_id} 已被标注"}
-
-    sub_id = _get_next_sub_id(task_id)
     task_type = task["task_type"]
+    sub = _build_submission(task, sample, body)
 
-    sub = {
-        "id": sub_id,
-        "task_id": task_id,
-        "task_type": task_type,
-        "sample_id": sample_id,
-        "prompt": sample["prompt"],
-        "domain": sample.get("domain", "unknown"),
-        "annotator": body.get("annotator", "anonymous"),
-        "submit_time": datetime.now().isoformat(),
-        "duration_seconds": body.get("duration_seconds", 0),
-        "review_status": "pending",
-    }
-
-    if task_type == "rlhf_ranking":
-        sub["ranking"] = body.get("ranking", [])
-        sub["rationale"] = body.get("rationale", "")
-    elif task_type == "dpo_pairwise":
-        sub["chosen_index"] = body.get("chosen_index")
-        sub["rejected_index"] = 1 - body.get("chosen_index", 0)
-        sub["rationale"] = body.get("rationale", "")
-    elif task_type == "kto_binary":
-        sub["feedback"] = body.get("feedback")
-        sub["safety_category"] = body.get("safety_category", "none")
-        sub["severity_score"] = body.get("severity_score", 0)
-        sub["rationale"] = body.get("rationale", "")
-    elif task_type == "sft_editing":
-        sub["original_response"] = (sample.get("responses", [{}])[0]).get("text", "")
-        sub["edited_response"] = body.get("edited_response", "")
-        original_len = max(len(sub["original_response"]), 1)
-        edited_len = len(sub["edited_response"])
-        sub["edit_ratio"] = round(abs(edited_len - original_len) / original_len, 2)
-    elif task_type == "reward_scoring":
-        sub["scores"] = body.get("scores", {})
-        score_values = list(sub["scores"].values())
-        sub["overall_score"] = (
-            round(sum(score_values) / max(len(score_values), 1), 1)
-            if score_values
-            else 0
-        )
-
-    _insert_submission(sub)
-
-    conn = _get_ann_db()
-    count = conn.execute(
-        "SELECT COUNT(*) FROM submissions WHERE task_id=?", (task_id,)
-    ).fetchone()[0]
-    conn.close()
-    sample_count = len(ANNOTATION_SAMPLES.get(task_id, []))
+    # 分配 ID、写入与进度统计在写线程的同一事务内完成；重复提交由唯一索引拒绝，
+    # 异常时只回滚本次提交，已分配的序号一并撤销
+    try:
+        sub_id, count, sample_count = await _ann_dal.write(_submit_tx, task_id, sub)
+    except sqlite3.IntegrityError:
+        return {"status": "error", "message": f"样本 {sample_id} 已被标注"}
 
     log_audit(
         action="annotation_submit",
@@ -396,34 +880,133 @@ async def submit_annotation(task_id: str, request: Request):
     }
 
 
-@router.post("/api/annotation/tasks/{task_id}/review")
-async def review_annotation(task_id: str, request: Request):
-    """审核标注"""
-    body = await request.json()
-    submission_id = body.get("submission_id")
-    action = body.get("action")
-    comment = body.get("comment", "")
+def _submit_batch_tx(
+    conn: sqlite3.Connection, task_id: str, candidates: list[tuple[dict, dict]]
+) -> tuple[list[dict], int, int]:
+    """写线程内执行：剔除已标注样本后整批写入，逐条结果写回 result
 
-    if action not in ("approve", "reject"):
-        return {"status": "error", "message": "action 必须为 approve 或 reject"}
+    返回 (实际写入的提交, 任务已完成数, 任务样本数)。
+    """
+    existing = {
+        r[0]
+        for r in conn.execute(
+            """SELECT sample_id FROM submissions
+               WHERE task_id=? AND sample_id IN (SELECT value FROM json_each(?))""",
+            (task_id, json.dumps([sub["sample_id"] for _, sub in candidates])),
+        )
+    }
+    accepted = []
+    for result, sub in candidates:
+        if sub["sample_id"] in existing:
+            result.update(status="error", message=f"样本 {sub['sample_id']} 已被标注")
+            continue
+        accepted.append((result, sub))
+    sub_ids = _allocate_sub_ids(conn, task_id, len(accepted))
+    for (result, sub), sub_id in zip(accepted, sub_ids):
+        sub["id"] = sub_id
+        result.update(status="ok", submission_id=sub_id)
+    to_insert = [sub for _, sub in accepted]
+    _insert_submissions(conn, to_insert)
+    count = _read_counters("task", task_id).get(task_id, _empty_counter())["total"]
+    return to_insert, count, _sample_store.count(conn, task_id)
+
+
+@router.post("/api/annotation/tasks/{task_id}/submit/batch")
+async def submit_annotation_batch(task_id: str, request: Request):
+    """批量提交标注（JSON 数组或 JSONL），单事务写入，返回逐条结果"""
+    index = _INDEX  # 整批使用同一份配置快照
+    task = index.tasks.get(task_id)
+    if not task:
+        return {"status": "error", "message": "任务不存在"}
+    if task["status"] != "active":
+        return {"status": "error", "message": f"任务状态为 {task['status']}，无法提交"}
 
-    conn = _get_ann_db()
+    fmt, items = await _read_batch_items(request)
+    if len(items) > MAX_BATCH_ITEMS:
+        return {
+            "status": "error",
+            "message": f"单批最多 {MAX_BATCH_ITEMS} 条，当前 {len(items)} 条",
+        }
+
+    task_type = task["task_type"]
+    samples = await _ann_dal.read(
+        _sample_store.get_many,
+        task_id,
+        [
+            item["sample_id"]
+            for item, _ in items
+            if isinstance(item, dict) and isinstance(item.get("sample_id"), str)
+        ],
+    )
+    results: list[dict] = []
+    candidates: list[tuple[dict, dict]] = []  # (result, submission)
+    seen: set[str] = set()
+    for idx, (item, error) in enumerate(items):
+        sample_id = item.get("sample_id") if isinstance(item, dict) else None
+        result = {"index": idx, "sample_id": sample_id}
+        results.append(result)
+        error = error or _validate_submission_item(task_type, item)
+        if not error and sample_id not in samples:
+            error = f"样本 {sample_id} 不存在"
+        if not error and sample_id in seen:
+            error = f"样本 {sample_id} 在本批次中重复"
+        if error:
+            result.update(status="error", message=error)
+            continue
+        seen.add(sample_id)
+        candidates.append((result, _build_submission(task, samples[sample_id], item)))
+
+    to_insert, count, sample_count = await _ann_dal.write(
+        _submit_batch_tx, task_id, candidates
+    )
+    failed = len(results) - len(to_insert)
+
+    log_audit(
+        action="annotation_batch_submit",
+        resource_type="annotation",
+        resource_id=task_id,
+        summary=f"批量提交标注 {len(to_insert)} 条（失败 {failed} 条）, 任务 {task_id}",
+        details={
+            "task_type": task_type,
+            "format": fmt,
+            "received": len(results),
+            "submitted": len(to_insert),
+            "failed": failed,
+        },
+    )
+
+    return {
+        "status": "ok",
+        "submitted": len(to_insert),
+        "failed": failed,
+        "results": results,
+        "task_progress": {
+            "completed": count,
+            "total": sample_count,
+            "percent": round((count / max(sample_count, 1)) * 100, 1),
+        },
+    }
+
+
+def _review_tx(
+    conn: sqlite3.Connection,
+    task_id: str,
+    submission_id: str,
+    action: str,
+    comment: str,
+) -> tuple[str | None, str | None]:
+    """写线程内执行：校验并更新审核状态，返回 (错误信息, 新状态)"""
     row = conn.execute(
-        "SELECT id, task_id, review_status FROM submissions WHERE id=?",
+        """SELECT id, task_id, task_type, domain, annotator, review_status
+           FROM submissions WHERE id=?""",
         (submission_id,),
     ).fetchone()
     if not row:
-        conn.close()
-        return {"status": "error", "message": f"提交 {submission_id} 不存在"}
+        return f"提交 {submission_id} 不存在", None
     if row["task_id"] != task_id:
-        conn.close()
-        return {"status": "error", "message": "提交不属于该任务"}
+        return "提交不属于该任务", None
     if row["review_status"] != "pending":
-        conn.close()
-        return {
-            "status": "error",
-            "message": f"提交已被审核: {row['review_status']}",
-        }
+        return f"提交已被审核: {row['review_status']}", None
 
     new_status = "approved" if action == "approve" else "rejected"
     review_time = datetime.now().isoformat()
@@ -431,8 +1014,26 @@ async def review_annotation(task_id: str, request: Request):
         "UPDATE submissions SET review_status=?, review_comment=?, review_time=? WHERE id=?",
         (new_status, comment, review_time, submission_id),
     )
-    conn.commit()
-    conn.close()
+    _count_review(conn, row, row["review_status"], new_status)
+    return None, new_status
+
+
+@router.post("/api/annotation/tasks/{task_id}/review")
+async def review_annotation(task_id: str, request: Request):
+    """审核标注"""
+    body = await request.json()
+    submission_id = body.get("submission_id")
+    action = body.get("action")
+    comment = body.get("comment", "")
+
+    if action not in ("approve", "reject"):
+        return {"status": "error", "message": "action 必须为 approve 或 reject"}
+
+    error, new_status = await _ann_dal.write(
+        _review_tx, task_id, submission_id, action, comment
+    )
+    if error:
+        return {"status": "error", "message": error}
 
     log_audit(
         action="annotation_review",
@@ -450,48 +1051,69 @@ async def review_annotation(task_id: str, request: Request):
 
 
 @router.get("/api/annotation/tasks/{task_id}/submissions")
-def list_task_submissions(task_id: str, review_status: str = "all"):
-    """获取任务的提交列表"""
+def list_task_submissions(
+    task_id: str,
+    review_status: str = "all",
+    annotator: str | None = None,
+    domain: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+):
+    """获取任务的提交列表（按提交时间倒序分页）
+
+    cursor 传入上一页返回的 next_cursor；next_cursor 为 None 表示已到末页。
+    since / until 按 submit_time 过滤 [since, until)。
+    """
     status_filter = review_status if review_status != "all" else None
-    subs = _load_submissions(task_id=task_id, review_status=status_filter)
-    conn = _get_ann_db()
-    row = conn.execute(
-        """SELECT
-               SUM(CASE WHEN review_status='pending' THEN 1 ELSE 0 END) as pending,
-               SUM(CASE WHEN review_status='approved' THEN 1 ELSE 0 END) as approved,
-               SUM(CASE WHEN review_status='rejected' THEN 1 ELSE 0 END) as rejected
-           FROM submissions WHERE task_id=?""",
-        (task_id,),
-    ).fetchone()
-    conn.close()
-    by_status = {
-        "pending": row["pending"] or 0,
-        "approved": row["approved"] or 0,
-        "rejected": row["rejected"] or 0,
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as exc:
+        return {"status": "error", "message": str(exc)}
+    limit = clamp_page_size(limit)
+    filters = {
+        "task_id": task_id,
+        "review_status": status_filter,
+        "annotator": annotator,
+        "domain": domain,
+        "since": since,
+        "until": until,
+    }
+    subs = _load_submissions(**filters, after=after, limit=limit + 1)
+    next_cursor = None
+    if len(subs) > limit:
+        subs = subs[:limit]
+        next_cursor = encode_cursor(subs[-1]["submit_time"], subs[-1]["id"])
+
+    c = _read_counters("task", task_id).get(task_id, _empty_counter())
+    by_status = {status: c[status] for status in _REVIEW_STATUSES}
+    if annotator or domain or since or until:
+        total = _count_submissions(**filters)
+    elif status_filter:
+        total = by_status.get(status_filter, 0)
+    else:
+        total = sum(by_status.values())
+    return {
+        "submissions": subs,
+        "total": total,
+        "by_status": by_status,
+        "next_cursor": next_cursor,
     }
-    return {"submissions": subs, "total": len(subs), "by_status": by_status}
 
 
 @router.get("/api/annotation/annotators")
 def list_annotators():
-    conn = _get_ann_db()
+    counters = _read_counters("annotator")
     result = []
     for a in ANNOTATORS:
         aid = a["id"]
-        row = conn.execute(
-            """SELECT COUNT(*) as total,
-                      SUM(CASE WHEN review_status='approved' THEN 1 ELSE 0 END) as approved,
-                      SUM(CASE WHEN review_status='rejected' THEN 1 ELSE 0 END) as rejected,
-                      COALESCE(AVG(duration_seconds), 0) as avg_speed,
-                      COUNT(DISTINCT task_id) as tasks_involved
-               FROM submissions WHERE annotator=?""",
-            (aid,),
-        ).fetchone()
-        total = row["total"]
-        approved = row["approved"]
-        rejected = row["rejected"]
-        avg_speed = row["avg_speed"]
-        tasks_involved = row["tasks_involved"]
+        c = counters.get(aid, _empty_counter())
+        total = c["total"]
+        approved = c["approved"]
+        rejected = c["rejected"]
+        avg_speed = c["duration_sum"] / max(total, 1)
+        tasks_involved = c["tasks"]
         result.append(
             {
                 **a,
@@ -506,7 +1128,6 @@ def list_annotators():
                 "tasks_involved": tasks_involved,
             }
         )
-    conn.close()
     result.sort(key=lambda x: x["computed_accuracy"], reverse=True)
     return result
 
@@ -514,31 +1135,16 @@ def list_annotators():
 @router.get("/api/annotation/quality")
 def annotation_quality():
     """标注质量总览"""
-    conn = _get_ann_db()
-    totals = conn.execute(
-        """SELECT COUNT(*) as total,
-                  SUM(CASE WHEN review_status='approved' THEN 1 ELSE 0 END) as approved,
-                  SUM(CASE WHEN review_status='rejected' THEN 1 ELSE 0 END) as rejected,
-                  SUM(CASE WHEN review_status='pending' THEN 1 ELSE 0 END) as pending
-           FROM submissions"""
-    ).fetchone()
+    totals = _read_counters("all", "").get("", _empty_counter())
     total_subs = totals["total"]
     approved = totals["approved"]
     rejected = totals["rejected"]
     pending_count = totals["pending"]
 
-    type_rows = conn.execute(
-        """SELECT task_type,
-                  COUNT(*) as total,
-                  SUM(CASE WHEN review_status='approved' THEN 1 ELSE 0 END) as approved,
-                  SUM(CASE WHEN review_status='rejected' THEN 1 ELSE 0 END) as rejected
-           FROM submissions GROUP BY task_type"""
-    ).fetchall()
-    conn.close()
-
     by_task_type = {}
-    for r in type_rows:
-        tt = r["task_type"]
+    for tt, r in _read_counters("task_type").items():
+        if not r["total"]:
+            continue
         by_task_type[tt] = {
             "total": r["total"],
             "approved": r["approved"],
@@ -603,30 +1209,36 @@ def annotation_stats():
             }
         )
 
-    domain_rows = conn.execute(
-        "SELECT domain, COUNT(*) as cnt FROM submissions GROUP BY domain ORDER BY cnt DESC"
-    ).fetchall()
-    domain_list = [{"domain": r["domain"], "count": r["cnt"]} for r in domain_rows]
+    domain_list = sorted(
+        (
+            {"domain": k, "count": r["total"]}
+            for k, r in _read_counters("domain").items()
+            if r["total"]
+        ),
+        key=lambda d: d["count"],
+        reverse=True,
+    )
 
-    type_rows = conn.execute(
-        "SELECT task_type, COUNT(*) as cnt FROM submissions GROUP BY task_type ORDER BY cnt DESC"
-    ).fetchall()
-    type_list = [
-        {
-            "task_type": r["task_type"],
-            "label": TASK_TYPE_LABELS.get(r["task_type"], r["task_type"]),
-            "count": r["cnt"],
-        }
-        for r in type_rows
-    ]
+    type_list = sorted(
+        (
+            {
+                "task_type": k,
+                "label": TASK_TYPE_LABELS.get(k, k),
+                "count": r["total"],
+            }
+            for k, r in _read_counters("task_type").items()
+            if r["total"]
+        ),
+        key=lambda d: d["count"],
+        reverse=True,
+    )
 
-    all_subs = conn.execute("SELECT task_id, sample_id FROM submissions").fetchall()
     difficulty_dist: dict[str, int] = {}
-    for s in all_subs:
-        sample = _get_sample_by_id(s["task_id"], s["sample_id"])
-        diff = sample.get("difficulty", "medium") if sample else "medium"
-        difficulty_dist.setdefault(diff, 0)
-        difficulty_dist[diff] += 1
+    for r in conn.execute(
+        "SELECT difficulty, COUNT(*) FROM submissions GROUP BY difficulty"
+    ):
+        diff = r[0] or DEFAULT_DIFFICULTY
+        difficulty_dist[diff] = difficulty_dist.get(diff, 0) + r[1]
 
     kto_rows = conn.execute(
         "SELECT annotation_data FROM submissions WHERE task_type='kto_binary'"
@@ -648,10 +1260,9 @@ def annotation_stats():
             sft_edit_ratios.append(ad["edit_ratio"])
     avg_edit_ratio = round(sum(sft_edit_ratios) / max(len(sft_edit_ratios), 1), 3)
 
-    total_annotated = conn.execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
-    conn.close()
+    total_annotated = _read_counters("all", "").get("", _empty_counter())["total"]
 
-    total_samples = sum(len(v) for v in ANNOTATION_SAMPLES.values())
+    total_samples = sum(_sample_store.counts(conn).values())
 
     return {
         "daily_trend": daily_trend,
@@ -685,22 +1296,190 @@ def annotation_stats():
     }
 
 
+@router.get("/api/annotation/counters/verify")
+def verify_counters():
+    """校验进度计数器与 submissions 是否一致"""
+    drift = verify_submission_counters()
+    return {"consistent": not drift, "drift": drift}
+
+
+@router.post("/api/annotation/counters/rebuild")
+def rebuild_counters():
+    """从 submissions 全量重建进度计数器"""
+    drift = verify_submission_counters()
+    rows = rebuild_submission_counters()
+    log_audit(
+        action="annotation_counters_rebuild",
+        resource_type="annotation",
+        resource_id="submission_counters",
+        summary=f"重建标注计数器 {rows} 行，修正 {len(drift)} 处偏差",
+        details={"rows": rows, "drift": len(drift)},
+    )
+    return {"status": "ok", "rows": rows, "fixed": len(drift)}
+
+
+EXPORT_CHUNK_SIZE = 1000
+
+
+def _response_text(sample: dict, index) -> str:
+    responses = sample.get("responses", [])
+    if isinstance(index, int) and 0 <= index < len(responses):
+        return responses[index].get("text", "")
+    return ""
+
+
+def _export_record(task_type: str, sub: dict, sample: dict) -> dict:
+    """将一条已通过的提交转换为训练可用的记录，字段与 _get_export_fields 一致"""
+    record = {"prompt": sub["prompt"], "domain": sub.get("domain", "unknown")}
+    if task_type == "rlhf_ranking":
+        record["responses"] = [r.get("text", "") for r in sample.get("responses", [])]
+        record["ranking"] = sub.get("ranking", [])
+        record["rationale"] = sub.get("rationale", "")
+    elif task_type == "dpo_pairwise":
+        record["chosen"] = _response_text(sample, sub.get("chosen_index"))
+        record["rejected"] = _response_text(sample, sub.get("rejected_index"))
+        record["chosen_rationale"] = sub.get("rationale", "")
+        record["rejected_rationale"] = ""
+    elif task_type == "kto_binary":
+        record["response"] = _response_text(sample, 0)
+        record["feedback"] = sub.get("feedback")
+        record["safety_category"] = sub.get("safety_category", "none")
+        record["severity_score"] = sub.get("severity_score", 0)
+    elif task_type == "sft_editing":
+        record["original_response"] = sub.get("original_response", "")
+        record["edited_response"] = sub.get("edited_response", "")
+        record["edit_ratio"] = sub.get("edit_ratio", 0)
+    elif task_type == "reward_scoring":
+        record["response"] = _response_text(sample, 0)
+        record["scores"] = sub.get("scores", {})
+        record["overall_score"] = sub.get("overall_score", 0)
+    return record
+
+
+def _iter_approved_chunks(task: dict) -> Iterator[list[tuple[dict, dict]]]:
+    """按 (submit_time, id) keyset 分页读取已通过的提交及其样本，每次只持有一页
+
+    每页是独立的短查询，不跨线程持有游标（StreamingResponse 会在线程池中
+    逐块推进同步生成器）。
+    """
+    after = None
+    while True:
+        subs = _load_submissions(
+            task_id=task["id"],
+            review_status="approved",
+            after=after,
+            limit=EXPORT_CHUNK_SIZE,
+            oldest_first=True,
+        )
+        if not subs:
+            return
+        after = (subs[-1]["submit_time"], subs[-1]["id"])
+        # 样本按页从样本库读取，不整体加载任务的全部样本
+        samples = _sample_store.get_many(
+            _get_ann_db(), task["id"], [sub["sample_id"] for sub in subs]
+        )
+        yield [(sub, samples.get(sub["sample_id"], {})) for sub in subs]
+
+
+def _iter_export_chunks(task: dict) -> Iterator[list[dict]]:
+    task_type = task["task_type"]
+    for chunk in _iter_approved_chunks(task):
+        yield [_export_record(task_type, sub, sample) for sub, sample in chunk]
+
+
+def _stream_jsonl(task: dict, compress: bool) -> Iterator[bytes]:
+    gz = zlib.compressobj(wbits=31) if compress else None  # wbits=31 输出 gzip 格式
+    for chunk in _iter_export_chunks(task):
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in chunk).encode(
+            "utf-8"
+        )
+        data = gz.compress(data) if gz else data
+        if data:
+            yield data
+    if gz:
+        yield gz.flush()
+
+
+def _parquet_schema(task_type: str):
+    """导出字段的 Arrow schema，按 _get_export_fields 声明而不从数据推断：
+
+    某个 chunk 中整列为 None（如 feedback 未填）时推断出的 null 类型
+    与后续 chunk 不一致，写入会失败。未列出的字段均为字符串。
+    """
+    import pyarrow as pa
+
+    types = {
+        "responses": pa.list_(pa.string()),
+        "ranking": pa.list_(pa.int64()),
+        "severity_score": pa.float64(),
+        "edit_ratio": pa.float64(),
+        "overall_score": pa.float64(),
+    }
+    fields = _get_export_fields(task_type)
+    return pa.schema([(f, types.get(f, pa.string())) for f in fields])
+
+
+def _stream_parquet(task: dict) -> Iterator[bytes]:
+    """每个 chunk 写一个 row group 到临时文件，写完后分块读出
+
+    Parquet 的 footer 在文件末尾，只能落盘后再发送；嵌套的 dict 字段
+    （如 reward 的 scores）以 JSON 字符串存储，各 row group 使用同一份声明的 schema。
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema(task["task_type"])
+    with tempfile.TemporaryFile() as tmp:
+        writer = pq.ParquetWriter(tmp, schema, compression="zstd")
+        for chunk in _iter_export_chunks(task):
+            rows = [
+                {
+                    k: json.dumps(v, ensure_ascii=False) if isinstance(v, dict) else v
+                    for k, v in r.items()
+                }
+                for r in chunk
+            ]
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+        writer.close()
+        tmp.seek(0)
+        while data := tmp.read(1 << 20):
+            yield data
+
+
 @router.get("/api/annotation/export/{task_id}")
-def export_annotation_data(task_id: str, format: str = "jsonl"):
-    """导出标注数据 (返回已审核通过的数据)"""
-    subs = _load_submissions(task_id=task_id, review_status="approved")
-    task = next((t for t in ANNOTATION_TASKS if t["id"] == task_id), None)
+def export_annotation_data(task_id: str, format: str = "jsonl", gzip: bool = False):
+    """流式导出已审核通过的标注数据
+
+    format=jsonl 逐块输出 JSONL（gzip=true 时压缩）；format=parquet 需要安装 pyarrow。
+    内存占用与任务规模无关。
+    """
+    task = _get_task(task_id)
     if not task:
         return {"error": "task not found"}
-    return {
-        "task_id": task_id,
-        "task_name": task["name"],
-        "task_type": task["task_type"],
-        "format": format,
-        "total_records": len(subs),
-        "preview": subs[:5],
-        "export_fields": _get_export_fields(task["task_type"]),
-    }
+
+    if format == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            return {"error": "parquet 导出需要安装 pyarrow"}
+        body = _stream_parquet(task)
+        media_type = "application/vnd.apache.parquet"
+        filename = f"{task_id}.parquet"
+    elif format == "jsonl":
+        body = _stream_jsonl(task, gzip)
+        media_type = "application/gzip" if gzip else "application/x-ndjson"
+        filename = f"{task_id}.jsonl" + (".gz" if gzip else "")
+    else:
+        return {"error": f"unsupported format: {format}"}
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Export-Fields": ",".join(_get_export_fields(task["task_type"])),
+        },
+    )
 
 
 def _get_export_fields(task_type: str) -> list:
@@ -716,3 +1495,111 @@ def _get_export_fields(task_type: str) -> list:
     elif task_type == "reward_scoring":
         return base + ["response", "scores", "overall_score"]
     return base
+
+
+# ---------------------------------------------------------------------------
+# 评测集污染检测
+# ---------------------------------------------------------------------------
+# 评测集的本地副本（.jsonl / .json / .txt / .parquet / .csv）与 n-gram 索引目录
+EVAL_SET_DIR = Path(os.getenv("DATAOPS_EVAL_SET_DIR", _ANN_DB_DIR / "eval-sets"))
+CONTAMINATION_INDEX_DIR = Path(
+    os.getenv("DATAOPS_CONTAMINATION_DIR", _ANN_DB_DIR / "contamination")
+)
+
+_contamination_index: ContaminationIndex | None = None
+_contamination_lock = threading.Lock()
+
+
+def _get_contamination_index() -> ContaminationIndex:
+    """首次使用时打开索引（进程池在探测量较大时才启动）"""
+    global _contamination_index
+    with _contamination_lock:
+        if _contamination_index is None:
+            _contamination_index = ContaminationIndex(CONTAMINATION_INDEX_DIR)
+        return _contamination_index
+
+
+def close_contamination_index() -> None:
+    """关闭污染检测的进程池（服务退出时由 main.py 调用）"""
+    if _contamination_index is not None:
+        _contamination_index.close()
+
+
+def _contamination_records(
+    tasks: list[dict], submissions: bool
+) -> Iterator[tuple[tuple[str, str, str], list[str]]]:
+    """逐页产出待检测的记录：样本（prompt / responses）与已通过提交的导出记录"""
+    conn = _get_ann_db()
+    for task in tasks:
+        after = None
+        while page := _sample_store.page(conn, task["id"], EXPORT_CHUNK_SIZE, after):
+            after = (page[-1][0], page[-1][1]["id"])
+            for _, sample in page:
+                yield ("sample", task["id"], sample["id"]), record_texts(sample)
+        if submissions:
+            for chunk in _iter_approved_chunks(task):
+                for sub, sample in chunk:
+                    record = _export_record(task["task_type"], sub, sample)
+                    yield ("submission", task["id"], sub["id"]), record_texts(record)
+
+
+@router.post("/api/annotation/contamination/index")
+def build_contamination_index(error_rate: float = ERROR_RATE, ngram: int = NGRAM):
+    """由 EVAL_SET_DIR 下的评测集文件重建 n-gram 索引"""
+    files = eval_files(EVAL_SET_DIR)
+    if not files:
+        return {"error": f"no eval set files in {EVAL_SET_DIR}"}
+    if not 0 < error_rate < 1 or ngram < 1:
+        return {"error": "invalid error_rate or ngram"}
+    index = _get_contamination_index()
+    meta = index.build_files(files, error_rate=error_rate, ngram=ngram)
+    log_audit(
+        action="contamination_index_build",
+        resource_type="annotation",
+        resource_id=meta["build_id"],
+        summary=f"构建污染检测索引：评测集 {len(files)} 个文件，{meta['ngrams']} 个 n-gram",
+        details={"sources": meta["sources"], "ngram": ngram, "error_rate": error_rate},
+    )
+    return meta
+
+
+@router.get("/api/annotation/contamination")
+def check_contamination(
+    task_id: str | None = None, submissions: bool = True, threshold: float = THRESHOLD
+):
+    """检测标注样本与已通过的提交是否与评测集重叠
+
+    文本的污染率 = 命中评测集的 n-gram 数 / n-gram 总数；记录（样本或提交）取其
+    prompt / response 等字段中的最大值，≥ threshold 的列入 flagged_records（按污染率降序）。
+    不指定 task_id 时检测全部任务；样本与提交按页流式读取。
+    """
+    index = _get_contamination_index()
+    if not index.built:
+        return {"error": "contamination index not built"}
+    if task_id:
+        task = _get_task(task_id)
+        if not task:
+            return {"error": "task not found"}
+        tasks = [task]
+    else:
+        tasks = list(_INDEX.tasks.values())
+    result = index.scan(_contamination_records(tasks, submissions), threshold)
+    meta = index.meta
+    return {
+        "index": {
+            k: meta[k] for k in ("build_id", "ngram", "ngrams", "sources", "built_at")
+        },
+        "threshold": threshold,
+        **result.stats(),
+        "flagged_records": [
+            {
+                "source": source,
+                "task_id": tid,
+                "id": rid,
+                "ratio": ratio,
+                "hits": hits,
+                "ngrams": grams,
+            }
+            for (source, tid, rid), ratio, hits, grams in result.flagged
+        ],
+    }
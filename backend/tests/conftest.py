@@ -0,0 +1,17 @@
+"""
+测试公共配置 — 运行时数据库（执行历史、标注库等）写到临时目录，不改动仓库中的 data/
+"""
+
+import os
+import shutil
+import tempfile
+
+
+def pytest_configure(config):
+    # 在收集阶段 import main / 标注模块之前生效
+    config._dataops_data_dir = tempfile.mkdtemp(prefix="dataops-test-")
+    os.environ["DATAOPS_DATA_DIR"] = config._dataops_data_dir
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(config._dataops_data_dir, ignore_errors=True)
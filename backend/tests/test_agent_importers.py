@@ -0,0 +1,49 @@
+"""
+Agent 导入器批量接口测试 — 签名缓存与进程池结果须与逐条 import_data 一致
+"""
+
+import json
+from pathlib import Path
+
+import agent_importers
+from agent_importers import ImporterRegistry
+
+SAMPLES_DIR = Path(__file__).resolve().parent.parent / "data" / "agent-samples"
+
+
+def _records(n):
+    templates = [json.loads(p.read_text("utf-8")) for p in sorted(SAMPLES_DIR.glob("*.json"))]
+    return [
+        json.dumps({**templates[i % len(templates)], "id": f"s-{i}"}).encode("utf-8")
+        for i in range(n)
+    ]
+
+
+def test_import_batch_matches_import_data_and_reports_errors():
+    registry = ImporterRegistry(workers=1)
+    records = _records(6) + [
+        b"{bad",
+        b"[1]",
+        {"foo": 1},
+        {"messages": [{"content": "hi"}]},
+    ]
+    results = registry.import_batch(records)
+
+    expected = [registry.import_data(json.loads(r)) for r in records[:6]]
+    assert results[:6] == [(True, s) for s in expected]
+    assert [ok for ok, _ in results[6:]] == [False] * 4
+    assert results[6][1] == "无效的 JSON"
+    assert results[7][1] == "记录必须为 JSON 对象"
+    assert "无法识别数据格式" in results[8][1]
+    assert results[9][1] == "缺少字段 'role'"
+
+
+def test_process_pool_keeps_input_order(monkeypatch):
+    monkeypatch.setattr(agent_importers, "PARALLEL_THRESHOLD", 1)
+    records = _records(50)
+    serial = ImporterRegistry(workers=1).import_batch(records)
+    registry = ImporterRegistry(workers=2)
+    try:
+        assert registry.import_batch(records, chunk_size=7) == serial
+    finally:
+        registry.close()
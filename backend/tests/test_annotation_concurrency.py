@@ -0,0 +1,290 @@
+"""
+标注提交并发测试 — 高并发下提交 ID 不重复、样本不重复标注、无丢失写入；
+以及样本分页导入与已通过标注的导出
+"""
+
+import gzip
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import rlhf_annotation
+from core.async_db import AsyncSQLite
+from core.pagination import encode_cursor
+from core.sample_store import SampleStore
+from core.sqlite_pool import SQLitePool
+
+TASK_ID = "AT-STRESS"
+SAMPLE_COUNT = 200
+
+
+def _config(difficulty: str = "hard") -> dict:
+    return {
+        "annotation_tasks": [{"id": TASK_ID, "task_type": "kto_binary", "status": "active"}],
+        "annotators": [],
+        "quality_config": {},
+        "annotation_samples": {
+            TASK_ID: [
+                {"id": f"S{i:04d}", "prompt": f"prompt {i}", "difficulty": difficulty}
+                for i in range(SAMPLE_COUNT)
+            ]
+        },
+    }
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    pool = SQLitePool(tmp_path / "rlhf_annotation.db")
+    dal = AsyncSQLite(pool)
+    monkeypatch.setattr(rlhf_annotation, "_ann_pool", pool)
+    monkeypatch.setattr(rlhf_annotation, "_ann_dal", dal)
+    monkeypatch.setattr(rlhf_annotation, "_sample_store", SampleStore(pool))
+    monkeypatch.setattr(rlhf_annotation, "log_audit", lambda **kwargs: None)
+    for name in (
+        "ANNOTATION_TASKS",
+        "ANNOTATORS",
+        "QUALITY_CONFIG",
+        "_INDEX",
+    ):
+        monkeypatch.setattr(rlhf_annotation, name, getattr(rlhf_annotation, name))
+    rlhf_annotation._init_ann_db()
+    rlhf_annotation.init_annotation_config(_config())
+    app = FastAPI()
+    app.include_router(rlhf_annotation.router)
+    yield TestClient(app)
+    dal.close()
+    pool.close_all()
+
+
+def _submit(client, sample_id):
+    return client.post(
+        f"/api/annotation/tasks/{TASK_ID}/submit",
+        json={"sample_id": sample_id, "feedback": "good"},
+    ).json()
+
+
+def test_concurrent_submits_no_lost_or_duplicate(client):
+    # 每个样本并发提交 3 次，只能有一次成功
+    sample_ids = [f"S{i:04d}" for i in range(SAMPLE_COUNT)] * 3
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(lambda sid: _submit(client, sid), sample_ids))
+
+    ok = [r for r in results if r["status"] == "ok"]
+    assert len(ok) == SAMPLE_COUNT
+    assert all("已被标注" in r["message"] for r in results if r["status"] != "ok")
+    assert sorted(r["submission_id"] for r in ok) == [
+        f"SUB-{TASK_ID}-{i:04d}" for i in range(1, SAMPLE_COUNT + 1)
+    ]
+
+    conn = rlhf_annotation._get_ann_db()
+    rows = conn.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT sample_id) FROM submissions WHERE task_id=?",
+        (TASK_ID,),
+    ).fetchone()
+    assert tuple(rows) == (SAMPLE_COUNT, SAMPLE_COUNT)
+    # 计数器与提交在同一事务内更新，并发下也不应漂移
+    assert rlhf_annotation.verify_submission_counters() == []
+
+
+def test_batch_and_single_share_sequence(client):
+    assert _submit(client, "S0000")["submission_id"] == f"SUB-{TASK_ID}-0001"
+    resp = client.post(
+        f"/api/annotation/tasks/{TASK_ID}/submit/batch",
+        json=[{"sample_id": sid, "feedback": "bad"} for sid in ("S0000", "S0001")],
+    ).json()
+    assert [r["status"] for r in resp["results"]] == ["error", "ok"]
+    assert resp["results"][1]["submission_id"] == f"SUB-{TASK_ID}-0002"
+    assert _submit(client, "S0002")["submission_id"] == f"SUB-{TASK_ID}-0003"
+    assert resp["task_progress"]["completed"] == 2
+    assert rlhf_annotation.verify_submission_counters() == []
+
+
+def test_batch_partial_failure_updates_counters(client):
+    items = [
+        {"sample_id": "S0010", "feedback": "good", "annotator": "ann-a", "duration_seconds": 30},
+        {"sample_id": "S0011"},  # 缺少 feedback
+        {"sample_id": "S0012", "feedback": 1},
+        {"sample_id": "NOPE", "feedback": "good"},
+        {"sample_id": "S0010", "feedback": "bad"},  # 本批次重复
+        "not an object",
+        {"sample_id": "S0013", "feedback": "bad", "annotator": "ann-b", "duration_seconds": 10},
+        {"sample_id": {"x": 1}, "feedback": "good"},
+        {"sample_id": "S0015", "feedback": "good", "annotator": {"n": 1}},
+        {"sample_id": "S0016", "feedback": "good", "duration_seconds": "abc"},
+        {"sample_id": "S0017", "feedback": "good", "duration_seconds": True},
+    ]
+    resp = client.post(f"/api/annotation/tasks/{TASK_ID}/submit/batch", json=items).json()
+    assert (resp["submitted"], resp["failed"]) == (2, 9)
+    assert [r["status"] for r in resp["results"]] == ["ok"] + ["error"] * 5 + ["ok"] + ["error"] * 4
+    messages = [r.get("message", "") for r in resp["results"]]
+    assert "缺少字段 feedback" in messages[1] and "类型应为 str" in messages[2]
+    assert "不存在" in messages[3] and "重复" in messages[4]
+    assert "sample_id 类型应为 str" in messages[7] and "annotator 类型应为 str" in messages[8]
+    assert all("duration_seconds 类型应为数字" in m for m in messages[9:])
+    assert resp["task_progress"] == {"completed": 2, "total": SAMPLE_COUNT, "percent": 1.0}
+
+    # JSONL 提交：无效行与已标注样本逐条报错，不影响同批其他条目
+    lines = "\n".join(
+        [
+            json.dumps({"sample_id": "S0013", "feedback": "good"}),
+            "{broken",
+            json.dumps({"sample_id": "S0014", "feedback": "good", "annotator": "ann-a"}),
+        ]
+    )
+    resp = client.post(
+        f"/api/annotation/tasks/{TASK_ID}/submit/batch",
+        content=lines,
+        headers={"Content-Type": "application/x-ndjson"},
+    ).json()
+    assert [r["status"] for r in resp["results"]] == ["error", "error", "ok"]
+    assert resp["task_progress"]["completed"] == 3
+
+    task = rlhf_annotation._read_counters("task", TASK_ID)[TASK_ID]
+    assert (task["total"], task["pending"]) == (3, 3)
+    annotators = rlhf_annotation._read_counters("annotator")
+    assert annotators["ann-a"]["total"] == 2 and annotators["ann-a"]["duration_sum"] == 30
+    assert annotators["ann-b"]["total"] == 1
+    assert rlhf_annotation.verify_submission_counters() == []
+
+
+def test_submission_cursor_pages_are_stable(client):
+    for i in range(7):
+        client.post(
+            f"/api/annotation/tasks/{TASK_ID}/submit",
+            json={"sample_id": f"S{i:04d}", "feedback": "good", "annotator": f"ann-{i % 2}"},
+        )
+    url = f"/api/annotation/tasks/{TASK_ID}/submissions"
+    page = client.get(url, params={"limit": 3}).json()
+    seen = [s["id"] for s in page["submissions"]]
+    assert page["total"] == 7
+    # 翻页过程中插入的新提交排在最前，不影响后续页，既不重复也不遗漏
+    client.post(
+        f"/api/annotation/tasks/{TASK_ID}/submit",
+        json={"sample_id": "S0100", "feedback": "good", "annotator": "ann-0"},
+    )
+    while page["next_cursor"]:
+        page = client.get(url, params={"limit": 3, "cursor": page["next_cursor"]}).json()
+        seen += [s["id"] for s in page["submissions"]]
+    assert seen == [f"SUB-{TASK_ID}-{i:04d}" for i in range(7, 0, -1)]
+
+    filtered = client.get(url, params={"annotator": "ann-0", "limit": 2}).json()
+    assert filtered["total"] == 5 and len(filtered["submissions"]) == 2
+    rest = client.get(url, params={"annotator": "ann-0", "cursor": filtered["next_cursor"]}).json()
+    assert {s["annotator"] for s in filtered["submissions"] + rest["submissions"]} == {"ann-0"}
+    assert len(rest["submissions"]) == 3 and rest["next_cursor"] is None
+
+    # 非 base64 JSON、长度不对、空数组、元素不是字符串或数字
+    bad_cursors = ["not-a-cursor", "WzFd", "W10", encode_cursor({"a": 1}, [1])]
+    bad_cursors += [encode_cursor(None, "x"), encode_cursor(True, "x")]
+    for bad in bad_cursors:
+        resp = client.get(url, params={"cursor": bad}).json()
+        assert resp == {"status": "error", "message": "无效的分页游标"}
+    samples = client.get(f"/api/annotation/tasks/{TASK_ID}/samples", params={"cursor": "x"})
+    assert samples.json()["status"] == "error"
+
+
+def test_difficulty_persisted_and_backfilled_on_reload(client):
+    _submit(client, "S0000")
+    conn = rlhf_annotation._get_ann_db()
+    # 模拟加列前的旧提交
+    _submit(client, "S0001")
+    conn.execute("UPDATE submissions SET difficulty=NULL WHERE sample_id='S0001'")
+    stats = client.get("/api/annotation/stats").json()
+    assert stats["difficulty_distribution"] == {"hard": 1, "medium": 1}
+
+    rlhf_annotation.reload_annotation_config(_config(difficulty="easy"))
+    stats = client.get("/api/annotation/stats").json()
+    # 已记录的难度不随配置变化，只回填缺失的
+    assert stats["difficulty_distribution"] == {"hard": 1, "easy": 1}
+    assert client.get(f"/api/annotation/tasks/{TASK_ID}").json()["sample_count"] == (SAMPLE_COUNT)
+
+
+def test_samples_paginate_and_import(client):
+    url = f"/api/annotation/tasks/{TASK_ID}/samples"
+    first = client.get(url, params={"limit": 150}).json()
+    second = client.get(url, params={"cursor": first["next_cursor"]}).json()
+    ids = [s["id"] for s in first["samples"] + second["samples"]]
+    assert ids == [f"S{i:04d}" for i in range(SAMPLE_COUNT)]
+    assert second["next_cursor"] is None and first["total"] == SAMPLE_COUNT
+
+    lines = "\n".join(
+        json.dumps({"id": f"NEW{i}", "prompt": "p", "difficulty": "easy"}) for i in range(3)
+    )
+    resp = client.post(
+        f"{url}/import", files={"file": ("s.jsonl", lines, "application/x-ndjson")}
+    ).json()
+    assert (resp["status"], resp["ingested"], resp["samples"]) == (
+        "ok",
+        3,
+        SAMPLE_COUNT + 3,
+    )
+    assert _submit(client, "NEW2")["status"] == "ok"
+
+
+def _approve(client, submission_id):
+    resp = client.post(
+        f"/api/annotation/tasks/{TASK_ID}/review",
+        json={"submission_id": submission_id, "action": "approve"},
+    ).json()
+    assert resp["review_status"] == "approved"
+
+
+def test_jsonl_export_round_trip(client, monkeypatch):
+    monkeypatch.setattr(rlhf_annotation, "EXPORT_CHUNK_SIZE", 2)
+    items = [
+        {"sample_id": f"S{i:04d}", "feedback": "好" if i % 2 else "bad", "severity_score": i}
+        for i in range(5)
+    ]
+    resp = client.post(f"/api/annotation/tasks/{TASK_ID}/submit/batch", json=items).json()
+    sub_ids = [r["submission_id"] for r in resp["results"]]
+    for sub_id in sub_ids[:4]:
+        _approve(client, sub_id)
+    client.post(
+        f"/api/annotation/tasks/{TASK_ID}/review",
+        json={"submission_id": sub_ids[4], "action": "reject"},
+    )
+
+    url = f"/api/annotation/export/{TASK_ID}"
+    plain = client.get(url)
+    assert plain.headers["content-type"].startswith("application/x-ndjson")
+    assert f'{TASK_ID}.jsonl"' in plain.headers["content-disposition"]
+    fields = plain.headers["X-Export-Fields"].split(",")
+    records = [json.loads(line) for line in plain.text.splitlines()]
+    # 只导出已通过的，跨 chunk 保持提交顺序
+    assert [r["prompt"] for r in records] == [f"prompt {i}" for i in range(4)]
+    assert [r["feedback"] for r in records] == ["bad", "好", "bad", "好"]
+    assert all(list(r) == fields for r in records)
+
+    packed = client.get(url, params={"gzip": "true"})
+    assert packed.headers["content-type"] == "application/gzip"
+    assert f'{TASK_ID}.jsonl.gz"' in packed.headers["content-disposition"]
+    assert gzip.decompress(packed.content) == plain.content
+
+    assert "error" in client.get(url, params={"format": "csv"}).json()
+
+
+def test_parquet_export_declares_schema(client, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    import pyarrow as pa
+
+    monkeypatch.setattr(rlhf_annotation, "EXPORT_CHUNK_SIZE", 2)
+    # 第一个 chunk 的 feedback 全为 None，不能据此推断出 null 列
+    for sample_id, feedback in (("S0000", None), ("S0001", None), ("S0002", "good")):
+        resp = client.post(
+            f"/api/annotation/tasks/{TASK_ID}/submit",
+            json={"sample_id": sample_id, "feedback": feedback, "severity_score": 2},
+        ).json()
+        _approve(client, resp["submission_id"])
+
+    resp = client.get(f"/api/annotation/export/{TASK_ID}", params={"format": "parquet"})
+    table = pq.read_table(pa.BufferReader(resp.content))
+    assert table.schema.field("feedback").type == pa.string()
+    assert table.column_names == resp.headers["X-Export-Fields"].split(",")
+    assert table.column("feedback").to_pylist() == [None, None, "good"]
+    assert table.column("severity_score").to_pylist() == [2.0] * 3
+
+    empty = client.get("/api/annotation/export/AT-NONE", params={"format": "parquet"})
+    assert empty.json() == {"error": "task not found"}
@@ -2,6 +2,10 @@
 冒烟测试 — 验证核心 API 端点返回 200 且结构正确
 """
 
+import json
+from datetime import datetime, timedelta
+
+import pytest
 from fastapi.testclient import TestClient
 
 from main import app
@@ -37,6 +41,65 @@ def test_quality_rules():
     assert "pass_rate_30d" in data[0]
 
 
+def test_quality_run(tmp_path, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "QUALITY_TABLE_DIR", tmp_path)
+    assert "error" in client.post("/api/quality/run?table=nope").json()
+    data = client.post("/api/quality/run?table=dw_orders_daily").json()
+    assert data["checks"] == [] and {s["rule_id"] for s in data["skipped"]} >= {"QR-001"}
+
+
+def test_configured_pipelines_resolve_scheduler_handlers(tmp_path, monkeypatch):
+    import main
+
+    assert main.SCHEDULER.handler_for("dedup_pipeline") is main._dedup_handler
+    assert main.SCHEDULER.handler_for("marketing_attribution") is main._quality_check_handler
+    monkeypatch.setattr(main, "QUALITY_TABLE_DIR", tmp_path)
+    pipeline = main.PIPELINE_BY_ID["marketing_attribution"]
+    with pytest.raises(FileNotFoundError):
+        main._quality_check_handler(pipeline)
+    (tmp_path / "dm_marketing_attribution.csv").write_text("channel\nsearch\nfeed\n")
+    assert main._quality_check_handler(pipeline) == {"rows_processed": 2, "checks": 1}
+
+
+def test_dedup_run_records_execution(tmp_path, monkeypatch):
+    import main
+
+    records = []
+    monkeypatch.setattr(main, "CORPUS_DIR", tmp_path)
+    monkeypatch.setattr(main, "DEDUP_INDEX_DIR", tmp_path / "index")
+    monkeypatch.setattr(main, "_dedup_index", None)
+    monkeypatch.setattr(main, "_record_execution", records.append)
+    text = "预训练语料 近似去重 " * 20
+    (tmp_path / "c.jsonl").write_text(f'{{"text": "{text}"}}\n{{"text": "{text}!"}}\n')
+    assert "error" in client.post("/api/dedup/run?corpus=nope.jsonl").json()
+    data = client.post("/api/dedup/run?corpus=c.jsonl").json()
+    assert data["duplicates"] == 1 and (tmp_path / "c.dedup.jsonl").exists()
+    assert records[0]["pipeline_id"] == "dedup_pipeline" and records[0]["rows_processed"] == 2
+    main._dedup_index.close()
+
+
+def test_contamination_check_flags_leaked_sample(tmp_path, monkeypatch):
+    import rlhf_annotation
+
+    monkeypatch.setattr(rlhf_annotation, "EVAL_SET_DIR", tmp_path / "evals")
+    monkeypatch.setattr(rlhf_annotation, "CONTAMINATION_INDEX_DIR", tmp_path / "index")
+    monkeypatch.setattr(rlhf_annotation, "_contamination_index", None)
+    assert "error" in client.post("/api/annotation/contamination/index").json()
+    (_, sample), *_ = rlhf_annotation._sample_store.page(rlhf_annotation._get_ann_db(), "AT-001", 1)
+    (tmp_path / "evals").mkdir()
+    (tmp_path / "evals" / "bench.jsonl").write_text(
+        json.dumps({"question": sample["prompt"]}, ensure_ascii=False) + "\n"
+    )
+    meta = client.post("/api/annotation/contamination/index").json()
+    assert meta["ngrams"] > 0 and meta["sources"] == ["bench.jsonl"]
+    data = client.get("/api/annotation/contamination?task_id=AT-001").json()
+    flagged = {(r["source"], r["id"]): r["ratio"] for r in data["flagged_records"]}
+    assert data["records"] >= 1 and flagged[("sample", sample["id"])] == 1.0
+    rlhf_annotation.close_contamination_index()
+
+
 def test_cost_summary():
     resp = client.get("/api/cost/summary")
     assert resp.status_code == 200
@@ -45,6 +108,30 @@ def test_cost_summary():
     assert "by_pipeline" in data
 
 
+def test_cost_totals_exclude_runs_older_than_30_days():
+    import main
+
+    before = client.get("/api/cost/summary").json()["total_cost_30d"]
+    stats_before = client.get("/api/dashboard/stats").json()["total_cost_30d"]
+    start = (datetime.now() - timedelta(days=60)).isoformat()
+    main.HISTORY.append_execution(
+        {
+            "id": "old-run",
+            "pipeline_id": "orders_daily",
+            "pipeline_name": "订单日聚合",
+            "start_time": start,
+            "end_time": start,
+            "duration_minutes": 1,
+            "status": "success",
+            "rows_processed": 10**9,
+            "cost_yuan": 10**6,
+            "owner": "data-platform",
+        }
+    )
+    assert client.get("/api/cost/summary").json()["total_cost_30d"] == before
+    assert client.get("/api/dashboard/stats").json()["total_cost_30d"] == stats_before
+
+
 def test_config_reload():
     resp = client.get("/api/config/reload")
     assert resp.status_code == 200
@@ -71,6 +158,16 @@ def test_lineage():
     assert "edges" in data
 
 
+def test_lineage_queries():
+    table = client.get("/api/lineage").json()["edges"][0]["source"]
+    down = client.get(f"/api/lineage/{table}/downstream").json()
+    assert down["direction"] == "downstream" and down["levels"]
+    assert client.get(f"/api/lineage/{table}/subgraph?upstream=0").json()["center"] == table
+    path = client.get("/api/lineage/critical-path").json()
+    assert path["total_minutes"] > 0 and path["steps"]
+    assert "error" in client.get("/api/lineage/nope/upstream").json()
+
+
 def test_teams_stats():
     resp = client.get("/api/teams/stats")
     assert resp.status_code == 200
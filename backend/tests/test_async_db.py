@@ -0,0 +1,80 @@
+"""
+SQLite 异步访问层测试 — 组提交、单个写操作失败不影响同批其他操作
+"""
+
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from core.async_db import AsyncSQLite
+from core.sqlite_pool import SQLitePool
+
+
+@pytest.fixture
+def dal(tmp_path):
+    pool = SQLitePool(tmp_path / "dal.db")
+    pool.connection().execute("CREATE TABLE t (k TEXT PRIMARY KEY, v INTEGER)")
+    dal = AsyncSQLite(pool, readers=4, max_batch=32)
+    yield dal
+    dal.close()
+    pool.close_all()
+
+
+def _insert(conn, key, value):
+    conn.execute("INSERT INTO t (k, v) VALUES (?, ?)", (key, value))
+    return threading.current_thread().name
+
+
+def _count(conn):
+    return conn.execute("SELECT COUNT(*) FROM t").fetchone()[0]
+
+
+def test_failed_write_rolls_back_only_itself(dal):
+    async def scenario():
+        jobs = [dal.write(_insert, f"k{i}", i) for i in range(50)]
+        jobs.append(dal.write(_insert, "k0", -1))  # 主键冲突
+        results = await asyncio.gather(*jobs, return_exceptions=True)
+        return results, await dal.read(_count)
+
+    results, count = asyncio.run(scenario())
+    assert all(name == "sqlite-writer" for name in results[:50])
+    assert isinstance(results[50], sqlite3.IntegrityError)
+    assert count == 50
+    # 并发提交的写操作被合并进少数几个事务
+    assert dal.stats()["commits"] < 50
+
+
+def test_nested_write_and_sync_callers(dal):
+    def outer(conn):
+        _insert(conn, "outer", 1)
+        # 写操作内部再发起写入，直接在同一事务中执行
+        return dal.write_sync(_insert, "inner", 2)
+
+    assert dal.write_sync(outer) == "sqlite-writer"
+    threads = [
+        threading.Thread(target=dal.write_sync, args=(_insert, f"t{i}", i)) for i in range(20)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert asyncio.run(dal.read(_count)) == 22
+
+
+def test_full_batch_flushes_before_delay(tmp_path):
+    pool = SQLitePool(tmp_path / "dal.db")
+    pool.connection().execute("CREATE TABLE t (k TEXT PRIMARY KEY, v INTEGER)")
+    # 时间窗口与空闲阈值都远大于超时：只有凑满 max_batch 才会刷新
+    dal = AsyncSQLite(pool, max_batch=4, max_delay=30, max_idle=30)
+
+    async def scenario():
+        jobs = [dal.write(_insert, f"k{i}", i) for i in range(8)]
+        await asyncio.wait_for(asyncio.gather(*jobs), timeout=5)
+
+    asyncio.run(scenario())
+    stats = dal.stats()
+    assert (stats["commits"], stats["full_batches"]) == (2, 2)
+    dal.close()
+    pool.close_all()
@@ -0,0 +1,73 @@
+"""
+列式表测试 — 维度编码、分组聚合、每组最近 N 行、快照与并发追加、历史统计
+"""
+
+import numpy as np
+
+from core.columnar import CATEGORY, ColumnTable
+from core.history import ExecutionHistory
+from tests.test_history_store import _execution
+
+
+def _table():
+    table = ColumnTable({"k": CATEGORY, "day": "datetime64[D]", "v": "int64"})
+    table.append(
+        {
+            "k": ["a", "b", "a", "c", "a"],
+            "day": [
+                "2026-01-01",
+                "2026-01-02",
+                "2026-01-01",
+                "2026-01-01",
+                "2026-01-02",
+            ],
+            "v": [1, 2, 3, 4, 5],
+        }
+    )
+    return table
+
+
+def test_group_by_counts_and_sums():
+    table = _table()
+    assert table.group_by(["k"], ["v"]) == {
+        ("a",): {"count": 3, "v": 9},
+        ("b",): {"count": 1, "v": 2},
+        ("c",): {"count": 1, "v": 4},
+    }
+    by_day = table.group_by(["day", "k"], ["v"], where=table.isin("k", ["a", "x"]))
+    assert {(str(d), k): c["v"] for (d, k), c in by_day.items()} == {
+        ("2026-01-01", "a"): 4,
+        ("2026-01-02", "a"): 5,
+    }
+    assert table.group_by([], ["v"]) == {(): {"count": 5, "v": 15}}
+    assert table.group_by(["k"], where=np.zeros(5, dtype=bool)) == {}
+
+
+def test_tail_per_group_and_snapshot():
+    table = _table()
+    assert table.tail_per_group("k", 2).tolist() == [False, True, True, True, True]
+    where = table.isin("k", ["a", "c"])
+    assert table.tail_per_group("k", 1, where).tolist() == [0, 0, 0, 1, 1]
+
+    snapshot = table.snapshot()
+    for i in range(3000):  # 触发扩容
+        table.append({"k": ["d"], "day": ["2026-01-03"], "v": [i]})
+    assert len(snapshot) == 5 and len(snapshot.group_by(["k"])) == 3
+    assert table.group_by(["k"])[("d",)]["count"] == 3000
+
+
+def test_history_totals_over_columns():
+    executions = [
+        _execution(i, f"p{i % 2}", f"2026-02-0{1 + i // 4}T0{i % 4}:00:00") for i in range(8)
+    ]
+    executions[7]["status"] = "failed"
+    history = ExecutionHistory(executions[::-1], [])
+    by_day = history.execution_totals(("day", "status"), ["2026-02-02"])
+    assert {k: v.runs for k, v in by_day.items()} == {
+        ("2026-02-02", "success"): 3,
+        ("2026-02-02", "failed"): 1,
+    }
+    recent = history.execution_totals(("pipeline_id",), latest_per_pipeline=2)
+    assert {k: v.runs for k, v in recent.items()} == {("p0",): 2, ("p1",): 2}
+    assert history.latest_day == "2026-02-02"
+    assert history.execution_total().cost_yuan == 12.0
@@ -0,0 +1,115 @@
+"""
+配置热重载测试 — 未变化文件不解析、按 id 比较差异、解析失败不生效、跨 worker generation
+"""
+
+import os
+import shutil
+
+import pytest
+import yaml
+
+import main
+from core.config_loader import ConfigLoader, SharedGeneration, diff_by_id
+
+
+def _write(path, data, mtime_ns=None):
+    path.write_text(yaml.safe_dump(data, allow_unicode=True), encoding="utf-8")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_refresh_parses_only_changed_content(tmp_path):
+    _write(tmp_path / "a.yaml", {"rules": [1]}, mtime_ns=10**18)
+    _write(tmp_path / "b.yaml", {"rules": [2]}, mtime_ns=10**18)
+    loader = ConfigLoader(tmp_path, ["a.yaml", "b.yaml"])
+    assert set(loader.refresh()) == {"a.yaml", "b.yaml"}
+    assert loader.refresh() == {}
+
+    # 内容不变只改时间戳（touch）：比对摘要后跳过
+    os.utime(tmp_path / "a.yaml", ns=(2 * 10**18, 2 * 10**18))
+    assert loader.refresh() == {}
+
+    _write(tmp_path / "b.yaml", {"rules": [3]}, mtime_ns=3 * 10**18)
+    assert loader.refresh() == {"b.yaml": {"rules": [3]}}
+    assert loader.get("b.yaml") == {"rules": [3]}
+
+
+def test_invalid_yaml_keeps_previous_and_invalidate_forces_reparse(tmp_path):
+    _write(tmp_path / "a.yaml", {"k": 1})
+    loader = ConfigLoader(tmp_path, ["a.yaml"])
+    loader.refresh()
+    (tmp_path / "a.yaml").write_text("k: [unclosed", encoding="utf-8")
+    with pytest.raises(yaml.YAMLError):
+        loader.refresh()
+    assert loader.get("a.yaml") == {"k": 1}
+
+    _write(tmp_path / "a.yaml", {"k": 2})
+    loader.refresh()
+    loader.invalidate(["a.yaml"])
+    assert loader.refresh() == {"a.yaml": {"k": 2}}
+
+
+def test_diff_by_id_ignores_order():
+    old = [{"id": "a", "v": 1}, {"id": "b", "v": 1}, {"id": "c", "v": 1}]
+    new = [{"id": "c", "v": 1}, {"id": "b", "v": 2}, {"id": "d", "v": 1}]
+    diff = diff_by_id(old, new)
+    assert diff.as_dict() == {"added": ["d"], "removed": ["a"], "changed": ["b"]}
+    assert not diff_by_id(old, old[::-1])
+
+
+def test_shared_generation_visible_across_instances(tmp_path):
+    a = SharedGeneration(tmp_path / "config.db")
+    b = SharedGeneration(tmp_path / "config.db")
+    assert a.bump() == b.current() == 1
+    assert b.bump() == a.current() == 2
+
+
+@pytest.fixture
+def config_copy(tmp_path, monkeypatch):
+    """把配置复制到临时目录，重载只作用于副本；结束后恢复调度器"""
+    shutil.copytree(main.CONFIG_DIR, tmp_path / "configs")
+    loader = ConfigLoader(tmp_path / "configs", main.CONFIG_FILES)
+    loader.refresh()
+    monkeypatch.setattr(main, "CONFIG", loader)
+    monkeypatch.setattr(main, "CONFIG_GENERATION", SharedGeneration(tmp_path / "g.db"))
+    monkeypatch.setattr(main, "_config_generation_seen", 0)
+    for name in ("PIPELINES", "PIPELINE_BY_ID", "QUALITY_RULES"):
+        monkeypatch.setattr(main, name, getattr(main, name))
+    original = main.PIPELINES
+    yield tmp_path / "configs"
+    main.SCHEDULER.load(original)
+
+
+def test_reload_rebuilds_only_changed_config(config_copy):
+    result = main.reload_config()
+    assert result["changed_files"] == [] and result["changes"] == {}
+    assert result["generation"] == 1
+
+    path = config_copy / "pipelines.yaml"
+    cfg = yaml.safe_load(path.read_text("utf-8"))
+    first = cfg["pipelines"][0]
+    first["name"] = "renamed"
+    removed = cfg["pipelines"].pop()
+    _write(path, cfg)
+    result = main.reload_config()
+    assert result["changed_files"] == ["pipelines.yaml"]
+    assert result["changes"]["pipelines"] == {
+        "added": [],
+        "removed": [removed["id"]],
+        "changed": [first["id"]],
+    }
+    assert main.PIPELINE_BY_ID[first["id"]]["name"] == "renamed"
+    assert removed["id"] not in main.SCHEDULER._pipelines
+
+
+def test_other_worker_follows_generation(config_copy):
+    assert main.sync_config() is None
+    cfg = yaml.safe_load((config_copy / "quality.yaml").read_text("utf-8"))
+    cfg["rules"] = cfg["rules"][:1]
+    _write(config_copy / "quality.yaml", cfg)
+    # 另一个 worker 处理了 reload 请求
+    SharedGeneration(config_copy.parent / "g.db").bump()
+    result = main.sync_config()
+    assert result["changed_files"] == ["quality.yaml"]
+    assert len(main.QUALITY_RULES) == 1
+    assert main.sync_config() is None
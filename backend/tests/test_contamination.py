@@ -0,0 +1,84 @@
+"""
+污染检测测试 — n-gram 哈希、单字 Bloom filter、索引构建与重建、进程池分片探测
+"""
+
+import json
+import random
+import string
+
+import numpy as np
+
+import core.contamination as contamination
+from core.contamination import BloomFilter, ContaminationIndex, NGramHasher, iter_texts
+
+
+def _doc(rng, words=60):
+    return " ".join(
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8))) for _ in range(words)
+    )
+
+
+def test_ngram_hashes_ignore_position_case_and_punctuation():
+    hasher = NGramHasher(3)
+    hashes, counts = hasher.grams(["Alpha beta, GAMMA delta", "x  alpha--beta gamma", "ab", ""])
+    assert counts.tolist() == [2, 2, 0, 0]
+    assert hashes[0] == hashes[3]  # "alpha beta gamma"
+    # n-gram 不跨文本；中日韩字符各自成词
+    assert len(hasher.grams(["a b", "c d"])[0]) == 0
+    cjk, counts = hasher.grams(["量子计算", "解释量子计算"])
+    assert counts.tolist() == [2, 4] and set(cjk[:2]) <= set(cjk[2:])
+
+
+def test_bloom_filter_has_no_false_negatives():
+    words, hashes = BloomFilter.size_for(20_000, 0.01)
+    bloom = BloomFilter(np.zeros(words, dtype=np.uint64), hashes)
+    keys = contamination._mix64(np.arange(40_000, dtype=np.uint64))
+    bloom.add(keys[:20_000])
+    assert bloom.contains(keys[:20_000]).all()
+    assert bloom.contains(keys[20_000:]).mean() < 0.02
+
+
+def test_build_probe_and_rebuild(tmp_path):
+    rng = random.Random(1)
+    evals = [_doc(rng) for _ in range(20)]
+    path = tmp_path / "eval.jsonl"
+    path.write_text("".join(json.dumps({"question": q, "answer": 1}) + "\n" for q in evals))
+    assert list(iter_texts(path)) == evals
+
+    index = ContaminationIndex(tmp_path / "index", workers=1)
+    assert not index.built
+    per_doc = 60 - contamination.NGRAM + 1
+    meta = index.build_files([path])
+    assert meta["ngrams"] == 20 * per_doc and meta["sources"] == ["eval.jsonl"]
+    # 前后多出的 Q / A 42 带来 3 个未命中的 n-gram
+    leaked = "Q: " + evals[3].upper() + "\nA: 42"
+    hits, grams = index.probe([leaked, _doc(rng), "too short"])
+    assert hits[0] == per_doc and grams[0] == per_doc + 3
+    assert hits[1] <= 2 and grams[2] == 0
+
+    reopened = ContaminationIndex(tmp_path / "index", workers=1)
+    records = [(i, [_doc(rng)]) for i in range(5)] + [("leak", ["prefix", evals[7]])]
+    result = reopened.scan(records)
+    assert result.records == 6 and [f[0] for f in result.flagged] == ["leak"]
+    assert result.stats()["contamination_ratio"] == round(1 / 6, 4)
+
+    path.write_text(json.dumps({"question": _doc(rng)}) + "\n")
+    index.build_files([path])
+    assert ContaminationIndex(tmp_path / "index", workers=1).probe([evals[7]])[0][0] <= 2
+
+
+def test_process_pool_shards_match_serial(tmp_path, monkeypatch):
+    monkeypatch.setattr(contamination, "SHARD_CHARS", 2000)
+    rng = random.Random(2)
+    evals = [_doc(rng) for _ in range(30)]
+    index = ContaminationIndex(tmp_path, workers=2)
+    try:
+        index.build(evals, capacity=10_000)
+        samples = [(i, [evals[i] if i % 3 == 0 else _doc(rng)]) for i in range(30)]
+        pooled = index.scan(samples)
+        index.workers = 1
+        serial = index.scan(samples)
+        assert pooled.flagged == serial.flagged and pooled.hits == serial.hits
+        assert sorted(f[0] for f in pooled.flagged) == list(range(0, 30, 3))
+    finally:
+        index.close()
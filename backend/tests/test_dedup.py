@@ -0,0 +1,100 @@
+"""
+近似去重测试 — MinHash 估计、批内与历史增量去重、索引持久化与中断恢复、进程池分片
+"""
+
+import json
+import random
+import string
+
+import numpy as np
+import pytest
+
+import core.dedup as dedup
+from core.dedup import DedupIndex, MinHasher, dedup_jsonl
+
+
+def _doc(rng, words=200):
+    return " ".join(
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 8))) for _ in range(words)
+    )
+
+
+def _near(rng, text, edits=3):
+    words = text.split()
+    for _ in range(edits):
+        words[rng.randrange(len(words))] = "edited"
+    return " ".join(words)
+
+
+def _shingles(text, n=5):
+    text = " ".join(text.lower().split())
+    return {text[i : i + n] for i in range(len(text) - n + 1)}
+
+
+def test_signature_estimates_jaccard():
+    rng = random.Random(1)
+    a = _doc(rng)
+    b = _near(rng, a, edits=20)
+    hasher = MinHasher()
+    sig = hasher.signatures([a, b, _doc(rng), "", "ab"])
+    exact = len(_shingles(a) & _shingles(b)) / len(_shingles(a) | _shingles(b))
+    assert abs((sig[0] == sig[1]).mean() - exact) < 0.1
+    assert (sig[0] == sig[2]).mean() < 0.05
+    # 短文档的空桶已填充；签名与同批的其他文档无关
+    assert (sig[3:] != 0xFFFFFFFF).all()
+    assert (hasher.signatures(["ab", b])[::-1] == sig[[1, 4]]).all()
+
+
+def test_incremental_dedup_against_history(tmp_path):
+    rng = random.Random(2)
+    docs = [_doc(rng) for _ in range(50)]
+    index = DedupIndex(tmp_path, workers=1)
+    first = index.dedup([f"a{i}" for i in range(52)], docs + [_near(rng, docs[3]), docs[7].upper()])
+    assert first.duplicates == {"a50": "a3", "a51": "a7"}
+    assert len(index) == 50
+
+    reopened = DedupIndex(tmp_path, workers=1)
+    assert len(reopened) == 50
+    fresh = _doc(rng)
+    second = reopened.dedup(["b0", "b1", "b2"], [_near(rng, docs[10]), fresh, fresh])
+    assert second.duplicates == {"b0": "a10", "b2": "b1"}
+    assert second.kept == ["b1"] and len(reopened) == 51
+
+
+def test_interrupted_append_is_truncated(tmp_path):
+    rng = random.Random(3)
+    index = DedupIndex(tmp_path, workers=1)
+    index.dedup(["x", "y"], [_doc(rng), _doc(rng)])
+    # 模拟追加数据文件后、提交 meta.json 前中断
+    for name in ("signatures.bin", "bands.bin", "ids.jsonl"):
+        with open(tmp_path / name, "ab") as f:
+            f.write(b"partial\n")
+    reopened = DedupIndex(tmp_path, workers=1)
+    assert reopened.ids == ["x", "y"]
+    assert (tmp_path / "bands.bin").stat().st_size == 2 * dedup.BANDS * 8
+    with pytest.raises(ValueError):
+        DedupIndex(tmp_path, num_perm=64, workers=1)
+
+
+def test_process_pool_shards_match_serial(tmp_path, monkeypatch):
+    monkeypatch.setattr(dedup, "PARALLEL_THRESHOLD", 1)
+    monkeypatch.setattr(dedup, "SHARD_DOCS", 3)
+    rng = random.Random(4)
+    texts = [_doc(rng, 50) for _ in range(10)]
+    index = DedupIndex(tmp_path, workers=2)
+    try:
+        assert np.array_equal(index.signatures(texts), index.hasher.signatures(texts))
+    finally:
+        index.close()
+
+
+def test_dedup_jsonl_writes_kept_lines(tmp_path):
+    rng = random.Random(5)
+    base = _doc(rng)
+    corpus = tmp_path / "corpus.jsonl"
+    rows = [{"text": base}, {"text": _doc(rng)}, {"text": _near(rng, base)}]
+    corpus.write_text("".join(json.dumps(r) + "\n" for r in rows))
+    stats = dedup_jsonl(DedupIndex(tmp_path / "index", workers=1), corpus, tmp_path / "out.jsonl")
+    assert stats["docs"] == 3 and stats["duplicates"] == 1 and stats["index_size"] == 2
+    kept = [json.loads(line) for line in (tmp_path / "out.jsonl").read_text().splitlines()]
+    assert kept == rows[:2]
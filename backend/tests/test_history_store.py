@@ -0,0 +1,183 @@
+"""
+执行历史存储测试 — 分段写入、时间窗口查询与多实例 rollup 同步；
+内存模式下的二级索引查询与按日汇总
+"""
+
+import sqlite3
+
+from core.history import ExecutionHistory
+from core.store import HistoryStore
+
+
+def _execution(i, pipeline_id, start_time, status="success"):
+    return {
+        "id": f"exec-{i}",
+        "pipeline_id": pipeline_id,
+        "pipeline_name": pipeline_id,
+        "start_time": start_time,
+        "end_time": start_time,
+        "duration_minutes": 10,
+        "status": status,
+        "rows_processed": 100,
+        "cost_yuan": 1.5,
+        "owner": "data-platform",
+    }
+
+
+def _check(i, rule_id, pipeline_id, check_time, passed=True):
+    return {
+        "rule_id": rule_id,
+        "rule_name": rule_id,
+        "pipeline_id": pipeline_id,
+        "target_table": "t",
+        "check_type": "null_check",
+        "severity": "warning",
+        "check_time": check_time,
+        "passed": passed,
+        "violation_ratio": 0.0,
+        "threshold": 0.01,
+    }
+
+
+def _history(n=40):
+    """倒序（最新在前）传入，与 generate_all 一致"""
+    executions = [
+        _execution(i, f"p{i % 3}", f"2026-03-{1 + i // 8:02d}T{i % 8:02d}:00:00") for i in range(n)
+    ]
+    for e in executions:
+        e["owner"] = "team-a" if e["pipeline_id"] == "p0" else "team-b"
+    checks = [
+        _check(
+            i, f"r{i % 4}", f"p{i % 3}", f"2026-03-{1 + i // 8:02d}T{i % 8:02d}:30:00", i % 5 != 0
+        )
+        for i in range(n)
+    ]
+    return executions, checks, ExecutionHistory(executions[::-1], checks[::-1])
+
+
+def test_indexed_queries_match_full_scan():
+    executions, checks, history = _history()
+    newest = executions[::-1]
+    assert (
+        history.latest_executions(5, pipeline_id="p1")
+        == [e for e in newest if e["pipeline_id"] == "p1"][:5]
+    )
+    assert history.latest_executions(50, owner="team-a") == [
+        e for e in newest if e["owner"] == "team-a"
+    ]
+    window = history.latest_executions(
+        3, pipeline_id="p2", start="2026-03-02", end="2026-03-04T03:00:00"
+    )
+    assert (
+        window
+        == [
+            e
+            for e in newest
+            if e["pipeline_id"] == "p2" and "2026-03-02" <= e["start_time"] < "2026-03-04T03:00:00"
+        ][:3]
+    )
+    assert history.latest_executions(5, pipeline_id="missing") == []
+
+    newest_checks = checks[::-1]
+    assert (
+        history.latest_checks(4, rule_id="r3")
+        == [c for c in newest_checks if c["rule_id"] == "r3"][:4]
+    )
+    assert (
+        history.latest_checks(7, pipeline_ids=["p0", "p2", "x"])
+        == [c for c in newest_checks if c["pipeline_id"] in ("p0", "p2")][:7]
+    )
+    # 追加后索引同步更新
+    history.append_execution(_execution(99, "p1", "2026-03-09T00:00:00"))
+    assert history.latest_executions(1, pipeline_id="p1")[0]["id"] == "exec-99"
+
+
+def test_daily_rollups_follow_appends():
+    executions, checks, history = _history()
+    by_day = history.execution_totals(("day", "pipeline_id"), ["2026-03-01"])
+    assert {k: v.runs for k, v in by_day.items()} == {
+        ("2026-03-01", "p0"): 3,
+        ("2026-03-01", "p1"): 3,
+        ("2026-03-01", "p2"): 2,
+    }
+    history.append_execution(_execution(99, "p2", "2026-03-01T23:00:00", status="failed"))
+    by_status = history.execution_totals(("pipeline_id", "status"), ["2026-03-01"])
+    assert by_status[("p2", "failed")].runs == 1
+    assert history.execution_total(["2026-03-01"]).cost_yuan == 9 * 1.5
+
+    failed = sum(not c["passed"] for c in checks[:10])
+    oldest = history.check_total(oldest=10)
+    assert (oldest.checks, oldest.passed) == (10, 10 - failed)
+    history.append_check(_check(99, "r0", "p0", "2026-03-09T00:00:00", passed=False))
+    latest = history.check_total(latest=1)
+    assert (latest.checks, latest.passed) == (1, 0)
+    per_rule = history.check_totals(("rule_id",), latest_per_rule=2)
+    assert {k: v.checks for k, v in per_rule.items()} == {(f"r{i}",): 2 for i in range(4)}
+
+
+def test_range_query_across_segments(tmp_path):
+    store = HistoryStore(tmp_path)
+    store.append_executions(
+        [
+            _execution(1, "orders_daily", "2026-01-31T02:00:00"),
+            _execution(2, "orders_daily", "2026-02-01T02:00:00"),
+            _execution(3, "payments_hourly", "2026-02-01T03:15:00"),
+            _execution(4, "orders_daily", "2026-03-01T02:00:00"),
+        ]
+    )
+    assert store.segments() == ["2026-01", "2026-02", "2026-03"]
+
+    latest = store.executions(2, pipeline_id="orders_daily")
+    assert [e["id"] for e in latest] == ["exec-4", "exec-2"]
+
+    window = store.executions(pipeline_id="orders_daily", start="2026-01-15", end="2026-02-15")
+    assert [e["id"] for e in window] == ["exec-2", "exec-1"]
+
+    # 重复写入被忽略，append-only 语义下可安全重放
+    assert store.append_executions([_execution(1, "orders_daily", "2026-01-31")]) == 0
+
+
+def test_history_syncs_appends_from_other_instance(tmp_path):
+    store = HistoryStore(tmp_path)
+    store.append_executions([_execution(1, "orders_daily", "2026-02-01T02:00:00")])
+    worker_a = ExecutionHistory.from_store(store)
+    worker_b = ExecutionHistory.from_store(HistoryStore(tmp_path))
+
+    worker_a.append_execution(_execution(2, "orders_daily", "2026-02-02T02:00:00", status="failed"))
+    assert worker_b.execution_count == 1
+    assert worker_b.sync() is True
+    assert worker_b.execution_count == 2
+    by_status = worker_b.execution_totals(("status",))
+    assert by_status[("failed",)].runs == 1
+    assert worker_b.sync() is False
+
+
+def test_segments_reuse_pooled_connections(tmp_path):
+    store = HistoryStore(tmp_path)
+    for i in range(3):
+        store.append_executions([_execution(i, "orders_daily", f"2026-01-0{i + 1}T02:00:00")])
+        store.executions(1)
+    assert store.generation() == 3
+    # 每个段、meta.db 各只打开一个连接，建表只执行一次
+    assert len(store._pools["2026-01"]._connections) == 1
+    assert len(store._meta._connections) == 1
+    assert store._ready == {"2026-01"}
+    store.close()
+    assert store.executions(1)[0]["id"] == "exec-2"
+
+
+def test_segment_without_tables_is_skipped_until_created(tmp_path):
+    store = HistoryStore(tmp_path)
+    store.append_executions([_execution(1, "orders_daily", "2026-01-05T02:00:00")])
+    # 另一个进程刚打开连接、建表事务尚未提交时的段文件
+    conn = sqlite3.connect(tmp_path / "history-2026-02.db")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+    reader = HistoryStore(tmp_path)
+    assert list(reader.marks()) == ["2026-01"]
+    assert [e["id"] for e in reader.executions()] == ["exec-1"]
+    assert reader.count_unresolved_alerts() == 0
+
+    store.append_executions([_execution(2, "orders_daily", "2026-02-05T02:00:00")])
+    assert list(reader.marks()) == ["2026-01", "2026-02"]
+    assert [e["id"] for e in reader.executions()] == ["exec-2", "exec-1"]
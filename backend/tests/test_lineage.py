@@ -0,0 +1,71 @@
+"""
+血缘图测试 — 上下游闭包与深度限制、子图、按耗时加权的关键路径、配置中的环
+"""
+
+from core.lineage import LineageGraph
+
+
+def _pipeline(pid, sources, target, deps=()):
+    return {
+        "id": pid,
+        "name": pid,
+        "status": "active",
+        "source_tables": list(sources),
+        "target_table": target,
+        "dependencies": list(deps),
+    }
+
+
+#  ods_a ─p1→ dw_a ─p3→ dm_x ─p4→ dm_y
+#  ods_b ─p2→ dw_b ─p3↗
+GRAPH = [
+    _pipeline("p1", ["ods_a"], "dw_a"),
+    _pipeline("p2", ["ods_b"], "dw_b"),
+    _pipeline("p3", ["dw_a", "dw_b"], "dm_x"),
+    _pipeline("p4", [], "dm_y", deps=["p3"]),
+]
+
+
+def test_closure_with_depth():
+    graph = LineageGraph(GRAPH)
+    down = graph.closure("ods_a")
+    assert down["levels"] == [["dw_a"], ["dm_x"], ["dm_y"]]
+    assert down["count"] == 3
+    assert down["pipelines"] == ["p1", "p3", "p4"]
+    assert graph.closure("ods_a", depth=1)["levels"] == [["dw_a"]]
+
+    up = graph.closure("dm_x", downstream=False)
+    assert [sorted(level) for level in up["levels"]] == [["dw_a", "dw_b"], ["ods_a", "ods_b"]]
+    assert graph.closure("ods_b", downstream=False)["levels"] == []
+    assert len(graph.to_dict()["edges"]) == 5
+
+
+def test_subgraph_depth_limits():
+    graph = LineageGraph(GRAPH)
+    sub = graph.subgraph("dm_x", upstream=1, downstream=0)
+    assert {(n["id"], n["distance"]) for n in sub["nodes"]} == {
+        ("dm_x", 0),
+        ("dw_a", -1),
+        ("dw_b", -1),
+    }
+    assert {(e["source"], e["target"]) for e in sub["edges"]} == {
+        ("dw_a", "dm_x"),
+        ("dw_b", "dm_x"),
+    }
+
+
+def test_critical_path_weighted_by_duration():
+    graph = LineageGraph(GRAPH)
+    path = graph.critical_path({"p1": 10, "p2": 50, "p3": 5, "p4": 1})
+    assert path["target"] == "dm_y"
+    assert path["tables"] == ["ods_b", "dw_b", "dm_x", "dm_y"]
+    assert path["total_minutes"] == 56
+    to_dw_a = graph.critical_path({"p1": 10, "p2": 50}, target="dw_a")
+    assert [s["pipeline_id"] for s in to_dw_a["steps"]] == ["p1"]
+
+
+def test_cycle_is_reported_not_fatal():
+    graph = LineageGraph([_pipeline("a", ["t2"], "t1"), _pipeline("b", ["t1"], "t2"), *GRAPH])
+    assert graph.cyclic == ["t1", "t2"]
+    assert graph.closure("t1")["levels"] == [["t2"]]
+    assert graph.critical_path({"p2": 1})["total_minutes"] == 1
@@ -0,0 +1,151 @@
+"""
+质量规则引擎测试 — 各检查类型、跨块累计、唯一性落盘、CSV / JSONL / Parquet 一致、出错规则
+"""
+
+import csv
+import json
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from core.quality import DistinctCounter, evaluate_table, hash64, run_rules
+
+NOW = datetime(2026, 3, 1, 12, 0, 0)
+
+ROWS = [
+    {
+        "order_id": 1,
+        "amount": 10.5,
+        "order_date": "2026-02-28",
+        "event_time": "2026-03-01T11:00:00",
+    },
+    {
+        "order_id": 2,
+        "amount": None,
+        "order_date": "2026-02-28",
+        "event_time": "2026-03-01T09:00:00",
+    },
+    {"order_id": 2, "amount": -3, "order_date": "2099-01-01", "event_time": "2026-03-01T10:30:00"},
+    {"order_id": 4, "amount": 2e6, "order_date": "2026-02-27", "event_time": None},
+    {
+        "order_id": 5,
+        "amount": "abc",
+        "order_date": "2026-02-27",
+        "event_time": "2026-02-28T00:00:00",
+    },
+]
+
+
+def _rule(rid, check_type, column=None, threshold=0.0, **params):
+    return {
+        "id": rid,
+        "name": rid,
+        "target_table": "orders",
+        "pipeline_id": "orders_daily",
+        "check_type": check_type,
+        "column": column,
+        "params": params,
+        "enabled": True,
+        "severity": "warning",
+        "threshold": threshold,
+    }
+
+
+RULES = [
+    _rule("nulls", "null_check", "amount", threshold=0.25),
+    _rule("range", "range_check", "amount", min=0.01, max=1_000_000),
+    _rule("unique", "uniqueness", "order_id"),
+    _rule("fresh", "freshness", "event_time", max_delay_hours=2),
+    _rule(
+        "future",
+        "custom_sql",
+        sql="SELECT COUNT(*) FROM orders WHERE order_date > '2026-03-01'",
+        max_count=0,
+    ),
+]
+
+
+def _write_jsonl(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+
+
+def _write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows({k: "" if v is None else v for k, v in row.items()} for row in rows)
+
+
+def test_all_check_types_across_chunks(tmp_path):
+    path = tmp_path / "orders.jsonl"
+    _write_jsonl(path, ROWS)
+    result = evaluate_table(path, RULES, now=NOW, chunk_rows=2)
+    assert result["rows"] == 5 and result["errors"] == []
+    by_rule = {c["rule_id"]: c for c in result["checks"]}
+    violations = {rid: d["violations"] for rid, d in result["details"].items()}
+    # range：-3 与 2e6 越界，"abc" 无法解析；空值只算 null_check
+    assert violations == {"nulls": 1, "range": 3, "unique": 1, "fresh": 0, "future": 1}
+    assert by_rule["nulls"]["passed"] and by_rule["nulls"]["violation_ratio"] == 0.2
+    assert not by_rule["range"]["passed"] and not by_rule["unique"]["passed"]
+    assert by_rule["fresh"]["passed"] and result["details"]["fresh"]["lag_hours"] == 1.0
+    assert not by_rule["future"]["passed"]
+    assert set(by_rule["nulls"]) == {
+        "rule_id",
+        "rule_name",
+        "pipeline_id",
+        "target_table",
+        "check_type",
+        "severity",
+        "check_time",
+        "passed",
+        "violation_ratio",
+        "threshold",
+    }
+
+    stale = evaluate_table(path, RULES[3:4], now=datetime(2026, 3, 2))
+    assert stale["checks"][0]["violation_ratio"] == 1.0
+
+
+def test_formats_agree(tmp_path):
+    rows = [dict(r, amount=r["amount"] if r["amount"] != "abc" else None) for r in ROWS]
+    _write_jsonl(tmp_path / "orders.jsonl", rows)
+    _write_csv(tmp_path / "orders.csv", rows)
+    expected = evaluate_table(tmp_path / "orders.jsonl", RULES, now=NOW)["details"]
+    assert evaluate_table(tmp_path / "orders.csv", RULES, now=NOW)["details"] == expected
+
+    pq = pytest.importorskip("pyarrow.parquet")
+    import pyarrow as pa
+
+    pq.write_table(pa.Table.from_pylist(rows), tmp_path / "orders.parquet")
+    parquet = evaluate_table(tmp_path / "orders.parquet", RULES, now=NOW, chunk_rows=2)
+    assert parquet["details"] == expected
+
+
+def test_distinct_counter_spills_to_disk():
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 5000, 20_000)
+    counter = DistinctCounter(spill_rows=3000)
+    for chunk in np.array_split(values, 9):
+        counter.add(hash64(chunk))
+    assert counter._dir is not None
+    assert counter.distinct() == len(np.unique(values))
+    strings = np.array(["a", "b", "a"], dtype=object)
+    assert len(np.unique(hash64(strings))) == 2
+    # 内置 hash() 下 -1 与 -2、相差 2^61-1 的整数会碰撞
+    mixed = np.array([-1, -2, 5, 5 + (2**61 - 1), 1.0, 1, "1"], dtype=object)
+    assert len(np.unique(hash64(mixed))) == 6
+
+
+def test_missing_column_and_file(tmp_path):
+    # JSONL 中缺失的键按空值处理，CSV 表头中没有的列才是错误
+    _write_csv(tmp_path / "orders.csv", ROWS)
+    rules = [_rule("bad", "null_check", "nope"), RULES[0], dict(RULES[0], id="off", enabled=False)]
+    rules.append(dict(RULES[0], id="other", target_table="missing_table"))
+    result = run_rules(rules, tmp_path, now=NOW)
+    assert [c["rule_id"] for c in result["checks"]] == ["nulls"]
+    assert [e["rule_id"] for e in result["errors"]] == ["bad"]
+    assert result["skipped"] == [{"rule_id": "other", "target_table": "missing_table"}]
+    assert result["tables"]["orders"]["rows"] == 5
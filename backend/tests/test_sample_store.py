@@ -0,0 +1,67 @@
+"""
+标注样本库测试 — JSONL 导入、未变化文件跳过、整体替换与追加、按文件顺序翻页
+"""
+
+import json
+import os
+
+import pytest
+
+from core.sample_store import SampleStore
+from core.sqlite_pool import SQLitePool
+
+
+@pytest.fixture
+def store(tmp_path):
+    pool = SQLitePool(tmp_path / "samples.db")
+    store = SampleStore(pool)
+    store.init_schema(pool.connection())
+    yield store
+    pool.close_all()
+
+
+def _write(path, ids, difficulty="easy"):
+    with open(path, "w", encoding="utf-8") as f:
+        for sid in ids:
+            sample = {"id": sid, "prompt": f"p {sid}", "difficulty": difficulty}
+            f.write(json.dumps(sample, ensure_ascii=False) + "\n")
+
+
+def test_sync_dir_skips_unchanged_and_replaces_changed(store, tmp_path):
+    conn = store.pool.connection()
+    _write(tmp_path / "AT-1.jsonl", ["a", "b", "c"])
+    assert [r["samples"] for r in store.sync_dir(tmp_path)["ingested"]] == [3]
+    assert store.sync_dir(tmp_path) == {"ingested": [], "skipped": 1}
+
+    _write(tmp_path / "AT-1.jsonl", ["c", "d"], difficulty="hard")
+    os.utime(tmp_path / "AT-1.jsonl", ns=(1, 1))
+    store.sync_dir(tmp_path)
+    assert store.counts(conn) == {"AT-1": 2}
+    assert store.get(conn, "AT-1", "a") is None
+    assert store.get(conn, "AT-1", "c")["difficulty"] == "hard"
+    assert [s["id"] for _, s in store.page(conn, "AT-1", 10)] == ["c", "d"]
+
+
+def test_append_keeps_order_and_reports_invalid_lines(store):
+    conn = store.pool.connection()
+    store.ingest("T", [{"id": "x", "prompt": "1"}, {"id": "y", "prompt": "2"}])
+    result = store.ingest(
+        "T",
+        [b'{"id": "z", "prompt": "3"}', b"not json", b'{"id": "w"}', b'{"id": "z"}'],
+    )
+    assert (result["ingested"], result["samples"], result["error_count"]) == (1, 3, 3)
+    assert [e["line"] for e in result["errors"]] == [2, 3, 4]
+
+    first = store.page(conn, "T", 2)
+    rest = store.page(conn, "T", 2, after=(first[-1][0], first[-1][1]["id"]))
+    assert [s["id"] for _, s in first + rest] == ["x", "y", "z"]
+    assert set(store.get_many(conn, "T", ["x", "z", "missing"])) == {"x", "z"}
+
+
+def test_upload_survives_restart_sync(store, tmp_path):
+    _write(tmp_path / "AT-1.jsonl", ["a"])
+    store.sync_dir(tmp_path)
+    store.ingest("AT-1", [{"id": "uploaded", "prompt": "p"}])
+    # 文件未变化：重启时不重新导入，上传的样本保留
+    assert store.sync_dir(tmp_path)["skipped"] == 1
+    assert store.count(store.pool.connection(), "AT-1") == 2
@@ -0,0 +1,206 @@
+"""
+调度引擎测试 — cron 解析、依赖拓扑、重试/超时与依赖跳过
+"""
+
+import asyncio
+import threading
+from datetime import datetime
+
+import pytest
+
+from core.scheduler import CronSchedule, LeaderLock, PipelineScheduler, topological_order
+
+
+def _pipeline(pid, deps=(), schedule="0 2 * * *", **config):
+    return {
+        "id": pid,
+        "name": pid,
+        "schedule": schedule,
+        "status": "active",
+        "owner": "data-platform",
+        "dependencies": list(deps),
+        "config": config,
+    }
+
+
+def test_cron_next_after():
+    assert CronSchedule("0 2 * * *").next_after(datetime(2026, 1, 1, 2, 0)) == datetime(
+        2026, 1, 2, 2, 0
+    )
+    assert CronSchedule("15 * * * *").next_after(datetime(2026, 1, 1, 10, 20)) == datetime(
+        2026, 1, 1, 11, 15
+    )
+    # 2026-01-01 为周四，下一个周一是 01-05
+    assert CronSchedule("0 6 * * 1").next_after(datetime(2026, 1, 1)) == datetime(2026, 1, 5, 6, 0)
+    assert CronSchedule("*/20 9-10 * * *").next_after(datetime(2026, 1, 1, 10, 45)) == datetime(
+        2026, 1, 2, 9, 0
+    )
+
+
+def test_cron_invalid():
+    with pytest.raises(ValueError):
+        CronSchedule("0 2 * *")
+    with pytest.raises(ValueError):
+        CronSchedule("61 * * * *")
+
+
+def test_topological_order():
+    pipelines = [
+        _pipeline("risk", deps=["orders", "payments"]),
+        _pipeline("payments", deps=["orders"]),
+        _pipeline("orders"),
+    ]
+    assert topological_order(pipelines) == ["orders", "payments", "risk"]
+    with pytest.raises(ValueError):
+        topological_order([_pipeline("a", deps=["b"]), _pipeline("b", deps=["a"])])
+
+
+def test_retry_timeout_and_dependency_skip():
+    records = []
+    calls = {"flaky": 0}
+
+    async def flaky(p):
+        calls["flaky"] += 1
+        if calls["flaky"] < 2:
+            raise RuntimeError("boom")
+        return {"rows_processed": 10, "cost_yuan": 1.5}
+
+    async def slow(p):
+        await asyncio.sleep(1)
+
+    async def scenario():
+        scheduler = PipelineScheduler(
+            [
+                _pipeline("flaky", retry_count=1),
+                _pipeline("slow", timeout_minutes=0.0005, retry_count=0),
+                _pipeline("after_slow", deps=["slow"]),
+            ],
+            on_execution=records.append,
+        )
+        scheduler.register_handler("flaky", flaky)
+        scheduler.register_handler("slow", slow)
+        scheduler.register_handler("after_slow", lambda p: None)
+        await asyncio.gather(*scheduler.tick(datetime(2100, 1, 1)))
+
+    asyncio.run(scenario())
+    by_id = {r["pipeline_id"]: r for r in records}
+    assert by_id["flaky"]["status"] == "success"
+    assert by_id["flaky"]["attempts"] == 2
+    assert by_id["flaky"]["rows_processed"] == 10
+    assert by_id["slow"]["status"] == "timeout"
+    assert by_id["after_slow"]["status"] == "skipped"
+
+
+def test_tick_only_fires_due_pipelines():
+    records = []
+
+    async def scenario():
+        scheduler = PipelineScheduler(
+            [_pipeline("daily"), _pipeline("weekly", schedule="0 6 * * 1")],
+            on_execution=records.append,
+            clock=lambda: datetime(2026, 1, 1),
+        )
+        scheduler.register_handler("daily", lambda p: None)
+        scheduler.register_handler("weekly", lambda p: None)
+        # 周四 02:00 只有 daily 到期
+        await asyncio.gather(*scheduler.tick(datetime(2026, 1, 1, 2, 0)))
+        assert scheduler.next_fire_time() == datetime(2026, 1, 2, 2, 0)
+
+    asyncio.run(scenario())
+    assert [r["pipeline_id"] for r in records] == ["daily"]
+
+
+def test_pipelines_without_handler_are_not_run():
+    records = []
+
+    async def scenario():
+        scheduler = PipelineScheduler(
+            [_pipeline("registered"), _pipeline("unregistered")],
+            on_execution=records.append,
+            clock=lambda: datetime(2026, 1, 1),
+        )
+        scheduler.register_handler("registered", lambda p: {"rows_processed": 1})
+        await asyncio.gather(*scheduler.tick(datetime(2026, 1, 1, 2, 0)))
+        # 未注册的 pipeline 同样推进下次触发时间
+        assert [t for t, *_ in scheduler._heap] == [datetime(2026, 1, 2, 2, 0)] * 2
+        with pytest.raises(KeyError):
+            scheduler.trigger("unregistered")
+
+    asyncio.run(scenario())
+    assert [r["pipeline_id"] for r in records] == ["registered"]
+
+
+def test_handler_types_come_from_pipeline_config():
+    records = []
+
+    async def scenario():
+        scheduler = PipelineScheduler(
+            [
+                dict(_pipeline("typed"), handler="check"),
+                dict(_pipeline("overridden"), handler="check"),
+                dict(_pipeline("unknown_type"), handler="missing"),
+            ],
+            on_execution=records.append,
+            clock=lambda: datetime(2026, 1, 1),
+        )
+        scheduler.register_handler_type("check", lambda p: {"rows_processed": 1})
+        # 按 pipeline_id 注册的处理函数优先于处理类型
+        scheduler.register_handler("overridden", lambda p: {"rows_processed": 2})
+        await asyncio.gather(*scheduler.tick(datetime(2026, 1, 1, 2, 0)))
+        with pytest.raises(KeyError):
+            scheduler.trigger("unknown_type")
+        # 热重载后按新配置的 handler 字段解析
+        scheduler.load([dict(_pipeline("unknown_type"), handler="check")])
+        await scheduler.trigger("unknown_type")
+
+    asyncio.run(scenario())
+    assert [(r["pipeline_id"], r["rows_processed"]) for r in records] == [
+        ("typed", 1),
+        ("overridden", 2),
+        ("unknown_type", 1),
+    ]
+
+
+def test_sync_handler_timeout_is_not_retried_while_thread_runs():
+    records = []
+    calls = []
+    release = threading.Event()
+
+    def stuck(p):
+        calls.append(p["id"])
+        release.wait(5)
+
+    async def scenario():
+        scheduler = PipelineScheduler(
+            [_pipeline("stuck", timeout_minutes=0.0005, retry_count=2)],
+            on_execution=records.append,
+        )
+        scheduler.register_handler("stuck", stuck)
+        await scheduler.trigger("stuck")
+        # 线程仍在运行：再次触发不会启动第二个线程
+        await scheduler.trigger("stuck")
+        release.set()
+        while scheduler._orphans:
+            await asyncio.sleep(0.01)
+        await scheduler.trigger("stuck")
+
+    asyncio.run(scenario())
+    assert calls == ["stuck", "stuck"]
+    assert [(r["status"], r["attempts"]) for r in records] == [
+        ("timeout", 1),
+        ("skipped", 0),
+        ("success", 1),
+    ]
+
+
+def test_leader_lock_is_exclusive(tmp_path):
+    leader, follower = (
+        LeaderLock(tmp_path / "scheduler.lock"),
+        LeaderLock(tmp_path / "scheduler.lock"),
+    )
+    assert leader.try_acquire() and leader.try_acquire()
+    assert not follower.try_acquire() and not follower.held
+    leader.release()
+    # leader 退出后其他 worker 接替
+    assert follower.try_acquire()
+    follower.release()
@@ -0,0 +1,295 @@
+"""
+Agent 会话骨架化存储测试 — 还原结果与原始 messages 一致，块跨会话去重、引用归零删除；
+导入时拆出的工具调用行
+"""
+
+import json
+import sqlite3
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import agent_annotation
+from core.async_db import AsyncSQLite
+from core.blob_store import BlobStore, train_dictionary
+from core.pagination import encode_cursor
+from core.sqlite_pool import SQLitePool
+
+SYSTEM_PROMPT = "你是一个严谨的数据分析助手，调用工具前先说明理由。" * 4
+TOOL_OUTPUT = json.dumps({"rows": [{"city": "北京", "temp": i} for i in range(20)]})
+
+
+def _session(sid, question):
+    return {
+        "id": sid,
+        "model": "gpt-4",
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": question},
+            {
+                "role": "assistant",
+                "content": "",
+                "tool_calls": [
+                    {
+                        "id": "call_1",
+                        "type": "function",
+                        "function": {
+                            "name": "query_weather",
+                            "arguments": json.dumps({"sql": "SELECT * " * 40}),
+                        },
+                    }
+                ],
+            },
+            {"role": "tool", "tool_call_id": "call_1", "content": TOOL_OUTPUT},
+        ],
+    }
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    pool = SQLitePool(tmp_path / "agent.db", pragmas={"foreign_keys": "ON"})
+    dal = AsyncSQLite(pool)
+    monkeypatch.setattr(agent_annotation, "_db_pool", pool)
+    monkeypatch.setattr(agent_annotation, "_dal", dal)
+    monkeypatch.setattr(agent_annotation, "_blob_store", BlobStore("session_blobs"))
+    agent_annotation._init_db()
+    app = FastAPI()
+    app.include_router(agent_annotation.router)
+    yield TestClient(app)
+    dal.close()
+    pool.close_all()
+
+
+def _import(client, session):
+    resp = client.post(
+        "/api/agent-annotation/sessions/import",
+        files={"file": ("s.json", json.dumps(session), "application/json")},
+    )
+    assert resp.status_code == 200, resp.text
+
+
+def test_roundtrip_and_dedup(client):
+    for i in range(3):
+        _import(client, _session(f"s{i}", f"问题 {i}"))
+
+    for i in range(3):
+        got = client.get(f"/api/agent-annotation/sessions/s{i}").json()
+        assert got["messages"] == _session(f"s{i}", f"问题 {i}")["messages"]
+    tool_call = client.get("/api/agent-annotation/sessions/s1/tool-calls/2/0").json()
+    assert tool_call["tool_call"]["function"]["arguments"].startswith('{"sql"')
+
+    stats = client.get("/api/agent-annotation/storage/stats").json()
+    # 系统提示、工具参数、工具输出三块，各被 3 个会话引用
+    assert (stats["blobs"]["blobs"], stats["blobs"]["refs"]) == (3, 9)
+    assert stats["sessions"] == 3 and stats["overall_ratio"] > 1
+
+
+def test_reimport_releases_unreferenced_blobs(client):
+    _import(client, _session("s0", "问题"))
+    changed = _session("s0", "问题")
+    changed["messages"][3]["content"] = TOOL_OUTPUT.replace("北京", "上海")
+    _import(client, changed)
+
+    stats = client.get("/api/agent-annotation/storage/stats").json()
+    assert (stats["blobs"]["blobs"], stats["blobs"]["refs"]) == (3, 3)
+    got = client.get("/api/agent-annotation/sessions/s0").json()
+    assert got["messages"] == changed["messages"]
+
+
+def test_dictionary_training_keeps_old_blobs_readable(client):
+    for i in range(5):
+        session = _session(f"s{i}", f"问题 {i}")
+        session["messages"][3]["content"] = TOOL_OUTPUT.replace("20", str(i))
+        session["messages"][3]["content"] += f" 第 {i} 批"
+        _import(client, session)
+    resp = client.post("/api/agent-annotation/storage/dictionary").json()
+    assert resp["trained"] and resp["dict_size"] > 0
+    _import(client, _session("s9", "问题 9"))
+    resp = client.post("/api/agent-annotation/storage/dictionary?recompress=true")
+    assert resp.json()["recompressed_sessions"] == 6
+    for sid in ("s0", "s4", "s9"):
+        assert client.get(f"/api/agent-annotation/sessions/{sid}").status_code == 200
+
+
+def test_legacy_rows_are_migrated(client):
+    messages = _session("legacy", "旧数据")["messages"]
+    conn = agent_annotation._get_db()
+    conn.execute(
+        "INSERT INTO agent_sessions (session_id, created_at, model, messages) "
+        "VALUES ('legacy', '2024-01-01', 'gpt-4', ?)",
+        (json.dumps(messages, ensure_ascii=False),),
+    )
+    conn.commit()
+    agent_annotation._migrate_sessions(conn)
+
+    row = conn.execute(
+        "SELECT messages, payload IS NOT NULL, tool_call_count FROM agent_sessions "
+        "WHERE session_id = 'legacy'"
+    ).fetchone()
+    assert tuple(row) == ("", 1, 1)
+    got = agent_annotation.get_session("legacy")
+    assert got["messages"] == messages
+
+
+def test_train_dictionary_prefers_shared_segments():
+    samples = [f'{{"status": "ok", "region": "cn-north", "id": {i}}}'.encode() for i in range(10)]
+    zdict = train_dictionary(samples)
+    assert b'"region":' in zdict and b"cn-north" in zdict
+    assert train_dictionary([b"only once"]) == b""
+
+
+def test_annotations_go_through_writer(client):
+    _import(client, _session("s0", "问题"))
+    payload = {"session_id": "s0", "message_index": 2, "correctness": "correct"}
+    resp = client.post("/api/agent-annotation/annotations", json={**payload, "tool_call_index": 0})
+    assert resp.status_code == 200, resp.text
+    resp = client.post("/api/agent-annotation/annotations", json={**payload, "tool_call_index": 3})
+    assert resp.status_code == 400
+    sessions = client.get("/api/agent-annotation/sessions").json()
+    assert sessions[0]["annotation_count"] == 1
+    listed = client.get("/api/agent-annotation/annotations").json()
+    assert len(listed["annotations"]) == 1
+    bad = encode_cursor({"a": 1}, [1])
+    resp = client.get("/api/agent-annotation/annotations", params={"cursor": bad})
+    assert resp.status_code == 400
+
+
+def _bulk(client, sessions):
+    body = "".join(json.dumps(s, ensure_ascii=False) + "\n" for s in sessions)
+    resp = client.post(
+        "/api/agent-annotation/sessions/import/bulk",
+        files={"file": ("s.jsonl", body.encode(), "application/x-ndjson")},
+    )
+    return [json.loads(line) for line in resp.text.splitlines()]
+
+
+def test_bulk_import_reports_lock_errors_per_record(client, monkeypatch, tmp_path):
+    # 写线程的连接在首次写入时打开，缩短等锁时间
+    monkeypatch.setitem(agent_annotation._db_pool.pragmas, "busy_timeout", 50)
+    monkeypatch.setattr(agent_annotation, "BULK_BATCH_SIZE", 2)
+    sessions = [_session(f"b{i}", f"问题 {i}") for i in range(3)]
+    other = sqlite3.connect(tmp_path / "agent.db", isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")  # 另一个写者持有写锁
+    try:
+        events = _bulk(client, sessions)
+    finally:
+        other.rollback()
+        other.close()
+    assert [e["event"] for e in events] == ["progress", "progress", "done"]
+    assert events[-1]["imported"] == 0 and events[-1]["failed"] == 3
+    assert [e["record"] for e in events[0]["errors"]] == ["line 1", "line 2"]
+    assert "locked" in events[0]["errors"][0]["error"]
+
+    events = _bulk(client, sessions)
+    assert events[-1]["imported"] == 3 and events[-1]["failed"] == 0
+    assert client.get("/api/agent-annotation/sessions/b2").status_code == 200
+
+
+def _multi_call_session(sid, calls):
+    """一条 assistant 消息带 calls 个工具调用，之后再跟一个 Anthropic 风格的调用"""
+    return {
+        "id": sid,
+        "model": "gpt-4",
+        "messages": [
+            {"role": "user", "content": "查一下天气和路况"},
+            {
+                "role": "assistant",
+                "content": "",
+                "tool_calls": [
+                    {
+                        "id": f"call_{i}",
+                        "type": "function",
+                        "function": {"name": f"tool_{i}", "arguments": json.dumps({"i": i})},
+                    }
+                    for i in range(calls)
+                ],
+            },
+            {"role": "tool", "tool_call_id": "call_0", "content": TOOL_OUTPUT},
+            {
+                "role": "assistant",
+                "content": "",
+                "tool_calls": [{"id": "toolu_1", "name": "search", "input": {"q": "路况"}}],
+            },
+        ],
+    }
+
+
+def test_tool_calls_are_split_out_on_import(client):
+    _import(client, _multi_call_session("s0", 3))
+    _import(client, _session("s1", "问题"))
+    compact = client.get("/api/agent-annotation/sessions/s0/tool-calls?compact=true").json()
+    assert [(c["message_index"], c["tool_call_index"], c["tool_name"]) for c in compact] == [
+        (1, 0, "tool_0"),
+        (1, 1, "tool_1"),
+        (1, 2, "tool_2"),
+        (3, 0, "search"),
+    ]
+    assert compact[3]["args_preview"] == json.dumps({"q": "路况"}, ensure_ascii=False)
+    assert client.get("/api/agent-annotation/stats").json()["total_tool_calls"] == 5
+
+    # 重新导入同一会话时整体替换其工具调用行
+    _import(client, _multi_call_session("s0", 1))
+    conn = agent_annotation._get_db()
+    rows = conn.execute(
+        "SELECT message_index, tool_call_index FROM tool_calls WHERE session_id = 's0'"
+    ).fetchall()
+    assert [tuple(r) for r in rows] == [(1, 0), (3, 0)]
+    session = conn.execute(
+        "SELECT message_count, tool_call_count FROM agent_sessions WHERE session_id = 's0'"
+    ).fetchone()
+    assert tuple(session) == (4, 2)
+    assert client.get("/api/agent-annotation/stats").json()["total_tool_calls"] == 3
+
+
+def test_tool_call_views_group_annotations_per_call(client):
+    _import(client, _multi_call_session("s0", 3))
+    _import(client, _multi_call_session("s1", 3))
+    marks = [
+        ("s0", 1, 0, "correct"),
+        ("s0", 1, 0, "incorrect"),
+        ("s0", 1, 2, "uncertain"),
+        ("s0", 3, 0, "correct"),
+        ("s1", 1, 0, "incorrect"),  # 其他会话的标注不能串到 s0
+    ]
+    for sid, msg_idx, tc_idx, correctness in marks:
+        resp = client.post(
+            "/api/agent-annotation/annotations",
+            json={
+                "session_id": sid,
+                "message_index": msg_idx,
+                "tool_call_index": tc_idx,
+                "correctness": correctness,
+            },
+        )
+        assert resp.status_code == 200, resp.text
+
+    full = client.get("/api/agent-annotation/sessions/s0/tool-calls").json()
+    grouped = {
+        (c["message_index"], c["tool_call_index"]): sorted(
+            a["correctness"] for a in c["annotations"]
+        )
+        for c in full
+    }
+    assert grouped == {
+        (1, 0): ["correct", "incorrect"],
+        (1, 1): [],
+        (1, 2): ["uncertain"],
+        (3, 0): ["correct"],
+    }
+    assert full[3]["tool_call"] == {"id": "toolu_1", "name": "search", "input": {"q": "路况"}}
+
+    compact = client.get("/api/agent-annotation/sessions/s0/tool-calls?compact=true").json()
+    assert [c["correctness"] for c in compact] == [
+        {"correct": 1, "incorrect": 1},
+        {},
+        {"uncertain": 1},
+        {"correct": 1},
+    ]
+    for call in full:
+        detail = client.get(
+            f"/api/agent-annotation/sessions/s0/tool-calls/"
+            f"{call['message_index']}/{call['tool_call_index']}"
+        ).json()
+        assert detail == call
+    assert client.get("/api/agent-annotation/sessions/nope/tool-calls").status_code == 404
@@ -35,6 +35,9 @@ const statusConfig = {
   completed: { color: 'blue', text: '已完成' },
 }
 
+// Page size when loading the review queue (backend caps it at 1000)
+const REVIEW_PAGE_SIZE = 500
+
 // --- ReviewPanel 子组件 ---
 function ReviewPanel({ taskId, visible, onClose, onReviewed }) {
   const [submissions, setSubmissions] = useState([])
@@ -43,16 +46,28 @@ function ReviewPanel({ taskId, visible, onClose, onReviewed }) {
   const [comment, setComment] = useState('')
   const [byStatus, setByStatus] = useState({})
 
-  const loadSubmissions = () => {
+  // The submissions endpoint is paginated: follow next_cursor until the whole queue is loaded
+  const loadSubmissions = async () => {
     if (!taskId) return
     setLoading(true)
-    fetch(`/api/annotation/tasks/${taskId}/submissions?review_status=pending`)
-      .then(r => r.json())
-      .then(data => {
-        setSubmissions(data.submissions || [])
-        setByStatus(data.by_status || {})
-      })
-      .finally(() => setLoading(false))
+    try {
+      const pending = []
+      let statusCounts = {}
+      let cursor = null
+      do {
+        const params = new URLSearchParams({ review_status: 'pending', limit: REVIEW_PAGE_SIZE })
+        if (cursor) params.set('cursor', cursor)
+        const resp = await fetch(`/api/annotation/tasks/${taskId}/submissions?${params}`)
+        const data = await resp.json()
+        pending.push(...(data.submissions || []))
+        statusCounts = data.by_status || statusCounts
+        cursor = data.next_cursor
+      } while (cursor)
+      setSubmissions(pending)
+      setByStatus(statusCounts)
+    } finally {
+      setLoading(false)
+    }
   }
 
   useEffect(() => {
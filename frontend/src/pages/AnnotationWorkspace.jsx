@@ -30,6 +30,9 @@ const taskTypeColors = {
   reward_scoring: 'cyan',
 }
 
+// Page size when loading a task's samples (backend caps it at 1000)
+const SAMPLE_PAGE_SIZE = 500
+
 export default function AnnotationWorkspace() {
   const [searchParams] = useSearchParams()
   const [tasks, setTasks] = useState([])
@@ -64,19 +67,35 @@ export default function AnnotationWorkspace() {
     })
   }, [])
 
-  // Load samples when task changes
+  // Load samples when task changes, following next_cursor until the last page
   useEffect(() => {
-    if (selectedTaskId) {
-      fetch(`/api/annotation/tasks/${selectedTaskId}/samples`).then(r => r.json()).then(data => {
-        const sampleList = data.samples || []
-        setSamples(sampleList)
-        setSampleTotal(data.total || sampleList.length)
-        // Jump to first unannotated sample
-        const firstUnannotated = sampleList.findIndex(s => !s.annotated)
-        setCurrentIdx(firstUnannotated >= 0 ? firstUnannotated : 0)
-        resetAnnotation()
-        setSubmitResult(null)
-      })
+    if (!selectedTaskId) return undefined
+    let cancelled = false
+    const loadSamples = async () => {
+      const sampleList = []
+      let total = 0
+      let cursor = null
+      do {
+        const params = new URLSearchParams({ limit: SAMPLE_PAGE_SIZE })
+        if (cursor) params.set('cursor', cursor)
+        const resp = await fetch(`/api/annotation/tasks/${selectedTaskId}/samples?${params}`)
+        const data = await resp.json()
+        sampleList.push(...(data.samples || []))
+        total = data.total || sampleList.length
+        cursor = data.next_cursor
+      } while (cursor && !cancelled)
+      if (cancelled) return
+      setSamples(sampleList)
+      setSampleTotal(total)
+      // Jump to first unannotated sample
+      const firstUnannotated = sampleList.findIndex(s => !s.annotated)
+      setCurrentIdx(firstUnannotated >= 0 ? firstUnannotated : 0)
+      resetAnnotation()
+      setSubmitResult(null)
+    }
+    loadSamples()
+    return () => {
+      cancelled = true
     }
   }, [selectedTaskId])
 